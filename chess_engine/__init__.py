@@ -0,0 +1,36 @@
+from .position import (
+    ChessPosition,
+    WHITE,
+    BLACK,
+    EMPTY,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    PIECE_CHARS,
+    START_FEN,
+    KIND_BY_CHAR,
+    square,
+    row_of,
+    col_of,
+    square_name,
+    parse_square,
+    encode_move,
+    move_from,
+    move_to,
+    move_promotion,
+    move_flag,
+    move_uci,
+    GEN_ALL,
+    GEN_TACTICAL,
+    GEN_QUIET,
+)
+from .bitboard import BitboardPosition
+
+# Представления доски с одинаковым интерфейсом
+BACKENDS = {
+    "array": ChessPosition,
+    "bitboard": BitboardPosition,
+}
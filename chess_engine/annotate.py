@@ -0,0 +1,283 @@
+"""Разбор сыгранной партии: оценка каждой позиции за фиксированное время в пуле
+процессов и отметки грубых ошибок (??) и ошибок (?).
+
+Результаты анализа хранятся на диске по ключу Зобриста позиции, поэтому общие
+для многих партий позиции (прежде всего дебютные) считаются один раз. Кэш -
+файл записей фиксированной длины, новые записи дописываются в конец:
+ключ (8), оценка для стороны, чья очередь (4), лучший ход (4), глубина (2),
+время анализа в мс (2).
+
+    python -m chess_engine.annotate games.pgn --time 0.5 --workers 2
+"""
+import argparse
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+from . import BACKENDS
+from .notation import game_start_fen, move_san, parse_san, read_pgn
+from .search import MATE_BOUND, Searcher
+from .tt import TranspositionTable
+
+RECORD = struct.Struct("<QiIHH")
+NO_MOVE = 0xFFFFFFFF
+DEFAULT_CACHE_PATH = "analysis_cache.bin"
+
+# Потеря оценки ходящего в сантипешках; мат считается как выигрыш в CLAMP
+MISTAKE = 100
+BLUNDER = 300
+CLAMP = 1000
+
+
+class AnalysisCache:
+    """(оценка, ход, глубина, мс) по ключу Зобриста; весь файл читается в словарь при открытии."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            # Недописанная последняя запись (оборванный процесс) отбрасывается
+            for offset in range(0, len(data) - len(data) % RECORD.size, RECORD.size):
+                key, score, move, depth, millis = RECORD.unpack_from(data, offset)
+                self._keep(key, (score, None if move == NO_MOVE else move, depth, millis))
+
+    def _keep(self, key, entry):
+        old = self.entries.get(key)
+        if old is None or (entry[3], entry[2]) >= (old[3], old[2]):
+            self.entries[key] = entry
+
+    def get(self, key, millis):
+        """Запись, посчитанная не меньше millis мс, или None."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[3] >= millis:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, score, move, depth, millis):
+        entry = (score, move, depth, min(millis, 0xFFFF))
+        self._keep(key, entry)
+        if self.path:
+            with open(self.path, "ab") as f:
+                f.write(RECORD.pack(key, score, NO_MOVE if move is None else move, depth, entry[3]))
+
+
+def game_positions(start_fen, moves, backend="array"):
+    """(FEN, ключ) позиций партии: до каждого хода и после последнего."""
+    position = BACKENDS[backend].from_fen(start_fen)
+    positions = [(position.fen(), position.key)]
+    for move in moves:
+        position.make_move(move)
+        positions.append((position.fen(), position.key))
+    return positions
+
+
+def analyse(task):
+    """Анализ одной позиции в процессе пула: (ключ, оценка, ход, глубина)."""
+    position = BACKENDS[task["backend"]].from_fen(task["fen"])
+    searcher = Searcher(tt=TranspositionTable(task["hash"]))
+    depths = []
+    move, score = searcher.search(position, 64, task["time"], lambda info: depths.append(info["depth"]))
+    return task["key"], score, move, depths[-1] if depths else 0
+
+
+def _clamp(score):
+    if abs(score) >= MATE_BOUND:
+        return CLAMP if score > 0 else -CLAMP
+    return max(-CLAMP, min(CLAMP, score))
+
+
+def move_loss(scores, ply):
+    """Сколько сантипешек потерял ходящий ходом ply по оценкам позиций scores (для стороны, чья очередь)."""
+    return max(0, _clamp(scores[ply]) + _clamp(scores[ply + 1]))
+
+
+def annotate_moves(start_fen, moves, scores, best_moves, backend="array"):
+    """Разметка ходов по оценкам позиций scores (для стороны, чья очередь) и лучшим ходам.
+
+    Для каждого хода - словарь: ply, san, score и after (оценка до и после хода
+    за белых), loss,
+    mark ("??", "?" или ""), best (SAN лучшего хода, если сыгран другой).
+    """
+    position = BACKENDS[backend].from_fen(start_fen)
+    annotated = []
+    for ply, move in enumerate(moves):
+        color = position.turn
+        loss = move_loss(scores, ply)
+        mark = "??" if loss >= BLUNDER else "?" if loss >= MISTAKE else ""
+        best = best_moves[ply]
+        legal = position.legal_moves()
+        annotated.append({
+            "ply": ply,
+            "san": move_san(position, move, legal),
+            "score": color * scores[ply],
+            "after": -color * scores[ply + 1],
+            "loss": loss,
+            "mark": mark,
+            "best": move_san(position, best, legal) if mark and best is not None and best != move else None,
+        })
+        position.make_move(move)
+    return annotated
+
+
+class GameAnnotator:
+    """Разбор партии в фоне: start() раздаёт позиции пулу, poll() забирает готовые без ожидания."""
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, workers=1, time_limit=0.5, hash_mb=16):
+        self.cache = AnalysisCache(cache_path)
+        self.workers = max(1, workers)
+        self.time_limit = time_limit
+        self.hash_mb = hash_mb
+        self.context = multiprocessing.get_context("spawn")
+        self.pool = None
+        self.game = None
+        self.pending = []
+        self.result = None
+        self.scores = None
+        self.error = None
+
+    def start(self, start_fen, moves, backend="array"):
+        """Начать разбор партии из start_fen с ходами moves; прежний разбор отменяется."""
+        self.cancel()
+        self.result = None
+        self.scores = None
+        self.error = None
+        positions = game_positions(start_fen, moves, backend)
+        self.game = (start_fen, list(moves), backend, [key for _, key in positions])
+        millis = int(self.time_limit * 1000)
+        seen = set()
+        for fen, key in positions:
+            if key in seen or self.cache.get(key, millis) is not None:
+                continue
+            seen.add(key)
+            if self.pool is None:
+                self.pool = self.context.Pool(self.workers)
+            task = {"fen": fen, "key": key, "time": self.time_limit, "hash": self.hash_mb, "backend": backend}
+            self.pending.append(self.pool.apply_async(analyse, (task,)))
+        self.poll()
+
+    def poll(self):
+        """(готово позиций, всего); когда всё готово, разметка партии лежит в result, оценки позиций - в scores.
+
+        Если процесс пула упал, разбор бросается, а причина остаётся в error.
+        """
+        try:
+            return self._poll()
+        except Exception as error:
+            self.cancel()
+            self.error = f"{type(error).__name__}: {error}"
+            return 0, 0
+
+    def _poll(self):
+        if self.game is None:
+            return 0, 0
+        millis = int(self.time_limit * 1000)
+        waiting = []
+        for pending in self.pending:
+            if pending.ready():
+                key, score, move, depth = pending.get()
+                self.cache.put(key, score, move, depth, millis)
+            else:
+                waiting.append(pending)
+        self.pending = waiting
+        keys = self.game[3]
+        total = len(set(keys))
+        if waiting:
+            return total - len(waiting), total
+        if self.result is None:
+            start_fen, moves, backend, _ = self.game
+            entries = [self.cache.entries[key] for key in keys]
+            self.scores = [entry[0] for entry in entries]
+            self.result = annotate_moves(start_fen, moves, self.scores, [entry[1] for entry in entries], backend)
+        return total, total
+
+    def busy(self):
+        return bool(self.pending)
+
+    def cancel(self):
+        """Бросить незаконченный разбор; посчитанные позиции уже в кэше."""
+        if self.pending:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self.pending = []
+        self.game = None
+
+    def close(self):
+        self.cancel()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def format_annotation(annotated):
+    """Партия одной строкой: 1. e4 e5 2. Qh5?? (лучше Nf3) ..."""
+    parts = []
+    for entry in annotated:
+        if entry["ply"] % 2 == 0 or not parts:
+            parts.append(f"{entry['ply'] // 2 + 1}." + ("" if entry["ply"] % 2 == 0 else ".."))
+        text = entry["san"] + entry["mark"]
+        if entry["best"]:
+            text += f" (лучше {entry['best']})"
+        parts.append(text)
+    return " ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Разбор партий PGN движком chess_engine")
+    parser.add_argument("pgn")
+    parser.add_argument("--time", type=float, default=0.5, help="секунд на позицию")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--hash", type=int, default=16, help="МБ таблицы транспозиций")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    with open(args.pgn, "r", encoding="utf-8", errors="replace") as f:
+        games = list(read_pgn(f.read()))
+    annotator = GameAnnotator(args.cache, args.workers, args.time, args.hash)
+    try:
+        for number, (headers, sans) in enumerate(games, 1):
+            start_fen = game_start_fen(headers)
+            position = BACKENDS["array"].from_fen(start_fen)
+            moves = []
+            for san in sans:
+                move = parse_san(position, san)
+                if move is None:
+                    break
+                moves.append(move)
+                position.make_move(move)
+            hits, misses = annotator.cache.hits, annotator.cache.misses
+            start = time.perf_counter()
+            annotator.start(start_fen, moves)
+            while annotator.busy():
+                time.sleep(0.05)
+                annotator.poll()
+            annotated = annotator.result
+            print(f"Партия {number}: {headers.get('White', '?')} - {headers.get('Black', '?')}")
+            if annotated is None:
+                print(f"разбор не удался: {annotator.error}", flush=True)
+                continue
+            cached = annotator.cache.hits - hits
+            print(format_annotation(annotated))
+            print(
+                f"грубых ошибок {sum(1 for entry in annotated if entry['mark'] == '??')}, "
+                f"ошибок {sum(1 for entry in annotated if entry['mark'] == '?')}; "
+                f"из кэша {cached} из {cached + annotator.cache.misses - misses} позиций, "
+                f"{time.perf_counter() - start:.1f} с",
+                flush=True,
+            )
+    finally:
+        annotator.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,540 @@
+"""Генерация ходов на битбордах: по 64-битному числу на каждый тип фигуры и цвет.
+
+BitboardPosition - подкласс ChessPosition с тем же интерфейсом: от него берутся
+FEN, ключи Зобриста и суммы для оценки. Легальность считается по битбордам -
+шахующие фигуры, связки и безопасность клеток рокировки находятся таблицами
+ударов коня, короля и пешек и лучами дальнобойных фигур. Карты атак массивного
+представления здесь не ведутся; массив board обновляется только ради отрисовки,
+оценки и нотации.
+Бит с номером sq соответствует клетке sq из position.py.
+"""
+from .position import (
+    ChessPosition,
+    EMPTY,
+    WHITE,
+    BLACK,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    KNIGHT_TARGETS,
+    KING_TARGETS,
+    PAWN_ATTACKS,
+    CASTLING_RULES,
+    PROMOTION_KINDS,
+    MOVE_DOUBLE_PUSH,
+    MOVE_EN_PASSANT,
+    MOVE_CASTLE,
+    GEN_ALL,
+    GEN_TACTICAL,
+    GEN_QUIET,
+    CASTLING_MASK,
+    row_of,
+    col_of,
+    square,
+)
+from .pst import MG_SCORES, EG_SCORES, PHASE
+from .zobrist import PIECE_KEYS, CASTLING_KEYS, SIDE_KEY
+
+FULL = (1 << 64) - 1
+FILE_A = sum(1 << square(row, 0) for row in range(8))
+FILE_H = sum(1 << square(row, 7) for row in range(8))
+ROW_0 = 0xFF
+ROW_7 = 0xFF << 56
+ROW_2 = 0xFF << 16
+ROW_5 = 0xFF << 40
+
+
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _mask(squares):
+    bits = 0
+    for sq in squares:
+        bits |= 1 << sq
+    return bits
+
+
+KNIGHT_BB = [_mask(targets) for targets in KNIGHT_TARGETS]
+KING_BB = [_mask(targets) for targets in KING_TARGETS]
+PAWN_ATTACK_BB = {color: [_mask(targets) for targets in table] for color, table in PAWN_ATTACKS.items()}
+
+
+def _rays(dr, dc):
+    table = []
+    for sq in range(64):
+        bits = 0
+        r, c = row_of(sq) + dr, col_of(sq) + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            bits |= 1 << square(r, c)
+            r += dr
+            c += dc
+        table.append(bits)
+    return table
+
+
+# Лучи в сторону роста номера клетки (первый блокирующий - младший бит) и убывания (старший бит)
+ROOK_UP = [_rays(1, 0), _rays(0, 1)]
+ROOK_DOWN = [_rays(-1, 0), _rays(0, -1)]
+BISHOP_UP = [_rays(1, 1), _rays(1, -1)]
+BISHOP_DOWN = [_rays(-1, -1), _rays(-1, 1)]
+
+
+def _between():
+    """BETWEEN[a][b] - клетки строго между a и b на одной линии (0, если клетки не на линии)."""
+    table = [[0] * 64 for _ in range(64)]
+    for rays in ROOK_UP + ROOK_DOWN + BISHOP_UP + BISHOP_DOWN:
+        for sq in range(64):
+            for t in iter_bits(rays[sq]):
+                table[sq][t] = rays[sq] & ~rays[t] & ~(1 << t)
+    return table
+
+
+def _slide(sq, occupied, up, down):
+    attacks = 0
+    for rays in up:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in down:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slide(sq, occupied, ROOK_UP, ROOK_DOWN)
+
+
+def bishop_attacks(sq, occupied):
+    return _slide(sq, occupied, BISHOP_UP, BISHOP_DOWN)
+
+
+BETWEEN = _between()
+
+
+class BitboardAttackInfo:
+    """Шахи и связки по битбордам для стороны, чья очередь ходить.
+
+    checkers - клетки шахующих фигур, pins - {клетка связанной фигуры: маска клеток на линии связки},
+    evasions - маска клеток, куда можно взять шахующую фигуру или закрыться (None без шаха),
+    danger - маска клеток, которые бьёт соперник, если убрать нашего короля (считается по первому запросу).
+    """
+
+    __slots__ = ("color", "checkers", "pins", "evasions", "danger")
+
+    def __init__(self, color, checkers, pins, evasions):
+        self.color = color
+        self.checkers = checkers
+        self.pins = pins
+        self.evasions = evasions
+        self.danger = None
+
+
+class BitboardPosition(ChessPosition):
+    def __init__(self):
+        super().__init__()
+        # Карт атак нет: шахи и связки считаются по битбордам
+        self.attacks = None
+        # bitboards[piece + 6], piece от -6 до 6
+        self.bitboards = [0] * 13
+        self.occupancy = {WHITE: 0, BLACK: 0}
+
+    def copy(self):
+        other = self.__class__()
+        other.board = self.board[:]
+        other.turn = self.turn
+        other.castling = self.castling
+        other.en_passant = self.en_passant
+        other.halfmove_clock = self.halfmove_clock
+        other.fullmove_number = self.fullmove_number
+        other.kings = dict(self.kings)
+        other.history = self.history[:]
+        other.key = self.key
+        other._info = self._info
+        other.mg = self.mg
+        other.eg = self.eg
+        other.phase = self.phase
+        other.pawn_key = self.pawn_key
+        other.bitboards = self.bitboards[:]
+        other.occupancy = dict(self.occupancy)
+        return other
+
+    def _lift(self, sq):
+        self._toggle(self.board[sq], 1 << sq)
+        self.board[sq] = EMPTY
+
+    def _drop(self, sq, piece):
+        self.board[sq] = piece
+        self._toggle(piece, 1 << sq)
+
+    def _toggle(self, piece, bits):
+        self.bitboards[piece + 6] ^= bits
+        color = WHITE if piece > 0 else BLACK
+        self.occupancy[color] ^= bits
+
+    def _attacked(self, sq, by_color, occupied):
+        """Бьёт ли клетку sq фигура цвета by_color при занятости occupied (пешки вне occupied не считаются)."""
+        bb = self.bitboards
+        if KNIGHT_BB[sq] & bb[by_color * KNIGHT + 6]:
+            return True
+        if PAWN_ATTACK_BB[-by_color][sq] & bb[by_color * PAWN + 6] & occupied:
+            return True
+        if KING_BB[sq] & bb[by_color * KING + 6]:
+            return True
+        queens = bb[by_color * QUEEN + 6]
+        if rook_attacks(sq, occupied) & (bb[by_color * ROOK + 6] | queens):
+            return True
+        return bool(bishop_attacks(sq, occupied) & (bb[by_color * BISHOP + 6] | queens))
+
+    def _attack_bits(self, color, occupied):
+        """Маска всех клеток, которые бьют фигуры цвета color при занятости occupied."""
+        bb = self.bitboards
+        pawns = bb[color * PAWN + 6]
+        if color == WHITE:
+            bits = (pawns & ~FILE_A) >> 9 | (pawns & ~FILE_H) >> 7
+        else:
+            bits = ((pawns & ~FILE_A) << 7 | (pawns & ~FILE_H) << 9) & FULL
+        for sq in iter_bits(bb[color * KNIGHT + 6]):
+            bits |= KNIGHT_BB[sq]
+        king = self.kings[color]
+        if king is not None:
+            bits |= KING_BB[king]
+        queens = bb[color * QUEEN + 6]
+        for sq in iter_bits(bb[color * BISHOP + 6] | queens):
+            bits |= bishop_attacks(sq, occupied)
+        for sq in iter_bits(bb[color * ROOK + 6] | queens):
+            bits |= rook_attacks(sq, occupied)
+        return bits
+
+    def _danger(self):
+        """Клетки, куда не может встать король стороны, чья очередь: король не заслоняет линию за собой."""
+        info = self.attack_info()
+        if info.danger is None:
+            color = self.turn
+            occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+            info.danger = self._attack_bits(-color, occupied ^ 1 << self.kings[color])
+        return info.danger
+
+    def is_attacked(self, sq, by_color):
+        return self._attacked(sq, by_color, self.occupancy[WHITE] | self.occupancy[BLACK])
+
+    def attackers(self, sq, by_color):
+        bb = self.bitboards
+        occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        queens = bb[by_color * QUEEN + 6]
+        bits = (
+            KNIGHT_BB[sq] & bb[by_color * KNIGHT + 6]
+            | PAWN_ATTACK_BB[-by_color][sq] & bb[by_color * PAWN + 6]
+            | KING_BB[sq] & bb[by_color * KING + 6]
+            | rook_attacks(sq, occupied) & (bb[by_color * ROOK + 6] | queens)
+            | bishop_attacks(sq, occupied) & (bb[by_color * BISHOP + 6] | queens)
+        )
+        return list(iter_bits(bits))
+
+    def attack_map(self, color):
+        """Карта ударов считается с нуля: это представление её не ведёт."""
+        return self.build_attack_map(color)
+
+    def pinned(self):
+        return {sq: set(iter_bits(line)) for sq, line in self.attack_info().pins.items()}
+
+    def _compute_attack_info(self):
+        us = self.turn
+        them = -us
+        king = self.kings[us]
+        if king is None:
+            return BitboardAttackInfo(us, [], {}, None)
+        bb = self.bitboards
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        queens = bb[them * QUEEN + 6]
+        rooks = bb[them * ROOK + 6] | queens
+        bishops = bb[them * BISHOP + 6] | queens
+        between = BETWEEN[king]
+
+        # Лучи от короля сквозь свои фигуры: первая фигура соперника на линии либо шахует, либо связывает
+        checkers = KNIGHT_BB[king] & bb[them * KNIGHT + 6] | PAWN_ATTACK_BB[us][king] & bb[them * PAWN + 6]
+        pins = {}
+        for slider in iter_bits(rook_attacks(king, enemy) & rooks | bishop_attacks(king, enemy) & bishops):
+            shields = between[slider] & own
+            if not shields:
+                checkers |= 1 << slider
+            elif not shields & (shields - 1):
+                pins[shields.bit_length() - 1] = between[slider] | 1 << slider
+
+        evasions = None
+        if checkers:
+            evasions = checkers
+            for checker in iter_bits(checkers):
+                evasions |= between[checker]
+        return BitboardAttackInfo(us, list(iter_bits(checkers)), pins, evasions)
+
+    def generate_moves(self, stage=GEN_ALL):
+        color = self.turn
+        bb = self.bitboards
+        own = self.occupancy[color]
+        enemy = self.occupancy[-color]
+        occupied = own | enemy
+        moves = []
+        append = moves.append
+        # Клетки, куда можно ходить на этой стадии
+        if stage == GEN_TACTICAL:
+            targets = enemy
+        elif stage == GEN_QUIET:
+            targets = ~occupied & FULL
+        else:
+            targets = ~own & FULL
+
+        self._pawn_bitboard_moves(color, bb[color * PAWN + 6], enemy, occupied, moves, stage)
+
+        for frm in iter_bits(bb[color * KNIGHT + 6]):
+            for to in iter_bits(KNIGHT_BB[frm] & targets):
+                append(frm | to << 6)
+        for frm in iter_bits(bb[color * BISHOP + 6] | bb[color * QUEEN + 6]):
+            for to in iter_bits(bishop_attacks(frm, occupied) & targets):
+                append(frm | to << 6)
+        for frm in iter_bits(bb[color * ROOK + 6] | bb[color * QUEEN + 6]):
+            for to in iter_bits(rook_attacks(frm, occupied) & targets):
+                append(frm | to << 6)
+
+        king = self.kings[color]
+        if king is not None:
+            for to in iter_bits(KING_BB[king] & targets):
+                append(king | to << 6)
+            if self.castling and stage != GEN_TACTICAL:
+                danger = None
+                for right, king_from, king_to, rook_from, _, empty, safe in CASTLING_RULES[color]:
+                    if king != king_from or not self.castling & right or not bb[color * ROOK + 6] >> rook_from & 1:
+                        continue
+                    if any(occupied >> sq & 1 for sq in empty):
+                        continue
+                    if danger is None:
+                        danger = self._danger()
+                    if any(danger >> sq & 1 for sq in safe):
+                        continue
+                    append(king_from | king_to << 6 | MOVE_CASTLE << 15)
+        return moves
+    def _pawn_bitboard_moves(self, color, pawns, enemy, occupied, moves, stage=GEN_ALL):
+        append = moves.append
+        empty = ~occupied & FULL
+        if color == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_5) >> 8) & empty
+            left = ((pawns & ~FILE_A) >> 9) & enemy
+            right = ((pawns & ~FILE_H) >> 7) & enemy
+            step, left_step, right_step, last_row = -8, -9, -7, ROW_0
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_2) << 8) & empty
+            left = ((pawns & ~FILE_A) << 7) & enemy & FULL
+            right = ((pawns & ~FILE_H) << 9) & enemy & FULL
+            step, left_step, right_step, last_row = 8, 7, 9, ROW_7
+
+        if stage == GEN_QUIET:
+            # Тихие ходы пешек - продвижения без превращения
+            for to in iter_bits(single & ~last_row):
+                append((to - step) | to << 6)
+            for to in iter_bits(double):
+                append((to - 2 * step) | to << 6 | MOVE_DOUBLE_PUSH << 15)
+            return
+        if stage == GEN_TACTICAL:
+            single &= last_row
+            double = 0
+
+        for targets, delta in ((single, step), (left, left_step), (right, right_step)):
+            for to in iter_bits(targets & ~last_row):
+                append((to - delta) | to << 6)
+            for to in iter_bits(targets & last_row):
+                for kind in PROMOTION_KINDS:
+                    append((to - delta) | to << 6 | kind << 12)
+        for to in iter_bits(double):
+            append((to - 2 * step) | to << 6 | MOVE_DOUBLE_PUSH << 15)
+
+        ep = self.en_passant
+        if ep is not None:
+            for frm in iter_bits(PAWN_ATTACK_BB[-color][ep] & pawns):
+                append(frm | ep << 6 | MOVE_EN_PASSANT << 15)
+
+
+    def _legal_iter(self, stage=GEN_ALL):
+        info = self.attack_info()
+        color = self.turn
+        king = self.kings[color]
+        pins = info.pins
+        evasions = info.evasions
+        double_check = len(info.checkers) > 1
+        occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        danger = None
+        for move in self.generate_moves(stage):
+            frm = move & 63
+            to = (move >> 6) & 63
+            flag = move >> 15
+            if frm == king:
+                if danger is None:
+                    danger = self._danger()
+                if not danger >> to & 1:
+                    yield move
+                continue
+            if double_check:
+                continue
+            if flag == MOVE_EN_PASSANT:
+                # Взятие на проходе снимает с линии сразу две пешки: смотрим на короля после хода
+                cap_sq = to + (8 if color == WHITE else -8)
+                after = occupied ^ (1 << frm | 1 << to | 1 << cap_sq)
+                if not self._attacked(king, -color, after):
+                    yield move
+                continue
+            if evasions is not None and not evasions >> to & 1:
+                continue
+            if frm in pins and not pins[frm] >> to & 1:
+                continue
+            yield move
+
+    def make_move(self, move):
+        """Сделать ход на доске и битбордах; прежние битборды остаются в стеке ходов для unmake_move."""
+        board = self.board
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 15
+        piece = board[frm]
+        color = self.turn
+        key = self.key
+        mg = self.mg
+        eg = self.eg
+        pawn_key = self.pawn_key
+
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        self.history.append((
+            move, board[to], self.castling, self.en_passant, self.halfmove_clock, self._info, key,
+            mg, eg, self.phase, pawn_key, (bitboards, occupancy),
+        ))
+        self._info = None
+        bb = self.bitboards = bitboards[:]
+        own = occupancy[color]
+        enemy = occupancy[-color]
+
+        if self.en_passant is not None:
+            key ^= self._en_passant_key()
+        key ^= PIECE_KEYS[piece + 6][frm]
+        mg -= MG_SCORES[piece + 6][frm]
+        eg -= EG_SCORES[piece + 6][frm]
+        if piece == color * PAWN:
+            pawn_key ^= PIECE_KEYS[piece + 6][frm]
+        board[frm] = EMPTY
+        bb[piece + 6] ^= 1 << frm
+        own ^= 1 << frm
+        if flag == MOVE_EN_PASSANT:
+            captured = -color * PAWN
+            cap_sq = to + (8 if color == WHITE else -8)
+            board[cap_sq] = EMPTY
+            bb[captured + 6] ^= 1 << cap_sq
+            enemy ^= 1 << cap_sq
+            key ^= PIECE_KEYS[captured + 6][cap_sq]
+            pawn_key ^= PIECE_KEYS[captured + 6][cap_sq]
+            mg -= MG_SCORES[captured + 6][cap_sq]
+            eg -= EG_SCORES[captured + 6][cap_sq]
+        else:
+            captured = board[to]
+            if captured:
+                bb[captured + 6] ^= 1 << to
+                enemy ^= 1 << to
+                key ^= PIECE_KEYS[captured + 6][to]
+                mg -= MG_SCORES[captured + 6][to]
+                eg -= EG_SCORES[captured + 6][to]
+                self.phase -= PHASE[captured + 6]
+                if captured == -color * PAWN:
+                    pawn_key ^= PIECE_KEYS[captured + 6][to]
+            if flag == MOVE_CASTLE:
+                for _, _, king_to, rook_from, rook_to, _, _ in CASTLING_RULES[color]:
+                    if king_to == to:
+                        rook = board[rook_from]
+                        board[rook_from] = EMPTY
+                        board[rook_to] = rook
+                        bb[rook + 6] ^= 1 << rook_from | 1 << rook_to
+                        own ^= 1 << rook_from | 1 << rook_to
+                        key ^= PIECE_KEYS[rook + 6][rook_from] ^ PIECE_KEYS[rook + 6][rook_to]
+                        mg += MG_SCORES[rook + 6][rook_to] - MG_SCORES[rook + 6][rook_from]
+                        eg += EG_SCORES[rook + 6][rook_to] - EG_SCORES[rook + 6][rook_from]
+        promotion = (move >> 12) & 7
+        if promotion:
+            piece = color * promotion
+            self.phase += PHASE[piece + 6]
+        elif piece == color * PAWN:
+            pawn_key ^= PIECE_KEYS[piece + 6][to]
+        board[to] = piece
+        bb[piece + 6] ^= 1 << to
+        own ^= 1 << to
+        self.occupancy = {color: own, -color: enemy}
+        key ^= PIECE_KEYS[piece + 6][to]
+        mg += MG_SCORES[piece + 6][to]
+        eg += EG_SCORES[piece + 6][to]
+        self.mg = mg
+        self.eg = eg
+        self.pawn_key = pawn_key
+        if piece == color * KING:
+            self.kings[color] = to
+
+        castling = self.castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        if castling != self.castling:
+            key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+            self.castling = castling
+        if captured or piece == color * PAWN or promotion:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if color == BLACK:
+            self.fullmove_number += 1
+        self.turn = -color
+        if flag == MOVE_DOUBLE_PUSH:
+            self.en_passant = (frm + to) >> 1
+            key ^= self._en_passant_key()
+        else:
+            self.en_passant = None
+        self.key = key ^ SIDE_KEY
+        return captured
+
+    def unmake_move(self):
+        (
+            move, captured, castling, en_passant, halfmove_clock, self._info, self.key,
+            self.mg, self.eg, self.phase, self.pawn_key, (self.bitboards, self.occupancy),
+        ) = self.history.pop()
+        board = self.board
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 15
+        color = -self.turn
+        piece = board[to]
+        if (move >> 12) & 7:
+            piece = color * PAWN
+
+        board[frm] = piece
+        if piece == color * KING:
+            self.kings[color] = frm
+        board[to] = captured
+        if flag == MOVE_EN_PASSANT:
+            board[to + (8 if color == WHITE else -8)] = -color * PAWN
+        elif flag == MOVE_CASTLE:
+            for _, _, king_to, rook_from, rook_to, _, _ in CASTLING_RULES[color]:
+                if king_to == to:
+                    board[rook_from] = board[rook_to]
+                    board[rook_to] = EMPTY
+
+        self.castling = castling
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove_clock
+        if color == BLACK:
+            self.fullmove_number -= 1
+        self.turn = color
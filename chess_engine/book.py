@@ -0,0 +1,141 @@
+"""Дебютная книга: отсортированные записи фиксированной длины в двоичном файле.
+
+Запись - 16 байт: ключ Зобриста (8), ход (4), вес (2), резерв (2).
+Файл открывается через mmap и ищется двоичным поиском, поэтому
+загрузка не зависит от размера книги.
+
+    python -m chess_engine.book build games.pgn -o assets/book.bin --max-ply 20
+    python -m chess_engine.book probe --fen "<FEN>" --book assets/book.bin
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+from .notation import game_start_fen, move_san, parse_san, read_pgn
+from .position import ChessPosition, START_FEN
+
+RECORD = struct.Struct("<QIH2x")
+MAX_WEIGHT = 0xFFFF
+DEFAULT_BOOK_PATH = os.path.join("assets", "book.bin")
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = size // RECORD.size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+    def close(self):
+        if self.count:
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key_at(self, index):
+        return struct.unpack_from("<Q", self.data, index * RECORD.size)[0]
+
+    def entries(self, key):
+        """Все (ход, вес) для позиции с ключом key."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        result = []
+        while lo < self.count:
+            record_key, move, weight = RECORD.unpack_from(self.data, lo * RECORD.size)
+            if record_key != key:
+                break
+            result.append((move, weight))
+            lo += 1
+        return result
+
+    def choose(self, position, rng=random):
+        """Случайный ход из книги с учётом весов; None, если позиции в книге нет."""
+        legal = set(position.legal_moves())
+        candidates = [(move, weight) for move, weight in self.entries(position.key) if move in legal]
+        if not candidates:
+            return None
+        total = sum(weight for _, weight in candidates)
+        pick = rng.uniform(0, total)
+        for move, weight in candidates:
+            pick -= weight
+            if pick <= 0:
+                return move
+        return candidates[-1][0]
+
+
+def open_book(path=DEFAULT_BOOK_PATH):
+    """Книга по пути path или None, если файла нет."""
+    if path and os.path.exists(path):
+        return OpeningBook(path)
+    return None
+
+
+def build_book(pgn_paths, out_path, max_ply=20, min_count=1):
+    """Собрать книгу из партий PGN. Возвращает число записей."""
+    counts = {}
+    for pgn_path in pgn_paths:
+        with open(pgn_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        for headers, sans in read_pgn(text):
+            position = ChessPosition.from_fen(game_start_fen(headers))
+            for san in sans[:max_ply]:
+                move = parse_san(position, san)
+                if move is None:
+                    break
+                entry = (position.key, move)
+                counts[entry] = counts.get(entry, 0) + 1
+                position.make_move(move)
+
+    records = sorted((key, move, min(count, MAX_WEIGHT)) for (key, move), count in counts.items() if count >= min_count)
+    with open(out_path, "wb") as f:
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Дебютная книга chess_engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="собрать книгу из PGN")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("-o", "--output", default=DEFAULT_BOOK_PATH)
+    build.add_argument("--max-ply", type=int, default=20)
+    build.add_argument("--min-count", type=int, default=1)
+
+    probe = commands.add_parser("probe", help="показать ходы книги для позиции")
+    probe.add_argument("--fen", default=START_FEN)
+    probe.add_argument("--book", default=DEFAULT_BOOK_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        count = build_book(args.pgn, args.output, args.max_ply, args.min_count)
+        print(f"{args.output}: {count} записей")
+        return 0
+
+    position = ChessPosition.from_fen(args.fen)
+    with OpeningBook(args.book) as book:
+        entries = sorted(book.entries(position.key), key=lambda entry: -entry[1])
+        for move, weight in entries:
+            print(f"{move_san(position, move)}: {weight}")
+        if not entries:
+            print("позиции нет в книге")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
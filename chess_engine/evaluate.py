@@ -0,0 +1,167 @@
+"""Оценка позиции: материал и таблицы положения фигур с плавным переходом
+от миттельшпиля к эндшпилю плюс пешечная структура.
+
+Суммы по таблицам позиция ведёт сама в make_move (position.mg, .eg, .phase),
+поэтому в листе перебора доска не просматривается. Пешечная структура
+меняется редко и кэшируется в таблице по ключу Зобриста пешек.
+
+    python -m chess_engine.evaluate --positions 2000   # стоимость одного вызова
+"""
+import argparse
+import random
+import sys
+import time
+from array import array
+
+from .position import ChessPosition, START_FEN, WHITE, BLACK, PAWN, row_of, col_of
+from .pst import MG_VALUES, MG_SCORES, EG_SCORES, PHASE, MAX_PHASE
+
+PIECE_VALUES = MG_VALUES
+
+DOUBLED = (-10, -20)
+ISOLATED = (-10, -15)
+# Проходная пешка по номеру горизонтали от своего края (1 - исходная линия пешек)
+PASSED_MG = [0, 5, 10, 20, 35, 60, 100, 0]
+PASSED_EG = [0, 10, 20, 40, 70, 120, 200, 0]
+
+
+class PawnHashTable:
+    """Оценка пешечной структуры (mg, eg) для белых по ключу пешек."""
+
+    def __init__(self, size=1 << 14):
+        self.mask = size - 1
+        self.keys = array("Q", bytes(8 * size))
+        self.mg = array("i", bytes(4 * size))
+        self.eg = array("i", bytes(4 * size))
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, position):
+        self.probes += 1
+        key = position.pawn_key
+        index = key & self.mask
+        # Пустая ячейка совпадает с ключом 0 (нет пешек) и хранит нулевую оценку - это верно
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.mg[index], self.eg[index]
+        mg, eg = pawn_structure(position.board)
+        self.keys[index] = key
+        self.mg[index] = mg
+        self.eg[index] = eg
+        return mg, eg
+
+
+def pawn_structure(board):
+    """Сдвоенные, изолированные и проходные пешки: (mg, eg) с точки зрения белых."""
+    pawns = {WHITE: [], BLACK: []}
+    files = {WHITE: [0] * 8, BLACK: [0] * 8}
+    for sq, piece in enumerate(board):
+        if piece == PAWN or piece == -PAWN:
+            color = WHITE if piece > 0 else BLACK
+            pawns[color].append(sq)
+            files[color][col_of(sq)] += 1
+
+    mg = eg = 0
+    for color in (WHITE, BLACK):
+        own = files[color]
+        side_mg = side_eg = 0
+        for col in range(8):
+            if own[col] > 1:
+                side_mg += DOUBLED[0] * (own[col] - 1)
+                side_eg += DOUBLED[1] * (own[col] - 1)
+            if own[col] and not (col > 0 and own[col - 1]) and not (col < 7 and own[col + 1]):
+                side_mg += ISOLATED[0] * own[col]
+                side_eg += ISOLATED[1] * own[col]
+        for sq in pawns[color]:
+            row, col = row_of(sq), col_of(sq)
+            blocked = False
+            for other in pawns[-color]:
+                other_row = row_of(other)
+                ahead = other_row < row if color == WHITE else other_row > row
+                if ahead and abs(col_of(other) - col) <= 1:
+                    blocked = True
+                    break
+            if not blocked:
+                rank = 7 - row if color == WHITE else row
+                side_mg += PASSED_MG[rank]
+                side_eg += PASSED_EG[rank]
+        mg += color * side_mg
+        eg += color * side_eg
+    return mg, eg
+
+
+DEFAULT_PAWN_TABLE = PawnHashTable()
+
+
+def evaluate(position, pawn_table=DEFAULT_PAWN_TABLE):
+    """Оценка в сантипешках с точки зрения стороны, чья очередь ходить."""
+    pawn_mg, pawn_eg = pawn_table.probe(position)
+    phase = min(position.phase, MAX_PHASE)
+    score = ((position.mg + pawn_mg) * phase + (position.eg + pawn_eg) * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if position.turn == WHITE else -score
+
+
+def evaluate_full(position):
+    """Та же оценка с полным просмотром доски - для проверки и сравнения скорости."""
+    mg = eg = phase = 0
+    for sq, piece in enumerate(position.board):
+        if piece:
+            mg += MG_SCORES[piece + 6][sq]
+            eg += EG_SCORES[piece + 6][sq]
+            phase += PHASE[piece + 6]
+    pawn_mg, pawn_eg = pawn_structure(position.board)
+    phase = min(phase, MAX_PHASE)
+    score = ((mg + pawn_mg) * phase + (eg + pawn_eg) * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if position.turn == WHITE else -score
+
+
+def sample_positions(count, seed=1, max_plies=80):
+    """Позиции из случайных партий от начальной позиции."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = ChessPosition.from_fen(START_FEN)
+        for _ in range(rng.randrange(max_plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+        positions.append(position)
+    return positions
+
+
+def measure(positions, repeat=5):
+    """Микросекунд на вызов: (evaluate, evaluate_full), доля попаданий в пешечную таблицу."""
+    table = PawnHashTable()
+    for position in positions:
+        if evaluate(position, table) != evaluate_full(position):
+            raise ValueError(f"Оценки расходятся: {position.fen()}")
+    table.probes = table.hits = 0
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for position in positions:
+            evaluate(position, table)
+    incremental = (time.perf_counter() - start) / (repeat * len(positions))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for position in positions:
+            evaluate_full(position)
+    full = (time.perf_counter() - start) / (repeat * len(positions))
+    return incremental * 1e6, full * 1e6, table.hits / table.probes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Стоимость оценки позиции chess_engine")
+    parser.add_argument("--positions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    incremental, full, hit_rate = measure(sample_positions(args.positions), args.repeat)
+    print(f"инкрементальная: {incremental:.2f} мкс/вызов (пешечная таблица {hit_rate:.0%} попаданий)")
+    print(f"полный просмотр: {full:.2f} мкс/вызов")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
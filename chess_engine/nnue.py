@@ -0,0 +1,390 @@
+"""Оценка позиции небольшой нейросетью в духе NNUE (нужен NumPy, считается на процессоре).
+
+Вход - 768 признаков «фигура на поле», отдельно со стороны белых и со стороны
+чёрных (доска перевёрнута, свои и чужие фигуры меняются местами). Первый слой -
+накопитель: сумма строк весов по всем фигурам на доске. В листе перебора он не
+пересчитывается: make_move прибавляет и вычитает несколько строк, unmake_move
+снимает накопитель со стека. Дальше - два маленьких слоя с ограниченным ReLU,
+первым в них идёт накопитель стороны, чья очередь ходить.
+
+Веса хранятся файлами .npy в одной папке (имена в WEIGHT_FILES). Обучить сеть
+на оценке evaluate по позициям из случайных партий и сравнить её с ручной оценкой:
+
+    python -m chess_engine.nnue train --positions 20000 --out assets/nnue
+    python -m chess_engine.nnue bench --weights assets/nnue --games 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .position import WHITE, BLACK, PAWN, ROOK, KING, MOVE_EN_PASSANT, MOVE_CASTLE, CASTLING_RULES
+
+FEATURES = 768
+WEIGHT_FILES = ("ft_weight", "ft_bias", "l1_weight", "l1_bias", "out_weight", "out_bias")
+# Выход сети - в пешках
+SCALE = 100
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для оценки нейросетью нужен NumPy: pip install numpy")
+
+
+def feature_index(piece, sq, perspective):
+    """Номер признака фигуры piece на поле sq для накопителя стороны perspective."""
+    if perspective == BLACK:
+        sq ^= 56
+    own = (piece > 0) == (perspective == WHITE)
+    return ((abs(piece) - 1) + (0 if own else 6)) * 64 + sq
+
+
+def board_features(board, perspective):
+    return [feature_index(piece, sq, perspective) for sq, piece in enumerate(board) if piece]
+
+
+class NnueMixin:
+    """Позиция с накопителями первого слоя; network и accumulators задаёт Network.attach."""
+
+    network = None
+
+    def copy(self):
+        other = super().copy()
+        other.network = self.network
+        other.accumulators = self.accumulators[:]
+        return other
+
+    def make_move(self, move):
+        board = self.board
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 15
+        color = self.turn
+        piece = board[frm]
+        rows = self.network.rows
+        accumulator = self.accumulators[-1] - rows[piece + 6][frm]
+        if flag == MOVE_EN_PASSANT:
+            accumulator -= rows[6 - color * PAWN][to + (8 if color == WHITE else -8)]
+        elif board[to]:
+            accumulator -= rows[board[to] + 6][to]
+        if flag == MOVE_CASTLE:
+            rook = rows[color * ROOK + 6]
+            for _, _, king_to, rook_from, rook_to, _, _ in CASTLING_RULES[color]:
+                if king_to == to:
+                    accumulator += rook[rook_to] - rook[rook_from]
+        promotion = (move >> 12) & 7
+        accumulator += rows[(color * promotion if promotion else piece) + 6][to]
+        self.accumulators.append(accumulator)
+        return super().make_move(move)
+
+    def unmake_move(self):
+        self.accumulators.pop()
+        super().unmake_move()
+
+
+_POSITION_CLASSES = {}
+
+
+def _nnue_class(base):
+    cls = _POSITION_CLASSES.get(base)
+    if cls is None:
+        cls = type("Nnue" + base.__name__, (NnueMixin, base), {})
+        _POSITION_CLASSES[base] = cls
+    return cls
+
+
+class Network:
+    """Веса сети: ft - накопитель (768 x hidden), l1 - (2*hidden x l1), out - (l1,)."""
+
+    def __init__(self, ft_weight, ft_bias, l1_weight, l1_bias, out_weight, out_bias):
+        _require_numpy()
+        self.ft_weight = np.asarray(ft_weight, dtype=np.float32)
+        self.ft_bias = np.asarray(ft_bias, dtype=np.float32)
+        self.l1_weight = np.asarray(l1_weight, dtype=np.float32)
+        self.l1_bias = np.asarray(l1_bias, dtype=np.float32)
+        self.out_weight = np.asarray(out_weight, dtype=np.float32)
+        self.out_bias = np.asarray(out_bias, dtype=np.float32).reshape(())
+        hidden = self.ft_bias.shape[0] if self.ft_bias.ndim == 1 else -1
+        if (
+            self.ft_weight.shape != (FEATURES, hidden)
+            or self.l1_weight.ndim != 2 or self.l1_weight.shape[0] != 2 * hidden
+            or self.l1_bias.shape != self.l1_weight.shape[1:]
+            or self.out_weight.shape != self.l1_weight.shape[1:]
+        ):
+            raise ValueError("Размеры весов сети не согласованы")
+        self.hidden = hidden
+        self._build_rows()
+
+    def _build_rows(self):
+        # rows[piece + 6][sq] - вклад фигуры в оба накопителя сразу, массив (2, hidden)
+        ft = self.ft_weight
+        self.rows = [None] * 13
+        for piece in range(-KING, KING + 1):
+            if piece:
+                self.rows[piece + 6] = [
+                    np.stack([ft[feature_index(piece, sq, WHITE)], ft[feature_index(piece, sq, BLACK)]])
+                    for sq in range(64)
+                ]
+
+    @classmethod
+    def random(cls, hidden=64, l1=16, seed=1):
+        rng = np.random.default_rng(seed)
+        return cls(
+            rng.normal(0, 0.05, (FEATURES, hidden)),
+            np.full(hidden, 0.5),
+            rng.normal(0, 1 / np.sqrt(2 * hidden), (2 * hidden, l1)),
+            np.zeros(l1),
+            rng.normal(0, 1 / np.sqrt(l1), l1),
+            0.0,
+        )
+
+    def weights(self):
+        return dict(zip(WEIGHT_FILES, (
+            self.ft_weight, self.ft_bias, self.l1_weight, self.l1_bias, self.out_weight, self.out_bias,
+        )))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, value in self.weights().items():
+            np.save(os.path.join(directory, name + ".npy"), value)
+
+    def refresh(self, board):
+        """Накопители (2, hidden) с нуля по доске."""
+        accumulator = np.empty((2, self.hidden), dtype=np.float32)
+        accumulator[0] = self.ft_bias + self.ft_weight[board_features(board, WHITE)].sum(axis=0)
+        accumulator[1] = self.ft_bias + self.ft_weight[board_features(board, BLACK)].sum(axis=0)
+        return accumulator
+
+    def attach(self, position):
+        """Копия позиции, которая ведёт накопители в make_move/unmake_move."""
+        attached = position.copy()
+        if not isinstance(attached, NnueMixin):
+            # Тот же класс доски плюс накопители: состояние уже скопировано, меняется только тип
+            attached.__class__ = _nnue_class(type(position))
+        attached.network = self
+        attached.accumulators = [self.refresh(position.board)]
+        return attached
+
+    def forward(self, inputs):
+        """Накопители стороны, чья очередь, и соперника (N, 2*hidden) -> оценки в пешках (N,)."""
+        hidden = np.clip(np.clip(inputs, 0, 1) @ self.l1_weight + self.l1_bias, 0, 1)
+        return hidden @ self.out_weight + self.out_bias
+
+    def evaluate(self, position):
+        """Оценка в сантипешках для стороны, чья очередь ходить (позиция из attach)."""
+        accumulator = position.accumulators[-1]
+        inputs = accumulator.ravel() if position.turn == WHITE else accumulator[::-1].ravel()
+        hidden = np.clip(np.clip(inputs, 0, 1) @ self.l1_weight + self.l1_bias, 0, 1)
+        return int(SCALE * float(hidden @ self.out_weight + self.out_bias))
+
+    def evaluate_batch(self, positions):
+        """Оценки многих позиций одним умножением матриц; позиции без накопителей считаются с нуля."""
+        inputs = np.empty((len(positions), 2 * self.hidden), dtype=np.float32)
+        for index, position in enumerate(positions):
+            if isinstance(position, NnueMixin) and position.network is self:
+                accumulator = position.accumulators[-1]
+            else:
+                accumulator = self.refresh(position.board)
+            inputs[index] = accumulator.ravel() if position.turn == WHITE else accumulator[::-1].ravel()
+        return (SCALE * self.forward(inputs)).astype(np.int64)
+
+
+def load_network(directory):
+    """Сеть из папки с файлами WEIGHT_FILES .npy; ValueError, если файла нет."""
+    _require_numpy()
+    arrays = []
+    for name in WEIGHT_FILES:
+        path = os.path.join(directory, name + ".npy")
+        if not os.path.exists(path):
+            raise ValueError(f"Нет файла весов сети: {path}")
+        arrays.append(np.load(path))
+    return Network(*arrays)
+
+
+def _training_features(positions):
+    """Номера признаков (стороны, чья очередь, и соперника), дополненные до 32 пустым признаком."""
+    us = np.full((len(positions), 32), FEATURES, dtype=np.int32)
+    them = np.full((len(positions), 32), FEATURES, dtype=np.int32)
+    for index, position in enumerate(positions):
+        turn = position.turn
+        own = board_features(position.board, turn)
+        other = board_features(position.board, -turn)
+        us[index, :len(own)] = own
+        them[index, :len(other)] = other
+    return us, them
+
+
+def train(network, positions, targets, epochs=20, batch=256, rate=1e-2, seed=1, report=None):
+    """Подогнать веса к оценкам targets (сантипешки для стороны, чья очередь) методом Adam."""
+    rng = np.random.default_rng(seed)
+    us, them = _training_features(positions)
+    targets = np.clip(np.asarray(targets, dtype=np.float32), -1000, 1000) / SCALE
+    # Лишняя нулевая строка - вклад пустого признака, которым дополнены списки
+    ft = np.vstack([network.ft_weight, np.zeros((1, network.hidden), dtype=np.float32)])
+    params = [ft, network.ft_bias, network.l1_weight, network.l1_bias, network.out_weight, network.out_bias]
+    params = [np.array(param, dtype=np.float32) for param in params]
+    moments = [np.zeros_like(param) for param in params]
+    squares = [np.zeros_like(param) for param in params]
+    step = 0
+    for epoch in range(epochs):
+        order = rng.permutation(len(targets))
+        total = 0.0
+        for begin in range(0, len(order), batch):
+            rows = order[begin:begin + batch]
+            ft, ft_bias, l1_weight, l1_bias, out_weight, out_bias = params
+            acc_us = ft[us[rows]].sum(axis=1) + ft_bias
+            acc_them = ft[them[rows]].sum(axis=1) + ft_bias
+            inputs = np.clip(np.hstack([acc_us, acc_them]), 0, 1)
+            pre = inputs @ l1_weight + l1_bias
+            hidden = np.clip(pre, 0, 1)
+            error = hidden @ out_weight + out_bias - targets[rows]
+            total += float((error * error).sum())
+
+            d_out = 2 * error / len(rows)
+            d_pre = np.outer(d_out, out_weight) * ((pre > 0) & (pre < 1))
+            d_inputs = d_pre @ l1_weight.T
+            d_acc = d_inputs * ((inputs > 0) & (inputs < 1))
+            d_ft = np.zeros_like(ft)
+            hidden_size = network.hidden
+            np.add.at(d_ft, us[rows], d_acc[:, None, :hidden_size])
+            np.add.at(d_ft, them[rows], d_acc[:, None, hidden_size:])
+            d_ft[FEATURES] = 0
+            grads = [
+                d_ft, d_acc[:, :hidden_size].sum(axis=0) + d_acc[:, hidden_size:].sum(axis=0),
+                inputs.T @ d_pre, d_pre.sum(axis=0), hidden.T @ d_out, d_out.sum(),
+            ]
+            step += 1
+            for param, grad, moment, square in zip(params, grads, moments, squares):
+                moment *= 0.9
+                moment += 0.1 * grad
+                square *= 0.999
+                square += 0.001 * grad * grad
+                param -= rate * (moment / (1 - 0.9 ** step)) / (np.sqrt(square / (1 - 0.999 ** step)) + 1e-8)
+        if report is not None:
+            report(epoch + 1, SCALE * (total / len(order)) ** 0.5)
+    ft, ft_bias, l1_weight, l1_bias, out_weight, out_bias = params
+    return Network(ft[:FEATURES], ft_bias, l1_weight, l1_bias, out_weight, out_bias)
+
+
+def measure(network, positions, repeat=3):
+    """Оценок в секунду: ручная, сеть по одной, сеть с нуля, сеть пачкой; и цена make+unmake."""
+    from .evaluate import evaluate
+
+    attached = [network.attach(position) for position in positions]
+    rates = {}
+
+    def rate(name, function, count):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        rates[name] = repeat * count / (time.perf_counter() - start)
+
+    rate("ручная оценка", lambda: [evaluate(position) for position in positions], len(positions))
+    rate("сеть, накопитель", lambda: [network.evaluate(position) for position in attached], len(positions))
+    rate(
+        "сеть с нуля",
+        lambda: [network.evaluate(network.attach(position)) for position in positions],
+        len(positions),
+    )
+    rate("сеть пачкой", lambda: network.evaluate_batch(attached), len(positions))
+
+    rng = random.Random(1)
+    pairs = []
+    for plain, nnue in zip(positions, attached):
+        moves = plain.legal_moves()
+        if moves:
+            pairs.append((plain, nnue, rng.choice(moves)))
+
+    def make_unmake(index):
+        for pair in pairs:
+            pair[index].make_move(pair[2])
+            pair[index].unmake_move()
+
+    rate("make+unmake", lambda: make_unmake(0), len(pairs))
+    rate("make+unmake с сетью", lambda: make_unmake(1), len(pairs))
+    return rates
+
+
+def check_incremental(network, position, plies=200, seed=1):
+    """Сверить накопитель после случайных ходов с пересчётом с нуля; ValueError при расхождении."""
+    rng = random.Random(seed)
+    position = network.attach(position)
+    for _ in range(plies):
+        moves = position.legal_moves()
+        if not moves:
+            break
+        position.make_move(rng.choice(moves))
+        if not np.allclose(position.accumulators[-1], network.refresh(position.board), atol=1e-3):
+            raise ValueError(f"Накопитель разошёлся с пересчётом: {position.fen()}")
+        if rng.random() < 0.2:
+            position.unmake_move()
+
+
+def main(argv=None):
+    from .evaluate import evaluate, sample_positions
+
+    parser = argparse.ArgumentParser(description="Оценка позиции нейросетью для chess_engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="обучить сеть на ручной оценке")
+    train_parser.add_argument("--positions", type=int, default=20000)
+    train_parser.add_argument("--epochs", type=int, default=20)
+    train_parser.add_argument("--hidden", type=int, default=64)
+    train_parser.add_argument("--out", default="assets/nnue")
+    bench_parser = commands.add_parser("bench", help="скорость и сила против ручной оценки")
+    bench_parser.add_argument("--weights", default="assets/nnue")
+    bench_parser.add_argument("--positions", type=int, default=2000)
+    bench_parser.add_argument("--games", type=int, default=20, help="партий матча (0 - без матча)")
+    bench_parser.add_argument("--depth", type=int, default=3)
+    bench_parser.add_argument("--workers", type=int, default=1)
+    bench_parser.add_argument("--out", default="nnue_match.jsonl")
+    args = parser.parse_args(argv)
+
+    try:
+        _require_numpy()
+    except ImportError as error:
+        print(error)
+        return 1
+
+    if args.command == "train":
+        positions = sample_positions(args.positions)
+        targets = [evaluate(position) for position in positions]
+        network = train(
+            Network.random(args.hidden), positions, targets, args.epochs,
+            report=lambda epoch, loss: print(f"эпоха {epoch}: ошибка {loss:.0f} сантипешек", flush=True),
+        )
+        network.save(args.out)
+        print(f"веса сохранены в {args.out}")
+        return 0
+
+    try:
+        network = load_network(args.weights)
+    except ValueError as error:
+        print(error)
+        return 1
+    positions = sample_positions(args.positions, seed=2)
+    check_incremental(network, positions[-1])
+    hand = np.array([evaluate(position) for position in positions])
+    learned = network.evaluate_batch(positions)
+    print(f"средняя разница с ручной оценкой: {np.abs(hand - learned).mean():.0f} сантипешек")
+    for name, value in measure(network, positions).items():
+        print(f"{name:22} {value:>10.0f} в с")
+
+    if args.games:
+        from .tournament import ENGINE_DEFAULTS, make_tasks, load_openings, run_match
+
+        first = dict(ENGINE_DEFAULTS, name="nnue", depth=args.depth, nnue=args.weights)
+        second = dict(ENGINE_DEFAULTS, name="ручная", depth=args.depth)
+        tasks = make_tasks(first, second, load_openings(), args.games, (600.0, 0.0))
+        stats = run_match(tasks, args.workers, args.out, "nnue", "ручная")
+        print(stats.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Запись ходов: SAN, UCI и чтение партий PGN."""
+import re
+
+from .position import (
+    PAWN,
+    PIECE_CHARS,
+    MOVE_CASTLE,
+    MOVE_EN_PASSANT,
+    START_FEN,
+    col_of,
+    move_from,
+    move_to,
+    move_promotion,
+    move_uci,
+    row_of,
+    square_name,
+)
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+def move_san(position, move, legal_moves=None):
+    """Короткая алгебраическая запись хода для позиции до хода."""
+    if legal_moves is None:
+        legal_moves = position.legal_moves()
+    frm = move_from(move)
+    to = move_to(move)
+    kind = abs(position.board[frm])
+
+    if move >> 15 == MOVE_CASTLE:
+        text = "O-O" if col_of(to) > col_of(frm) else "O-O-O"
+    else:
+        capture = bool(position.board[to]) or move >> 15 == MOVE_EN_PASSANT
+        if kind == PAWN:
+            text = square_name(frm)[0] + "x" if capture else ""
+            text += square_name(to)
+            if move_promotion(move):
+                text += "=" + PIECE_CHARS[move_promotion(move)]
+        else:
+            text = PIECE_CHARS[kind]
+            rivals = [
+                other for other in legal_moves
+                if other != move
+                and move_to(other) == to
+                and abs(position.board[move_from(other)]) == kind
+            ]
+            if rivals:
+                same_col = any(col_of(move_from(other)) == col_of(frm) for other in rivals)
+                same_row = any(row_of(move_from(other)) == row_of(frm) for other in rivals)
+                if not same_col:
+                    text += square_name(frm)[0]
+                elif not same_row:
+                    text += square_name(frm)[1]
+                else:
+                    text += square_name(frm)
+            if capture:
+                text += "x"
+            text += square_name(to)
+
+    position.make_move(move)
+    if position.in_check(position.turn):
+        text += "+" if position.has_legal_move() else "#"
+    position.unmake_move()
+    return text
+
+
+def _strip_san(text):
+    return text.replace("0-0-0", "O-O-O").replace("0-0", "O-O").rstrip("+#!?")
+
+
+def parse_san(position, text):
+    """Найти легальный ход по записи SAN; None, если такого хода нет."""
+    wanted = _strip_san(text)
+    legal_moves = position.legal_moves()
+    for move in legal_moves:
+        if _strip_san(move_san(position, move, legal_moves)) == wanted:
+            return move
+    return None
+
+
+def parse_uci(position, text):
+    """Найти легальный ход по записи вида e2e4 или e7e8q."""
+    text = text.strip().lower()
+    for move in position.legal_moves():
+        if move_uci(move) == text:
+            return move
+    return None
+
+
+_COMMENT = re.compile(r"\{[^}]*\}|;[^\n]*")
+_MOVE_NUMBER = re.compile(r"^\d+\.+")
+
+
+def _tokens(movetext):
+    movetext = _COMMENT.sub(" ", movetext)
+    depth = 0
+    clean = []
+    for ch in movetext:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif not depth:
+            clean.append(ch)
+    for token in "".join(clean).split():
+        token = _MOVE_NUMBER.sub("", token)
+        if not token or token.startswith("$") or token in RESULTS:
+            continue
+        yield token
+
+
+def read_pgn(text):
+    """Разобрать текст PGN: выдаёт (заголовки, список ходов SAN) для каждой партии."""
+    headers = {}
+    movetext = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            if movetext:
+                yield headers, list(_tokens(" ".join(movetext)))
+                headers = {}
+                movetext = []
+            match = re.match(r'\[(\w+)\s+"(.*)"\]', stripped)
+            if match:
+                headers[match.group(1)] = match.group(2)
+        elif stripped:
+            movetext.append(stripped)
+    if movetext:
+        yield headers, list(_tokens(" ".join(movetext)))
+
+
+def game_start_fen(headers):
+    return headers.get("FEN", START_FEN)
@@ -0,0 +1,197 @@
+"""Порядок ходов для перебора: ход из таблицы транспозиций, взятия по MVV-LVA,
+ходы-убийцы и таблица истории.
+
+Ходы выдаются по стадиям: сначала строятся только взятия и превращения, тихие
+ходы генерируются, лишь если до них дошло дело (после взятия часто уже отсечение).
+
+    python -m chess_engine.ordering --depth 4   # узлы на эталонных позициях по уровням
+
+Уровни none и tt (ходы в порядке генерации) дают на порядок больше узлов и
+считаются десятки минут, поэтому по умолчанию база сравнения - mvv-lva.
+"""
+import argparse
+import sys
+import time
+
+from .position import ChessPosition, GEN_TACTICAL, GEN_QUIET, MOVE_EN_PASSANT, PAWN, WHITE
+from .pst import MG_VALUES
+
+# Уровни упорядочивания основного перебора: каждый добавляет эвристику к предыдущему
+ORDER_NONE = 0
+ORDER_TT = 1
+ORDER_MVV_LVA = 2
+ORDER_KILLERS = 3
+ORDER_HISTORY = 4
+ORDER_LEVELS = {
+    "none": ORDER_NONE,
+    "tt": ORDER_TT,
+    "mvv-lva": ORDER_MVV_LVA,
+    "killers": ORDER_KILLERS,
+    "history": ORDER_HISTORY,
+}
+
+MAX_PLY = 128
+HISTORY_LIMIT = 1 << 20
+
+
+def mvv_lva(board, move):
+    """Сначала самая ценная жертва, при равной - самый дешёвый нападающий.
+
+    Превращение без взятия оказывается после всех взятий; бонус за превращение
+    на эталонных позициях только увеличивал форсированный вариант.
+    """
+    victim = board[(move >> 6) & 63]
+    if move >> 15 == MOVE_EN_PASSANT:
+        victim = PAWN
+    return 10 * MG_VALUES[abs(victim)] - MG_VALUES[abs(board[move & 63])]
+
+
+class MoveOrderer:
+    """Эвристики упорядочивания одного Searcher; phase_time - словарь SearchStats для замеров."""
+
+    def __init__(self, level=ORDER_HISTORY, phase_time=None):
+        self.level = level
+        self.phase_time = phase_time if phase_time is not None else {"movegen": 0.0, "order": 0.0}
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # history[(цвет белых ? 4096 : 0) + откуда | куда << 6]
+        self.history = [0] * 8192
+
+    def new_search(self):
+        """Ходы-убийцы относятся к позиции, их сбрасываем; историю только ослабляем."""
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        history = self.history
+        for index in range(len(history)):
+            history[index] >>= 1
+
+    def moves(self, position, ply, tt_move=None):
+        """Легальные ходы в порядке проверки (генератор)."""
+        level = self.level
+        phase_time = self.phase_time
+        if level < ORDER_MVV_LVA:
+            started = time.perf_counter()
+            moves = position.legal_moves()
+            phase_time["movegen"] += time.perf_counter() - started
+            if level == ORDER_TT and tt_move in moves:
+                yield tt_move
+            for move in moves:
+                if move != tt_move:
+                    yield move
+            return
+
+        started = time.perf_counter()
+        tactical = position.legal_moves(GEN_TACTICAL)
+        quiets = None
+        if tt_move is not None and tt_move not in tactical:
+            # Тихий ход из таблицы нужно проверить на легальность - строим тихие ходы сразу
+            quiets = position.legal_moves(GEN_QUIET)
+            if tt_move not in quiets:
+                tt_move = None
+        phase_time["movegen"] += time.perf_counter() - started
+
+        if tt_move is not None:
+            yield tt_move
+        if tactical:
+            started = time.perf_counter()
+            board = position.board
+            tactical.sort(key=lambda move: -mvv_lva(board, move))
+            phase_time["order"] += time.perf_counter() - started
+            for move in tactical:
+                if move != tt_move:
+                    yield move
+
+        if quiets is None:
+            started = time.perf_counter()
+            quiets = position.legal_moves(GEN_QUIET)
+            phase_time["movegen"] += time.perf_counter() - started
+        killers = ()
+        if level >= ORDER_KILLERS and ply < MAX_PLY:
+            killers = [killer for killer in self.killers[ply] if killer is not None and killer != tt_move]
+            for killer in killers:
+                if killer in quiets:
+                    yield killer
+        if level >= ORDER_HISTORY:
+            started = time.perf_counter()
+            history = self.history
+            base = 4096 if position.turn == WHITE else 0
+            quiets.sort(key=lambda move: -history[base + (move & 4095)])
+            phase_time["order"] += time.perf_counter() - started
+        for move in quiets:
+            if move != tt_move and move not in killers:
+                yield move
+
+    def captures(self, position):
+        """Взятия и превращения для форсированного варианта, всегда по MVV-LVA."""
+        # Без сортировки форсированный вариант разрастается в десятки раз на любом уровне
+        started = time.perf_counter()
+        moves = position.legal_moves(GEN_TACTICAL)
+        self.phase_time["movegen"] += time.perf_counter() - started
+        started = time.perf_counter()
+        board = position.board
+        moves.sort(key=lambda move: -mvv_lva(board, move))
+        self.phase_time["order"] += time.perf_counter() - started
+        return moves
+
+    def cutoff(self, position, move, ply, depth):
+        """Тихий ход move дал отсечение на глубине depth: запомнить его как убийцу и в истории."""
+        if self.level >= ORDER_KILLERS and ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        if self.level >= ORDER_HISTORY:
+            history = self.history
+            index = (4096 if position.turn == WHITE else 0) + (move & 4095)
+            history[index] += depth * depth
+            if history[index] > HISTORY_LIMIT:
+                for i in range(len(history)):
+                    history[i] >>= 1
+
+
+def compare_levels(fens, depth, levels=ORDER_LEVELS):
+    """(уровень, [(узлов, секунд) по позициям]) для поиска на фиксированную глубину - по мере готовности."""
+    # search.py сам импортирует этот модуль
+    from .search import Searcher
+
+    for name, level in levels.items():
+        rows = []
+        for fen in fens:
+            searcher = Searcher(ordering=level)
+            start = time.perf_counter()
+            searcher.search(ChessPosition.from_fen(fen), depth)
+            rows.append((searcher.nodes, time.perf_counter() - start))
+        yield name, rows
+
+
+def main(argv=None):
+    from .perft import REFERENCE_POSITIONS
+    from .smp import BENCH_POSITIONS
+
+    parser = argparse.ArgumentParser(description="Узлы перебора при разном упорядочивании ходов")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--levels", default="mvv-lva,killers,history", help="уровни через запятую, первый - база")
+    args = parser.parse_args(argv)
+
+    names = [name for name, _, _ in REFERENCE_POSITIONS if name in BENCH_POSITIONS]
+    fens = [fen for name, fen, _ in REFERENCE_POSITIONS if name in BENCH_POSITIONS]
+    levels = {}
+    for name in args.levels.split(","):
+        if name not in ORDER_LEVELS:
+            parser.error(f"неизвестный уровень: {name}")
+        levels[name] = ORDER_LEVELS[name]
+    baseline = None
+    print(f"{'уровень':10}" + "".join(f"{name:>12}" for name in names) + f"{'всего':>12}{'меньше':>9}{'время':>9}")
+    for name, rows in compare_levels(fens, args.depth, levels):
+        total = sum(nodes for nodes, _ in rows)
+        if baseline is None:
+            baseline = total
+        print(
+            f"{name:10}" + "".join(f"{nodes:>12}" for nodes, _ in rows)
+            + f"{total:>12}{1 - total / baseline:>9.0%}{sum(seconds for _, seconds in rows):>8.1f}с",
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
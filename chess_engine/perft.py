@@ -0,0 +1,135 @@
+"""Подсчёт листьев perft: проверка правил и замер скорости генератора ходов.
+
+    python -m chess_engine.perft --depth 4
+    python -m chess_engine.perft --fen "<FEN>" --depth 3 --divide
+    python -m chess_engine.perft --check
+    python -m chess_engine.perft --check --backend bitboard
+"""
+import argparse
+import sys
+import time
+
+from . import BACKENDS
+from .position import START_FEN, move_uci
+
+# (название, FEN, число узлов на глубине 1, 2, ...)
+REFERENCE_POSITIONS = [
+    ("start", START_FEN, [20, 400, 8902, 197281, 4865609]),
+    (
+        "kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603],
+    ),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    (
+        "position4",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333],
+    ),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    (
+        "position6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594],
+    ),
+    # Крайние случаи: взятие на проходе, рокировки, превращения, пат
+    ("ep_pin_1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", [18, 92, 1670, 10138, 185429, 1134888]),
+    ("ep_pin_2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", [13, 102, 1266, 10276, 135655, 1015133]),
+    ("ep_check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", [15, 126, 1928, 13931, 206379, 1440467]),
+    ("short_castle_check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", [15, 66, 1198, 6399, 120330, 661072]),
+    ("long_castle_check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", [16, 71, 1286, 7418, 141077, 803711]),
+    ("castle_rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", [26, 1141, 27826, 1274206]),
+    ("castle_prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", [44, 1494, 50509, 1720476]),
+    ("promo_from_check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", [11, 133, 1442, 19174, 266199, 3821001]),
+    ("discovered_check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", [29, 165, 5160, 31961, 1004658]),
+    ("promo_check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", [9, 40, 472, 2661, 38983, 217342]),
+    ("underpromo_check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", [6, 27, 273, 1329, 18135, 92683]),
+    ("self_stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", [2, 6, 13, 63, 382, 2217]),
+    ("stalemate_mate_1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", [10, 25, 268, 926, 10857, 43261, 567584]),
+    ("stalemate_mate_2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", [37, 183, 6559, 23527]),
+]
+
+
+def perft(position, depth):
+    if depth <= 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def divide(position, depth):
+    """Число листьев после каждого хода из корня."""
+    result = []
+    for move in position.legal_moves():
+        position.make_move(move)
+        result.append((move, perft(position, depth - 1)))
+        position.unmake_move()
+    return result
+
+
+def timed_perft(position, depth):
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    return nodes, time.perf_counter() - start
+
+
+def run_check(max_nodes, position_class, out=sys.stdout):
+    """Прогнать эталонные позиции до глубины, где узлов не больше max_nodes."""
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        position = position_class.from_fen(fen)
+        for depth, count in enumerate(expected, 1):
+            if count > max_nodes and depth > 1:
+                break
+            nodes, elapsed = timed_perft(position, depth)
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == count else f"FAIL (ожидалось {count})"
+            if nodes != count:
+                failures += 1
+            print(f"{name:18} depth {depth}: {nodes:>9} {status}", file=out)
+    nps = total_nodes / total_time if total_time else 0.0
+    print(f"узлов: {total_nodes}, время: {total_time:.2f} c, {nps:.0f} узлов/с", file=out)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="perft для chess_engine")
+    parser.add_argument("--fen", default=START_FEN)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="показать число листьев по каждому ходу")
+    parser.add_argument("--check", action="store_true", help="сверить эталонные позиции")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="array", help="представление доски")
+    parser.add_argument("--max-nodes", type=int, default=200000, help="предел узлов на позицию для --check")
+    args = parser.parse_args(argv)
+
+    position_class = BACKENDS[args.backend]
+    if args.check:
+        return 1 if run_check(args.max_nodes, position_class) else 0
+
+    position = position_class.from_fen(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        nodes = 0
+        for move, count in divide(position, args.depth):
+            print(f"{move_uci(move)}: {count}")
+            nodes += count
+    else:
+        nodes = perft(position, args.depth)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed else 0.0
+    print(f"depth {args.depth}: {nodes} узлов за {elapsed:.2f} c ({nps:.0f} узлов/с)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,953 @@
+"""Шахматная позиция без зависимости от arcade.
+
+Доска хранится плоским массивом из 64 клеток: индекс ``row * 8 + col``,
+строка 0 - восьмая горизонталь (как в ChessGameView). Фигура кодируется
+целым числом ``цвет * тип``: белые положительные, чёрные отрицательные,
+0 - пустая клетка.
+"""
+from .pst import MG_SCORES, EG_SCORES, PHASE
+from .zobrist import PIECE_KEYS, CASTLING_KEYS, EN_PASSANT_KEYS, SIDE_KEY
+
+WHITE = 1
+BLACK = -1
+
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+
+PIECE_CHARS = " PNBRQK"
+KIND_BY_CHAR = {ch: kind for kind, ch in enumerate(PIECE_CHARS) if kind}
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+BOARD = 8
+FILES = "abcdefgh"
+
+
+def square(row, col):
+    return row * BOARD + col
+
+
+def row_of(sq):
+    return sq >> 3
+
+
+def col_of(sq):
+    return sq & 7
+
+
+def square_name(sq):
+    return f"{FILES[col_of(sq)]}{BOARD - row_of(sq)}"
+
+
+def parse_square(name):
+    return square(BOARD - int(name[1]), FILES.index(name[0]))
+
+
+def _epd_operations(text):
+    """Операции EPD 'bm Nf3 e4; id "a; b";' -> {"bm": ["Nf3", "e4"], "id": ["a; b"]}."""
+    operations = {}
+    tokens = []
+    current = ""
+    quoted = False
+    for ch in text + ";":
+        if ch == '"':
+            quoted = not quoted
+            if not quoted:
+                tokens.append(current)
+                current = ""
+        elif quoted:
+            current += ch
+        elif ch in " \t;":
+            if current:
+                tokens.append(current)
+                current = ""
+            if ch == ";" and tokens:
+                operations[tokens[0]] = tokens[1:]
+                tokens = []
+        else:
+            current += ch
+    if quoted:
+        raise ValueError(f"Незакрытая кавычка в EPD: {text!r}")
+    return operations
+
+
+def _on_board(row, col):
+    return 0 <= row < BOARD and 0 <= col < BOARD
+
+
+def _jump_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = row_of(sq), col_of(sq)
+        table.append([square(r + dr, c + dc) for dr, dc in offsets if _on_board(r + dr, c + dc)])
+    return table
+
+
+def _ray_table(directions):
+    table = []
+    for sq in range(64):
+        rays = []
+        for dr, dc in directions:
+            ray = []
+            r, c = row_of(sq) + dr, col_of(sq) + dc
+            while _on_board(r, c):
+                ray.append(square(r, c))
+                r += dr
+                c += dc
+            rays.append(ray)
+        table.append(rays)
+    return table
+
+
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+KNIGHT_TARGETS = _jump_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_TARGETS = _jump_table(ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
+ROOK_RAYS = _ray_table(ROOK_DIRECTIONS)
+BISHOP_RAYS = _ray_table(BISHOP_DIRECTIONS)
+# Линии через клетку sq: (луч в одну сторону, луч в обратную, дальнобойная фигура этой линии).
+# Когда клетка освобождается или занимается, атаки ладей, слонов и ферзей на первом луче
+# продлеваются или обрываются на втором
+THROUGH_LINES = [
+    [(ROOK_RAYS[sq][i], ROOK_RAYS[sq][i ^ 1], ROOK) for i in range(4)]
+    + [(BISHOP_RAYS[sq][i], BISHOP_RAYS[sq][3 - i], BISHOP) for i in range(4)]
+    for sq in range(64)
+]
+# Клетки, которые бьёт пешка данного цвета, стоящая на sq
+PAWN_ATTACKS = {
+    WHITE: _jump_table([(-1, -1), (-1, 1)]),
+    BLACK: _jump_table([(1, -1), (1, 1)]),
+}
+
+# Права на рокировку, которые сохраняются после хода с/на клетку
+CASTLING_MASK = [ALL_CASTLING] * 64
+CASTLING_MASK[square(7, 4)] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[square(7, 7)] &= ~WHITE_KINGSIDE
+CASTLING_MASK[square(7, 0)] &= ~WHITE_QUEENSIDE
+CASTLING_MASK[square(0, 4)] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[square(0, 7)] &= ~BLACK_KINGSIDE
+CASTLING_MASK[square(0, 0)] &= ~BLACK_QUEENSIDE
+
+# (право, клетка короля, цель короля, клетка ладьи, цель ладьи, пустые клетки, непобитые клетки)
+CASTLING_RULES = {
+    WHITE: [
+        (WHITE_KINGSIDE, 60, 62, 63, 61, (61, 62), (60, 61, 62)),
+        (WHITE_QUEENSIDE, 60, 58, 56, 59, (57, 58, 59), (60, 59, 58)),
+    ],
+    BLACK: [
+        (BLACK_KINGSIDE, 4, 6, 7, 5, (5, 6), (4, 5, 6)),
+        (BLACK_QUEENSIDE, 4, 2, 0, 3, (1, 2, 3), (4, 3, 2)),
+    ],
+}
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+CASTLING_CHARS = ((WHITE_KINGSIDE, "K"), (WHITE_QUEENSIDE, "Q"), (BLACK_KINGSIDE, "k"), (BLACK_QUEENSIDE, "q"))
+PROMOTION_KINDS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# Ход - целое число: откуда | куда << 6 | превращение << 12 | флаг << 15
+MOVE_NORMAL = 0
+MOVE_DOUBLE_PUSH = 1
+MOVE_EN_PASSANT = 2
+MOVE_CASTLE = 3
+
+# Стадии генерации: все ходы, только взятия и превращения, только тихие ходы
+GEN_ALL = 0
+GEN_TACTICAL = 1
+GEN_QUIET = 2
+
+
+def encode_move(frm, to, promotion=EMPTY, flag=MOVE_NORMAL):
+    return frm | to << 6 | promotion << 12 | flag << 15
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return (move >> 12) & 7
+
+
+def move_flag(move):
+    return move >> 15
+
+
+def move_uci(move):
+    promotion = move_promotion(move)
+    text = square_name(move_from(move)) + square_name(move_to(move))
+    return text + PIECE_CHARS[promotion].lower() if promotion else text
+
+
+class AttackInfo:
+    """Карты атак, связки и шахующие фигуры для стороны, чья очередь ходить."""
+
+    __slots__ = ("color", "maps", "checkers", "pins", "evasions")
+
+    def __init__(self, color, enemy_map, own_map, checkers, pins, evasions):
+        self.color = color
+        # При шахе дальнобойной фигурой в карте соперника бьётся и клетка за нашим королём на линии шаха
+        self.maps = {-color: enemy_map, color: own_map}
+        self.checkers = checkers
+        self.pins = pins
+        self.evasions = evasions
+
+
+class ChessPosition:
+    """Состояние партии: доска, очередь хода, рокировки, взятие на проходе и счётчики."""
+
+    def __init__(self):
+        self.board = [EMPTY] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.en_passant = None
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.kings = {WHITE: None, BLACK: None}
+        self.history = []
+        self.key = 0
+        self._info = None
+        # Сколько фигур каждого цвета бьёт каждую клетку; обновляются в make_move по изменившимся клеткам
+        self.attacks = {WHITE: [0] * 64, BLACK: [0] * 64}
+        # Суммы для оценки, обновляются в make_move: материал с таблицами (белые +)
+        # для миттельшпиля и эндшпиля, стадия партии и ключ Зобриста только по пешкам
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+        self.pawn_key = 0
+
+    @classmethod
+    def initial(cls):
+        return cls.from_fen(START_FEN)
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Некорректный FEN: {fen!r}")
+        rows = fields[0].split("/")
+        if len(rows) != BOARD:
+            raise ValueError(f"Некорректный FEN: {fen!r}")
+
+        position = cls()
+        for row, text in enumerate(rows):
+            col = 0
+            for ch in text:
+                if ch.isdigit():
+                    col += int(ch)
+                elif ch.upper() in KIND_BY_CHAR and col < BOARD:
+                    kind = KIND_BY_CHAR[ch.upper()]
+                    position.put(square(row, col), kind if ch.isupper() else -kind)
+                    col += 1
+                else:
+                    raise ValueError(f"Некорректный FEN: {fen!r}")
+            if col != BOARD:
+                raise ValueError(f"Некорректный FEN: {fen!r}")
+
+        position.turn = WHITE if fields[1] == "w" else BLACK
+        position.castling = sum(right for right, ch in CASTLING_CHARS if ch in fields[2])
+        position.en_passant = None if fields[3] == "-" else parse_square(fields[3])
+        if len(fields) > 5:
+            position.halfmove_clock = int(fields[4])
+            position.fullmove_number = int(fields[5])
+        position.key = position.compute_key()
+        return position
+
+    @classmethod
+    def from_string(cls, text):
+        """Позиция из FEN или из строки EPD (операции EPD отбрасываются)."""
+        fields = text.split()
+        if len(fields) == 6 and fields[4].isdigit() and fields[5].isdigit():
+            return cls.from_fen(text)
+        return cls.from_epd(text)[0]
+
+    @classmethod
+    def from_epd(cls, line):
+        """Строка EPD -> (позиция, {код операции: [операнды]}), например {"bm": ["Qxf7+"], "id": ["WAC.001"]}.
+
+        Счётчики ходов EPD задаются операциями hmvc и fmvn.
+        """
+        fields = line.split(None, 4)
+        if len(fields) < 4:
+            raise ValueError(f"Некорректный EPD: {line!r}")
+        position = cls.from_fen(" ".join(fields[:4]))
+        operations = _epd_operations(fields[4]) if len(fields) > 4 else {}
+        try:
+            if "hmvc" in operations:
+                position.halfmove_clock = int(operations["hmvc"][0])
+            if "fmvn" in operations:
+                position.fullmove_number = int(operations["fmvn"][0])
+        except (IndexError, ValueError):
+            raise ValueError(f"Некорректный EPD: {line!r}") from None
+        return position, operations
+
+    def epd(self, **operations):
+        """Позиция в EPD; операции передаются как bm="Nf3 e4", id="test"."""
+        text = " ".join(self.fen().split()[:4])
+        for opcode, operand in operations.items():
+            # Строковые операции (id, комментарии c0-c9) пишутся в кавычках
+            if opcode == "id" or (len(opcode) == 2 and opcode[0] == "c" and opcode[1].isdigit()):
+                operand = f'"{operand}"'
+            text += f" {opcode} {operand};"
+        return text
+
+    def validate(self):
+        """ValueError, если по позиции нельзя играть: короли, пешки на крайних линиях, шах не той стороне."""
+        for color, name in ((WHITE, "белых"), (BLACK, "чёрных")):
+            if self.board.count(color * KING) != 1:
+                raise ValueError(f"У {name} должен быть ровно один король")
+        for sq in list(range(BOARD)) + list(range(64 - BOARD, 64)):
+            if abs(self.board[sq]) == PAWN:
+                raise ValueError("Пешка на первой или последней горизонтали")
+        if self.in_check(-self.turn):
+            raise ValueError("Король стороны, которая не ходит, под шахом")
+        for color, rules in CASTLING_RULES.items():
+            for right, king_sq, _, rook_sq, _, _, _ in rules:
+                if self.castling & right and (
+                    self.board[king_sq] != color * KING or self.board[rook_sq] != color * ROOK
+                ):
+                    raise ValueError("Право рокировки без короля или ладьи на месте")
+        if self.en_passant is not None:
+            # Поле взятия на проходе - за пешкой соперника, только что сделавшей двойной ход
+            pawn = self.en_passant + BOARD * self.turn
+            if row_of(self.en_passant) != (2 if self.turn == WHITE else 5) or self.board[pawn] != -self.turn * PAWN:
+                raise ValueError("Некорректное поле взятия на проходе")
+
+    def fen(self):
+        rows = []
+        for row in range(BOARD):
+            text = ""
+            empty = 0
+            for col in range(BOARD):
+                piece = self.board[square(row, col)]
+                if not piece:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                ch = PIECE_CHARS[abs(piece)]
+                text += ch if piece > 0 else ch.lower()
+            rows.append(text + (str(empty) if empty else ""))
+        castling = "".join(ch for right, ch in CASTLING_CHARS if self.castling & right) or "-"
+        en_passant = square_name(self.en_passant) if self.en_passant is not None else "-"
+        return " ".join([
+            "/".join(rows),
+            "w" if self.turn == WHITE else "b",
+            castling,
+            en_passant,
+            str(self.halfmove_clock),
+            str(self.fullmove_number),
+        ])
+
+    def copy(self):
+        other = self.__class__()
+        other.board = self.board[:]
+        other.turn = self.turn
+        other.castling = self.castling
+        other.en_passant = self.en_passant
+        other.halfmove_clock = self.halfmove_clock
+        other.fullmove_number = self.fullmove_number
+        other.kings = dict(self.kings)
+        other.history = self.history[:]
+        other.key = self.key
+        other._info = self._info
+        other.attacks = {WHITE: self.attacks[WHITE][:], BLACK: self.attacks[BLACK][:]}
+        other.mg = self.mg
+        other.eg = self.eg
+        other.phase = self.phase
+        other.pawn_key = self.pawn_key
+        return other
+
+    def compute_key(self):
+        """Ключ Зобриста с нуля; при ходах он обновляется в make_move."""
+        key = 0
+        for sq, piece in enumerate(self.board):
+            if piece:
+                key ^= PIECE_KEYS[piece + 6][sq]
+        key ^= CASTLING_KEYS[self.castling]
+        key ^= self._en_passant_key()
+        if self.turn == BLACK:
+            key ^= SIDE_KEY
+        return key
+
+    def _en_passant_key(self):
+        """Поле взятия на проходе учитывается, только если пешка может им воспользоваться."""
+        ep = self.en_passant
+        if ep is None:
+            return 0
+        pawn = self.turn * PAWN
+        for t in PAWN_ATTACKS[-self.turn][ep]:
+            if self.board[t] == pawn:
+                return EN_PASSANT_KEYS[ep & 7]
+        return 0
+
+    def repetitions(self):
+        """Сколько раз текущая позиция уже встречалась с последнего необратимого хода."""
+        history = self.history
+        key = self.key
+        count = 0
+        limit = min(self.halfmove_clock, len(history))
+        for back in range(4, limit + 1, 2):
+            if history[-back][6] == key:
+                count += 1
+        return count
+
+    def put(self, sq, piece):
+        old = self.board[sq]
+        if old:
+            self._update_eval(old, sq, -1)
+            self._lift(sq)
+        if piece:
+            self._update_eval(piece, sq, 1)
+            self._drop(sq, piece)
+        self._info = None
+        if piece == KING or piece == -KING:
+            self.kings[WHITE if piece > 0 else BLACK] = sq
+
+    def _update_eval(self, piece, sq, sign):
+        self.mg += sign * MG_SCORES[piece + 6][sq]
+        self.eg += sign * EG_SCORES[piece + 6][sq]
+        self.phase += sign * PHASE[piece + 6]
+        if piece == PAWN or piece == -PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece + 6][sq]
+
+    def piece_at(self, row, col):
+        return self.board[square(row, col)]
+
+    def king_square(self, color):
+        return self.kings[color]
+
+    def attackers(self, sq, by_color):
+        """Список клеток с фигурами цвета by_color, которые бьют клетку sq."""
+        board = self.board
+        result = []
+        knight = by_color * KNIGHT
+        for t in KNIGHT_TARGETS[sq]:
+            if board[t] == knight:
+                result.append(t)
+        king = by_color * KING
+        for t in KING_TARGETS[sq]:
+            if board[t] == king:
+                result.append(t)
+        pawn = by_color * PAWN
+        for t in PAWN_ATTACKS[-by_color][sq]:
+            if board[t] == pawn:
+                result.append(t)
+        queen = by_color * QUEEN
+        for slider, rays in ((by_color * ROOK, ROOK_RAYS), (by_color * BISHOP, BISHOP_RAYS)):
+            for ray in rays[sq]:
+                for t in ray:
+                    piece = board[t]
+                    if piece:
+                        if piece == slider or piece == queen:
+                            result.append(t)
+                        break
+        return result
+
+    def is_attacked(self, sq, by_color):
+        board = self.board
+        knight = by_color * KNIGHT
+        for t in KNIGHT_TARGETS[sq]:
+            if board[t] == knight:
+                return True
+        king = by_color * KING
+        for t in KING_TARGETS[sq]:
+            if board[t] == king:
+                return True
+        pawn = by_color * PAWN
+        for t in PAWN_ATTACKS[-by_color][sq]:
+            if board[t] == pawn:
+                return True
+        queen = by_color * QUEEN
+        for slider, rays in ((by_color * ROOK, ROOK_RAYS), (by_color * BISHOP, BISHOP_RAYS)):
+            for ray in rays[sq]:
+                for t in ray:
+                    piece = board[t]
+                    if piece:
+                        if piece == slider or piece == queen:
+                            return True
+                        break
+        return False
+
+    def in_check(self, color):
+        king = self.kings[color]
+        if king is None:
+            return True
+        if color == self.turn:
+            return bool(self.attack_info().checkers)
+        return self.is_attacked(king, -color)
+
+    def _piece_attacks(self, sq, piece, sign):
+        """Прибавить (sign=1) или убрать (sign=-1) удары фигуры piece с клетки sq в карте её цвета."""
+        board = self.board
+        color = WHITE if piece > 0 else BLACK
+        counts = self.attacks[color]
+        kind = piece * color
+        if kind == PAWN:
+            targets = PAWN_ATTACKS[color][sq]
+        elif kind == KNIGHT:
+            targets = KNIGHT_TARGETS[sq]
+        elif kind == KING:
+            targets = KING_TARGETS[sq]
+        else:
+            if kind == BISHOP:
+                rays = BISHOP_RAYS[sq]
+            elif kind == ROOK:
+                rays = ROOK_RAYS[sq]
+            else:
+                rays = ROOK_RAYS[sq] + BISHOP_RAYS[sq]
+            for ray in rays:
+                for t in ray:
+                    counts[t] += sign
+                    if board[t]:
+                        break
+            return
+        for t in targets:
+            counts[t] += sign
+
+    def _lines_through(self, sq, sign):
+        """Продлить (sign=1) или оборвать (sign=-1) на пустой клетке sq линии бьющих через неё дальнобойных фигур."""
+        board = self.board
+        attacks = self.attacks
+        for ray, behind, kind in THROUGH_LINES[sq]:
+            for t in ray:
+                piece = board[t]
+                if piece:
+                    if piece == kind or piece == -kind or piece == QUEEN or piece == -QUEEN:
+                        counts = attacks[WHITE if piece > 0 else BLACK]
+                        for b in behind:
+                            counts[b] += sign
+                            if board[b]:
+                                break
+                    break
+
+    def _lift(self, sq):
+        """Снять фигуру с клетки sq вместе с её ударами."""
+        self._piece_attacks(sq, self.board[sq], -1)
+        self.board[sq] = EMPTY
+        self._lines_through(sq, 1)
+
+    def _drop(self, sq, piece):
+        """Поставить фигуру на пустую клетку sq вместе с её ударами."""
+        self._lines_through(sq, -1)
+        self.board[sq] = piece
+        self._piece_attacks(sq, piece, 1)
+
+    def _replace(self, sq, piece):
+        """Поставить фигуру на место взятой: занятость клетки не меняется, линии через неё тоже."""
+        self._piece_attacks(sq, self.board[sq], -1)
+        self.board[sq] = piece
+        self._piece_attacks(sq, piece, 1)
+
+    def build_attack_map(self, color):
+        """Сколько фигур цвета color бьёт каждую клетку - с нуля, для сверки с attacks."""
+        board = self.board
+        counts = [0] * 64
+        for sq in range(64):
+            piece = board[sq] * color
+            if piece <= 0:
+                continue
+            if piece == PAWN:
+                targets = PAWN_ATTACKS[color][sq]
+            elif piece == KNIGHT:
+                targets = KNIGHT_TARGETS[sq]
+            elif piece == KING:
+                targets = KING_TARGETS[sq]
+            else:
+                if piece == BISHOP:
+                    rays = BISHOP_RAYS[sq]
+                elif piece == ROOK:
+                    rays = ROOK_RAYS[sq]
+                else:
+                    rays = ROOK_RAYS[sq] + BISHOP_RAYS[sq]
+                for ray in rays:
+                    for t in ray:
+                        counts[t] += 1
+                        if board[t]:
+                            break
+                continue
+            for t in targets:
+                counts[t] += 1
+        return counts
+
+    def attack_info(self):
+        """Шахи и связки текущей позиции; считаются один раз и хранятся в стеке ходов.
+
+        Карты атак не пересчитываются: make_move ведёт их сам по изменившимся клеткам.
+        """
+        info = self._info
+        if info is None:
+            info = self._info = self._compute_attack_info()
+        return info
+
+    def attack_map(self, color):
+        return self.attack_info().maps[color]
+
+    def _compute_attack_info(self):
+        board = self.board
+        us = self.turn
+        them = -us
+        king = self.kings[us]
+        enemy_map = self.attacks[them]
+        own_map = self.attacks[us]
+        checkers = []
+        pins = {}
+        evasions = None
+        if king is None:
+            return AttackInfo(us, enemy_map, own_map, checkers, pins, evasions)
+
+        if enemy_map[king]:
+            evasions = set()
+            for t in KNIGHT_TARGETS[king]:
+                if board[t] == them * KNIGHT:
+                    checkers.append(t)
+                    evasions.add(t)
+            for t in PAWN_ATTACKS[us][king]:
+                if board[t] == them * PAWN:
+                    checkers.append(t)
+                    evasions.add(t)
+
+        queen = them * QUEEN
+        behind_king = []
+        for ray, behind, kind in THROUGH_LINES[king]:
+            slider = them * kind
+            shield = None
+            for i, t in enumerate(ray):
+                piece = board[t]
+                if not piece:
+                    continue
+                if piece * us > 0:
+                    if shield is not None:
+                        break
+                    shield = t
+                    continue
+                if piece == slider or piece == queen:
+                    line = ray[:i + 1]
+                    if shield is None:
+                        checkers.append(t)
+                        evasions.update(line)
+                        if behind:
+                            behind_king.append(behind[0])
+                    else:
+                        pins[shield] = set(line)
+                break
+        if behind_king:
+            # Король заслоняет от шахующей фигуры клетку за собой - отступить туда нельзя
+            enemy_map = enemy_map[:]
+            for t in behind_king:
+                enemy_map[t] += 1
+        return AttackInfo(us, enemy_map, own_map, checkers, pins, evasions)
+
+    def checkers(self):
+        return self.attack_info().checkers
+
+    def pinned(self):
+        return self.attack_info().pins
+
+    def generate_moves(self, stage=GEN_ALL):
+        """Псевдолегальные ходы стороны, чья очередь ходить.
+
+        stage=GEN_TACTICAL - только взятия (включая на проходе) и превращения,
+        stage=GEN_QUIET - все остальные, чтобы перебор мог не строить тихие ходы до отсечения.
+        """
+        board = self.board
+        color = self.turn
+        moves = []
+        for sq in range(64):
+            piece = board[sq]
+            if piece * color <= 0:
+                continue
+            kind = piece * color
+            if kind == PAWN:
+                self._pawn_moves(sq, color, moves, stage)
+            elif kind == KNIGHT:
+                self._jump_moves(sq, color, KNIGHT_TARGETS, moves, stage)
+            elif kind == BISHOP:
+                self._slider_moves(sq, color, BISHOP_RAYS, moves, stage)
+            elif kind == ROOK:
+                self._slider_moves(sq, color, ROOK_RAYS, moves, stage)
+            elif kind == QUEEN:
+                self._slider_moves(sq, color, ROOK_RAYS, moves, stage)
+                self._slider_moves(sq, color, BISHOP_RAYS, moves, stage)
+            else:
+                self._jump_moves(sq, color, KING_TARGETS, moves, stage)
+                if stage != GEN_TACTICAL:
+                    self._castle_moves(sq, color, moves)
+        return moves
+
+    def _pawn_moves(self, sq, color, moves, stage=GEN_ALL):
+        board = self.board
+        step = -BOARD if color == WHITE else BOARD
+        start_row = 6 if color == WHITE else 1
+        last_row = 0 if color == WHITE else BOARD - 1
+        to = sq + step
+        if not board[to]:
+            if row_of(to) == last_row:
+                if stage != GEN_QUIET:
+                    for kind in PROMOTION_KINDS:
+                        moves.append(encode_move(sq, to, kind))
+            elif stage != GEN_TACTICAL:
+                moves.append(encode_move(sq, to))
+                if row_of(sq) == start_row and not board[to + step]:
+                    moves.append(encode_move(sq, to + step, EMPTY, MOVE_DOUBLE_PUSH))
+        if stage == GEN_QUIET:
+            return
+        for to in PAWN_ATTACKS[color][sq]:
+            if board[to] * color < 0:
+                if row_of(to) == last_row:
+                    for kind in PROMOTION_KINDS:
+                        moves.append(encode_move(sq, to, kind))
+                else:
+                    moves.append(encode_move(sq, to))
+            elif to == self.en_passant:
+                moves.append(encode_move(sq, to, EMPTY, MOVE_EN_PASSANT))
+
+    def _jump_moves(self, sq, color, table, moves, stage=GEN_ALL):
+        board = self.board
+        if stage == GEN_ALL:
+            for to in table[sq]:
+                if board[to] * color <= 0:
+                    moves.append(sq | to << 6)
+        elif stage == GEN_TACTICAL:
+            for to in table[sq]:
+                if board[to] * color < 0:
+                    moves.append(sq | to << 6)
+        else:
+            for to in table[sq]:
+                if not board[to]:
+                    moves.append(sq | to << 6)
+
+    def _slider_moves(self, sq, color, rays, moves, stage=GEN_ALL):
+        board = self.board
+        for ray in rays[sq]:
+            for to in ray:
+                target = board[to]
+                if target:
+                    if target * color < 0 and stage != GEN_QUIET:
+                        moves.append(sq | to << 6)
+                    break
+                if stage != GEN_TACTICAL:
+                    moves.append(sq | to << 6)
+
+    def _castle_moves(self, sq, color, moves):
+        if not self.castling:
+            return
+        enemy_map = self.attack_map(-color)
+        for right, king_from, king_to, rook_from, _, empty, safe in CASTLING_RULES[color]:
+            if sq != king_from or not self.castling & right or self.board[rook_from] != color * ROOK:
+                continue
+            if any(self.board[t] for t in empty):
+                continue
+            if any(enemy_map[t] for t in safe):
+                continue
+            moves.append(encode_move(king_from, king_to, EMPTY, MOVE_CASTLE))
+
+    def make_move(self, move):
+        """Сделать ход, сохранив в стеке всё нужное для unmake_move."""
+        board = self.board
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 15
+        piece = board[frm]
+        color = self.turn
+        key = self.key
+        mg = self.mg
+        eg = self.eg
+        pawn_key = self.pawn_key
+
+        attacks = self.attacks
+        self.history.append((
+            move, board[to], self.castling, self.en_passant, self.halfmove_clock, self._info, key,
+            mg, eg, self.phase, pawn_key, attacks,
+        ))
+        self._info = None
+        # Карты прежней позиции остаются в стеке, ход правит их копии
+        self.attacks = {WHITE: attacks[WHITE][:], BLACK: attacks[BLACK][:]}
+
+        if self.en_passant is not None:
+            key ^= self._en_passant_key()
+        key ^= PIECE_KEYS[piece + 6][frm]
+        mg -= MG_SCORES[piece + 6][frm]
+        eg -= EG_SCORES[piece + 6][frm]
+        if piece == color * PAWN:
+            pawn_key ^= PIECE_KEYS[piece + 6][frm]
+        self._lift(frm)
+        if flag == MOVE_EN_PASSANT:
+            captured = -color * PAWN
+            cap_sq = to - (-BOARD if color == WHITE else BOARD)
+            self._lift(cap_sq)
+            key ^= PIECE_KEYS[captured + 6][cap_sq]
+            pawn_key ^= PIECE_KEYS[captured + 6][cap_sq]
+            mg -= MG_SCORES[captured + 6][cap_sq]
+            eg -= EG_SCORES[captured + 6][cap_sq]
+        else:
+            captured = board[to]
+            if captured:
+                key ^= PIECE_KEYS[captured + 6][to]
+                mg -= MG_SCORES[captured + 6][to]
+                eg -= EG_SCORES[captured + 6][to]
+                self.phase -= PHASE[captured + 6]
+                if captured == -color * PAWN:
+                    pawn_key ^= PIECE_KEYS[captured + 6][to]
+            if flag == MOVE_CASTLE:
+                for _, _, king_to, rook_from, rook_to, _, _ in CASTLING_RULES[color]:
+                    if king_to == to:
+                        rook = board[rook_from]
+                        self._lift(rook_from)
+                        self._drop(rook_to, rook)
+                        key ^= PIECE_KEYS[rook + 6][rook_from] ^ PIECE_KEYS[rook + 6][rook_to]
+                        mg += MG_SCORES[rook + 6][rook_to] - MG_SCORES[rook + 6][rook_from]
+                        eg += EG_SCORES[rook + 6][rook_to] - EG_SCORES[rook + 6][rook_from]
+        promotion = (move >> 12) & 7
+        if promotion:
+            piece = color * promotion
+            self.phase += PHASE[piece + 6]
+        elif piece == color * PAWN:
+            pawn_key ^= PIECE_KEYS[piece + 6][to]
+        if board[to]:
+            self._replace(to, piece)
+        else:
+            self._drop(to, piece)
+        key ^= PIECE_KEYS[piece + 6][to]
+        mg += MG_SCORES[piece + 6][to]
+        eg += EG_SCORES[piece + 6][to]
+        self.mg = mg
+        self.eg = eg
+        self.pawn_key = pawn_key
+        if piece == color * KING:
+            self.kings[color] = to
+
+        castling = self.castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        if castling != self.castling:
+            key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+            self.castling = castling
+        if captured or piece == color * PAWN or promotion:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if color == BLACK:
+            self.fullmove_number += 1
+        self.turn = -color
+        if flag == MOVE_DOUBLE_PUSH:
+            self.en_passant = (frm + to) >> 1
+            key ^= self._en_passant_key()
+        else:
+            self.en_passant = None
+        self.key = key ^ SIDE_KEY
+        return captured
+
+    def unmake_move(self):
+        """Отменить последний ход из стека."""
+        (
+            move, captured, castling, en_passant, halfmove_clock, self._info, self.key,
+            self.mg, self.eg, self.phase, self.pawn_key, self.attacks,
+        ) = self.history.pop()
+        board = self.board
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 15
+        color = -self.turn
+        piece = board[to]
+        if (move >> 12) & 7:
+            piece = color * PAWN
+
+        board[frm] = piece
+        if piece == color * KING:
+            self.kings[color] = frm
+        board[to] = captured
+        if flag == MOVE_EN_PASSANT:
+            board[to - (-BOARD if color == WHITE else BOARD)] = -color * PAWN
+        elif flag == MOVE_CASTLE:
+            for _, _, king_to, rook_from, rook_to, _, _ in CASTLING_RULES[color]:
+                if king_to == to:
+                    board[rook_from] = board[rook_to]
+                    board[rook_to] = EMPTY
+
+        self.castling = castling
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove_clock
+        if color == BLACK:
+            self.fullmove_number -= 1
+        self.turn = color
+
+    def legal_moves(self, stage=GEN_ALL):
+        return list(self._legal_iter(stage))
+
+    def _legal_iter(self, stage=GEN_ALL):
+        info = self.attack_info()
+        color = self.turn
+        king = self.kings[color]
+        enemy_map = info.maps[-color]
+        pins = info.pins
+        evasions = info.evasions
+        double_check = len(info.checkers) > 1
+        for move in self.generate_moves(stage):
+            frm = move & 63
+            to = (move >> 6) & 63
+            if frm == king:
+                if not enemy_map[to]:
+                    yield move
+                continue
+            if double_check:
+                continue
+            if move >> 15 == MOVE_EN_PASSANT:
+                # Взятие на проходе снимает с линии сразу две пешки - проверяем честно
+                self.make_move(move)
+                legal = not self.is_attacked(king, -color)
+                self.unmake_move()
+                if legal:
+                    yield move
+                continue
+            if evasions is not None and to not in evasions:
+                continue
+            if frm in pins and to not in pins[frm]:
+                continue
+            yield move
+
+    def legal_moves_by_square(self):
+        """Легальные ходы, разложенные по клетке, откуда ходит фигура: {frm: [ходы]}."""
+        by_square = {}
+        for move in self._legal_iter():
+            by_square.setdefault(move & 63, []).append(move)
+        return by_square
+
+    def legal_targets(self, frm):
+        return sorted({move_to(move) for move in self.legal_moves() if move_from(move) == frm})
+
+    def find_move(self, frm, to, promotion=QUEEN):
+        """Легальный ход frm -> to или None; для пешки на последней горизонтали - с превращением."""
+        for move in self.legal_moves():
+            if move_from(move) == frm and move_to(move) == to:
+                if not move_promotion(move) or move_promotion(move) == promotion:
+                    return move
+        return None
+
+    def has_legal_move(self):
+        for _ in self._legal_iter():
+            return True
+        return False
+
+    def is_checkmate(self):
+        return self.in_check(self.turn) and not self.has_legal_move()
+
+    def is_stalemate(self):
+        return not self.in_check(self.turn) and not self.has_legal_move()
+
+    def is_insufficient_material(self):
+        """Мат не поставить никак: одни короли или король с одной лёгкой фигурой против короля."""
+        pieces = [piece for piece in self.board if piece and piece != KING and piece != -KING]
+        return not pieces or (len(pieces) == 1 and abs(pieces[0]) in (KNIGHT, BISHOP))
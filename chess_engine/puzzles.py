@@ -0,0 +1,468 @@
+"""Тактические задачи: добыча из партий движка и выборка из базы SQLite.
+
+Задача получается из партии, где оценка резко изменилась: после грубой ошибки
+соперника решающий ищет выигрыш. Решение строится движком - ходы решающего
+и лучшие ответы, пока ходы форсированные (взятие или шах) или до мата.
+Партии берутся из матчей (JSONL tournament.py), файлов PGN и таблицы games,
+куда шахматы кладут разобранные партии игрока.
+
+Случайная задача в диапазоне рейтинга выбирается без ORDER BY RANDOM(): у каждой
+задачи есть случайное число shuffle, запрос идёт по индексу (rating, shuffle) -
+берётся первая задача диапазона со shuffle не меньше случайной точки. Индекс
+сразу отсекает чужие рейтинги, поэтому редкий рейтинг не заставляет идти по
+всей таблице. Для тем запрос идёт по ключу (theme, shuffle) таблицы puzzle_themes.
+
+    python -m chess_engine.puzzles mine match.jsonl games.pgn --time 0.5 --workers 2
+    python -m chess_engine.puzzles random --rating 1500 --theme mate
+    python -m chess_engine.puzzles bench --count 300000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from .annotate import BLUNDER, DEFAULT_CACHE_PATH, GameAnnotator, move_loss
+from .notation import game_start_fen, move_san, parse_san, parse_uci, read_pgn
+from .position import ChessPosition, START_FEN, move_promotion, move_to, move_uci
+from .search import MATE_BOUND, Searcher
+from .tt import TranspositionTable
+
+DEFAULT_PUZZLE_PATH = "puzzles.db"
+# Решающий после ошибки должен выигрывать не меньше ADVANTAGE и не выигрывать уже до неё
+ADVANTAGE = 200
+CRUSHING = 500
+MAX_SOLVER_MOVES = 3
+MAX_MATE_MOVES = 5
+SHUFFLE_RANGE = 1 << 31
+THEMES = ("mate", "mateIn1", "mateIn2", "mateIn3", "mateIn4", "mateIn5", "advantage", "crushing",
+          "promotion", "endgame", "short", "long")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS puzzles (
+    id INTEGER PRIMARY KEY,
+    key INTEGER NOT NULL UNIQUE,
+    fen TEXT NOT NULL,
+    moves TEXT NOT NULL,
+    rating INTEGER NOT NULL,
+    themes TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT '',
+    shuffle INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS puzzles_shuffle_rating;
+CREATE INDEX IF NOT EXISTS puzzles_rating_shuffle ON puzzles (rating, shuffle);
+CREATE TABLE IF NOT EXISTS puzzle_themes (
+    theme TEXT NOT NULL,
+    shuffle INTEGER NOT NULL,
+    rating INTEGER NOT NULL,
+    puzzle_id INTEGER NOT NULL,
+    PRIMARY KEY (theme, shuffle, puzzle_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    start_fen TEXT NOT NULL,
+    moves TEXT NOT NULL,
+    scores TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    mined INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS games_mined ON games (mined);
+"""
+
+
+def _signed(key):
+    """Ключ Зобриста (беззнаковые 64 бита) в целое SQLite."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class PuzzleDatabase:
+    """Задачи в файле SQLite: запись добытых, случайная выборка по рейтингу и теме."""
+
+    def __init__(self, path=DEFAULT_PUZZLE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_puzzles(self, puzzles, rng=random):
+        """Записать задачи (словари из build_puzzle); повторы позиций пропускаются. Возвращает число новых."""
+        added = 0
+        with self.connection:
+            for puzzle in puzzles:
+                shuffle = rng.randrange(SHUFFLE_RANGE)
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO puzzles (key, fen, moves, rating, themes, source, shuffle) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        _signed(puzzle["key"]), puzzle["fen"], " ".join(puzzle["moves"]), puzzle["rating"],
+                        " ".join(puzzle["themes"]), puzzle.get("source", ""), shuffle,
+                    ),
+                )
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                self.connection.executemany(
+                    "INSERT INTO puzzle_themes (theme, shuffle, rating, puzzle_id) VALUES (?, ?, ?, ?)",
+                    [(theme, shuffle, puzzle["rating"], cursor.lastrowid) for theme in puzzle["themes"]],
+                )
+        return added
+
+    def random_puzzle(self, low, high, theme=None, rng=random):
+        """Случайная задача с рейтингом от low до high (и темой theme) или None."""
+        if theme:
+            query = (
+                "SELECT p.id, p.fen, p.moves, p.rating, p.themes FROM puzzle_themes t "
+                "JOIN puzzles p ON p.id = t.puzzle_id "
+                "WHERE t.theme = ? AND t.rating BETWEEN ? AND ? AND t.shuffle >= ? ORDER BY t.shuffle LIMIT 1"
+            )
+            prefix = (theme,)
+        else:
+            query = (
+                "SELECT id, fen, moves, rating, themes FROM puzzles "
+                "WHERE rating BETWEEN ? AND ? AND shuffle >= ? ORDER BY shuffle LIMIT 1"
+            )
+            prefix = ()
+        # От случайной точки вперёд, а если до конца индекса ничего нет - с начала
+        for start in (rng.randrange(SHUFFLE_RANGE), 0):
+            row = self.connection.execute(query, prefix + (low, high, start)).fetchone()
+            if row is not None:
+                return {
+                    "id": row[0], "fen": row[1], "moves": row[2].split(), "rating": row[3],
+                    "themes": row[4].split(),
+                }
+        return None
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM puzzles").fetchone()[0]
+
+    def theme_counts(self):
+        return dict(self.connection.execute("SELECT theme, COUNT(*) FROM puzzle_themes GROUP BY theme"))
+
+    def add_game(self, start_fen, moves, scores=None, source=""):
+        """Отложить партию (ходы - числа ходов) для добычи задач; scores - оценки позиций, если уже есть."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO games (start_fen, moves, scores, source) VALUES (?, ?, ?, ?)",
+                (
+                    start_fen, " ".join(move_uci(move) for move in moves),
+                    " ".join(str(score) for score in scores) if scores else "", source,
+                ),
+            )
+
+    def pending_games(self):
+        """(id, стартовый FEN, ходы UCI, оценки или None, источник) ещё не разобранных партий."""
+        rows = self.connection.execute(
+            "SELECT id, start_fen, moves, scores, source FROM games WHERE mined = 0 ORDER BY id"
+        ).fetchall()
+        return [
+            (game_id, fen, moves.split(), [int(score) for score in scores.split()] if scores else None, source)
+            for game_id, fen, moves, scores, source in rows
+        ]
+
+    def mark_mined(self, game_id):
+        with self.connection:
+            self.connection.execute("UPDATE games SET mined = 1 WHERE id = ?", (game_id,))
+
+
+def find_swings(scores, threshold=BLUNDER):
+    """Номера ходов, после которых соперник ходившего получил решающий перевес."""
+    swings = []
+    for ply in range(len(scores) - 1):
+        # Уже проигранную позицию не считаем: там любой ход «ошибка»
+        if move_loss(scores, ply) >= threshold and scores[ply + 1] >= ADVANTAGE and scores[ply] > -ADVANTAGE:
+            swings.append(ply)
+    return swings
+
+
+def _stable_depth(iterations, move):
+    """Глубина, начиная с которой движок больше не менял ход на другой."""
+    depth = iterations[-1][0] if iterations else 1
+    for iteration_depth, iteration_move in reversed(iterations):
+        if iteration_move != move:
+            break
+        depth = iteration_depth
+    return depth
+
+
+def build_puzzle(task):
+    """Решение для позиции после ошибки соперника (процесс пула): задача-словарь или None."""
+    position = ChessPosition.from_fen(task["fen"])
+    searcher = Searcher(tt=TranspositionTable(task["hash"]))
+    start = position.copy()
+    line = []
+    first_depth = None
+    score = 0
+    mate = False
+    solver_moves = 0
+    while True:
+        iterations = []
+        move, found = searcher.search(
+            position, 64, task["time"], lambda info: iterations.append((info["depth"], info["move"])),
+        )
+        if move is None:
+            break
+        if first_depth is None:
+            if found < ADVANTAGE:
+                return None
+            score = found
+            mate = found >= MATE_BOUND
+            first_depth = _stable_depth(iterations, move)
+        forcing = bool(position.board[move_to(move)]) or bool(move_promotion(move))
+        line.append(move)
+        position.make_move(move)
+        solver_moves += 1
+        forcing = forcing or position.in_check(position.turn)
+        if not position.has_legal_move():
+            break
+        if mate:
+            if solver_moves >= MAX_MATE_MOVES:
+                return None
+        elif not forcing or solver_moves >= MAX_SOLVER_MOVES:
+            break
+        reply, _ = searcher.search(position, 64, task["time"])
+        line.append(reply)
+        position.make_move(reply)
+
+    if not line:
+        return None
+    if mate and not position.is_checkmate():
+        # Мат движок увидел, но за отведённое время линию до мата не довёл
+        return None
+    themes = []
+    if mate:
+        themes += ["mate", f"mateIn{solver_moves}"]
+    else:
+        themes.append("crushing" if score >= CRUSHING else "advantage")
+    if any(move_promotion(move) for move in line[::2]):
+        themes.append("promotion")
+    if start.phase <= 8:
+        themes.append("endgame")
+    if solver_moves == 1:
+        themes.append("short")
+    elif solver_moves >= 3:
+        themes.append("long")
+    rating = 600 + 150 * first_depth + 200 * (solver_moves - 1)
+    return {
+        "key": start.key,
+        "fen": start.fen(),
+        "moves": [move_uci(move) for move in line],
+        "rating": max(400, min(2800, rating)),
+        "themes": themes,
+        "source": task.get("source", ""),
+    }
+
+
+def validate_puzzle(puzzle):
+    """Проверить, что все ходы решения легальны по порядку; ValueError при ошибке."""
+    position = ChessPosition.from_fen(puzzle["fen"])
+    position.validate()
+    for text in puzzle["moves"]:
+        move = parse_uci(position, text)
+        if move is None:
+            raise ValueError(f"Нелегальный ход решения {text} в {position.fen()}")
+        position.make_move(move)
+
+
+def read_games(paths):
+    """(стартовый FEN, ходы, источник) из файлов PGN и JSONL матчей tournament.py."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            if path.endswith(".jsonl"):
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    position = ChessPosition.from_fen(record.get("start_fen", START_FEN))
+                    moves = []
+                    for text in record.get("opening", []) + record["moves"]:
+                        move = parse_uci(position, text)
+                        if move is None:
+                            break
+                        moves.append(move)
+                        position.make_move(move)
+                    yield record.get("start_fen", START_FEN), moves, f"{os.path.basename(path)}#{record.get('game')}"
+                continue
+            for number, (headers, sans) in enumerate(read_pgn(f.read()), 1):
+                start_fen = game_start_fen(headers)
+                position = ChessPosition.from_fen(start_fen)
+                moves = []
+                for san in sans:
+                    move = parse_san(position, san)
+                    if move is None:
+                        break
+                    moves.append(move)
+                    position.make_move(move)
+                yield start_fen, moves, f"{os.path.basename(path)}#{number}"
+
+
+def candidate_tasks(start_fen, moves, scores, time_limit, hash_mb, source):
+    """Задачи для build_puzzle по резким переменам оценки в партии."""
+    position = ChessPosition.from_fen(start_fen)
+    swings = set(find_swings(scores))
+    for ply, move in enumerate(moves):
+        position.make_move(move)
+        if ply in swings:
+            yield {"fen": position.fen(), "time": time_limit, "hash": hash_mb, "source": f"{source}:{ply + 1}"}
+
+
+def mine(
+    database, games, workers=1, time_limit=0.5, hash_mb=16, cache_path=DEFAULT_CACHE_PATH, on_game=None,
+    out=sys.stdout,
+):
+    """Добыть задачи из партий (стартовый FEN, ходы, оценки или None, источник). Возвращает число новых.
+
+    on_game(источник) вызывается, когда партия разобрана и её задачи записаны.
+    """
+    annotator = GameAnnotator(cache_path, workers, time_limit, hash_mb)
+    pool = multiprocessing.get_context("spawn").Pool(max(1, workers))
+    added = 0
+    try:
+        for start_fen, moves, scores, source in games:
+            if scores is None or len(scores) != len(moves) + 1:
+                annotator.start(start_fen, moves)
+                while annotator.busy():
+                    time.sleep(0.05)
+                    annotator.poll()
+                scores = annotator.scores
+            tasks = list(candidate_tasks(start_fen, moves, scores, time_limit, hash_mb, source))
+            puzzles = [puzzle for puzzle in pool.imap(build_puzzle, tasks) if puzzle is not None]
+            for puzzle in puzzles:
+                validate_puzzle(puzzle)
+            new = database.add_puzzles(puzzles)
+            added += new
+            print(f"{source}: перемен оценки {len(tasks)}, новых задач {new}", file=out, flush=True)
+            if on_game is not None:
+                on_game(source)
+    finally:
+        pool.close()
+        pool.join()
+        annotator.close()
+    return added
+
+
+def _bench_rows(database, count, rng):
+    """Синтетические задачи для замера: копии настоящих (или начальная позиция) со случайным рейтингом."""
+    samples = [
+        (fen, moves) for fen, moves in database.connection.execute("SELECT fen, moves FROM puzzles LIMIT 1000")
+    ] or [(START_FEN, "e2e4")]
+    for index in range(count):
+        fen, moves = samples[index % len(samples)]
+        rating = max(400, min(2800, int(rng.gauss(1500, 350))))
+        themes = rng.sample(THEMES[6:], 2)
+        yield {"key": index, "fen": fen, "moves": moves.split(), "rating": rating, "themes": themes, "source": "bench"}
+
+
+def bench(source_path, count, queries=1000, band=100, seed=1, out=sys.stdout):
+    """Время выборки случайной задачи из базы на count задач (временный файл)."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        with PuzzleDatabase(source_path) as source:
+            rows = list(_bench_rows(source, count, rng))
+        with PuzzleDatabase(os.path.join(directory, "bench.db")) as database:
+            start = time.perf_counter()
+            database.add_puzzles(rows, rng)
+            print(f"{count} задач записано за {time.perf_counter() - start:.1f} с", file=out)
+            del rows
+            # Последний замер - редкие рейтинги на краю распределения
+            for theme, lowest, highest in ((None, 800, 2200), ("crushing", 800, 2200), (None, 2500, 2700)):
+                timings = []
+                for _ in range(queries):
+                    rating = rng.randrange(lowest, highest)
+                    start = time.perf_counter()
+                    database.random_puzzle(rating - band, rating + band, theme, rng)
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                print(
+                    f"тема {theme or 'любая'}, рейтинг {lowest}-{highest}: среднее {statistics.mean(timings):.3f} мс, "
+                    f"99% {timings[int(len(timings) * 0.99) - 1]:.3f} мс",
+                    file=out,
+                )
+            start = time.perf_counter()
+            database.connection.execute(
+                "SELECT id FROM puzzles WHERE rating BETWEEN ? AND ? ORDER BY RANDOM() LIMIT 1", (1400, 1600)
+            ).fetchone()
+            print(f"для сравнения ORDER BY RANDOM(): {(time.perf_counter() - start) * 1000:.1f} мс", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Тактические задачи chess_engine")
+    parser.add_argument("--db", default=DEFAULT_PUZZLE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    mine_parser = commands.add_parser("mine", help="добыть задачи из партий")
+    mine_parser.add_argument("games", nargs="*", help="файлы PGN или JSONL матчей; без них - партии из базы")
+    mine_parser.add_argument("--time", type=float, default=0.5, help="секунд на позицию")
+    mine_parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    mine_parser.add_argument("--hash", type=int, default=16)
+    mine_parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    random_parser = commands.add_parser("random", help="случайная задача")
+    random_parser.add_argument("--rating", type=int, default=1500)
+    random_parser.add_argument("--band", type=int, default=100)
+    random_parser.add_argument("--theme")
+    commands.add_parser("stats", help="число задач по темам")
+    bench_parser = commands.add_parser("bench", help="скорость выборки на большой базе")
+    bench_parser.add_argument("--count", type=int, default=300000)
+    bench_parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.db, args.count, args.queries)
+        return 0
+
+    with PuzzleDatabase(args.db) as database:
+        if args.command == "mine":
+            if args.games:
+                games = ((fen, moves, None, source) for fen, moves, source in read_games(args.games))
+                added = mine(database, games, args.workers, args.time, args.hash, args.cache)
+            else:
+                ids = {}
+                games = []
+                for game_id, fen, texts, scores, source in database.pending_games():
+                    position = ChessPosition.from_fen(fen)
+                    moves = []
+                    for text in texts:
+                        moves.append(parse_uci(position, text))
+                        position.make_move(moves[-1])
+                    source = f"{source or 'game'}#{game_id}"
+                    ids[source] = game_id
+                    games.append((fen, moves, scores, source))
+                added = mine(
+                    database, games, args.workers, args.time, args.hash, args.cache,
+                    lambda source: database.mark_mined(ids[source]),
+                )
+            print(f"новых задач {added}, всего {database.count()}")
+        elif args.command == "random":
+            puzzle = database.random_puzzle(args.rating - args.band, args.rating + args.band, args.theme)
+            if puzzle is None:
+                print("задач в этом диапазоне нет")
+                return 1
+            position = ChessPosition.from_fen(puzzle["fen"])
+            sans = []
+            for text in puzzle["moves"]:
+                move = parse_uci(position, text)
+                sans.append(move_san(position, move))
+                position.make_move(move)
+            print(f"#{puzzle['id']} рейтинг {puzzle['rating']}, темы: {' '.join(puzzle['themes'])}")
+            print(puzzle["fen"])
+            print("решение:", " ".join(sans))
+        else:
+            print(f"всего задач {database.count()}")
+            for theme, count in sorted(database.theme_counts().items()):
+                print(f"{theme:12} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Перебор альфа-бета с итеративным углублением и форсированным вариантом."""
+import time
+
+from .evaluate import evaluate
+from .ordering import ORDER_HISTORY, MoveOrderer
+from .position import EMPTY, MOVE_EN_PASSANT
+from .stats import SearchStats
+from .tt import EXACT, LOWER, UPPER, TranspositionTable
+
+MATE = 100000
+MATE_BOUND = MATE - 1000
+INFINITY = MATE + 1
+
+# Уровень сложности из настроек -> (глубина, секунд на ход)
+DIFFICULTY_LIMITS = {
+    "Easy": (2, 0.5),
+    "Medium": (4, 2.0),
+    "Hard": (6, 5.0),
+}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def score_to_tt(score, ply):
+    """Мат в таблице хранится относительно текущего узла, а не корня."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def tablebase_score(result, plies, ply):
+    """Ответ таблиц (результат, полуходов до мата) в масштабе оценок перебора."""
+    if result > 0:
+        return MATE - ply - plies
+    if result < 0:
+        return -MATE + ply + plies
+    return 0
+
+
+class Searcher:
+    """Поиск лучшего хода. stop_event (threading/multiprocessing Event) прерывает поиск извне.
+
+    Если передана дебютная книга (book.OpeningBook), ход из неё возвращается без перебора.
+    Эндшпильные таблицы (tablebase.Tablebase) дают точный ход в корне и точную
+    оценку в узлах перебора. ordering - уровень упорядочивания ходов из ordering.ORDER_LEVELS.
+    network (nnue.Network) заменяет ручную оценку в листьях нейросетью.
+    """
+
+    def __init__(self, stop_event=None, tt=None, book=None, tablebase=None, ordering=ORDER_HISTORY, network=None):
+        self.stop_event = stop_event
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.book = book
+        self.tablebase = tablebase
+        self.probe_tables = False
+        self.nodes = 0
+        self.stats = SearchStats()
+        self.ordering = MoveOrderer(ordering, self.stats.phase_time)
+        self.network = network
+        self.evaluate = network.evaluate if network is not None else evaluate
+        self.deadline = None
+        self.max_nodes = None
+
+    def search(self, position, max_depth=64, time_limit=None, on_iteration=None, start_depth=1, max_nodes=None):
+        """Вернуть (лучший ход, оценка). on_iteration(info) вызывается после каждой глубины.
+
+        max_nodes ограничивает перебор с точностью до 1024 узлов.
+        """
+        if self.book is not None:
+            move = self.book.choose(position)
+            if move is not None:
+                return move, 0
+        if self.tablebase is not None:
+            found = self.tablebase.best_move(position)
+            if found is not None:
+                move, result, plies = found
+                return move, tablebase_score(result, plies, 0)
+
+        # Сеть ведёт свои накопители в make_move, поэтому ей нужна своя копия позиции
+        position = self.network.attach(position) if self.network is not None else position.copy()
+        # Перебор дойдёт до позиций из таблиц только в почти пустом эндшпиле
+        self.probe_tables = self.tablebase is not None and sum(1 for piece in position.board if piece) <= 5
+        self.nodes = 0
+        self.stats.reset()
+        self.ordering.phase_time = self.stats.phase_time
+        self.ordering.new_search()
+        self.tt.new_search()
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit else None
+        self.max_nodes = max_nodes
+
+        moves = position.legal_moves()
+        if not moves:
+            return None, -MATE if position.in_check(position.turn) else 0
+
+        best_move = moves[0]
+        best_score = 0
+        for depth in range(start_depth, max_depth + 1):
+            try:
+                score, move = self._search_root(position, moves, depth)
+            except SearchTimeout:
+                break
+            best_move, best_score = move, score
+            moves.remove(move)
+            moves.insert(0, move)
+            if on_iteration:
+                elapsed = time.perf_counter() - start
+                self.stats.nodes = self.nodes
+                tt_stats = self.tt.stats()
+                on_iteration({
+                    "depth": depth,
+                    "seldepth": self.stats.seldepth,
+                    "move": move,
+                    "score": score,
+                    "nodes": self.nodes,
+                    "time": elapsed,
+                    "nps": int(self.nodes / elapsed) if elapsed else 0,
+                    "tt_hit_rate": tt_stats["hit_rate"],
+                    "hashfull": tt_stats["hashfull"],
+                    "tt_memory": tt_stats["memory_bytes"],
+                    "stats": self.stats.report(depth, elapsed, self.tt),
+                })
+            if abs(score) >= MATE_BOUND or len(moves) == 1:
+                break
+        return best_move, best_score
+
+    def ponder_move(self, position, move):
+        """Ожидаемый ответ соперника на move: ход из таблицы транспозиций или эндшпильных таблиц."""
+        position.make_move(move)
+        try:
+            entry = self.tt.probe(position.key)
+            reply = entry[3] if entry is not None else None
+            if reply is None and self.tablebase is not None:
+                found = self.tablebase.best_move(position)
+                reply = found[0] if found is not None else None
+            if reply is not None and reply not in position.legal_moves():
+                reply = None
+        finally:
+            position.unmake_move()
+        return reply
+
+    def _check_limits(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+
+    def _search_root(self, position, moves, depth):
+        alpha = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            position.make_move(move)
+            try:
+                score = -self._negamax(position, depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                position.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.tt.store(position.key, depth, EXACT, score_to_tt(alpha, 0), best_move)
+        return alpha, best_move
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        stats = self.stats
+        phase_time = stats.phase_time
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+        if ply > stats.seldepth:
+            stats.seldepth = ply
+        if position.halfmove_clock >= 100 or position.repetitions():
+            return 0
+        if self.probe_tables:
+            started = time.perf_counter()
+            verdict = self.tablebase.probe(position)
+            phase_time["tablebase"] += time.perf_counter() - started
+            if verdict is not None:
+                return tablebase_score(verdict[0], verdict[1], ply)
+        if depth <= 0:
+            return self._quiesce(position, alpha, beta, ply)
+
+        key = position.key
+        tt_move = None
+        started = time.perf_counter()
+        entry = self.tt.probe(key)
+        phase_time["tt"] += time.perf_counter() - started
+        stats.tt_probes += 1
+        if entry is not None:
+            stats.tt_hits += 1
+            tt_depth, flag, score, tt_move = entry
+            if tt_depth >= depth:
+                score = score_from_tt(score, ply)
+                if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                    stats.tt_cutoffs += 1
+                    return score
+
+        original_alpha = alpha
+        best = -INFINITY
+        best_move = None
+        searched = 0
+        for move in self.ordering.moves(position, ply, tt_move):
+            position.make_move(move)
+            try:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move()
+            searched += 1
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        stats.beta_cutoffs += 1
+                        if searched == 1:
+                            stats.first_move_cutoffs += 1
+                        if not self._is_tactical(position, move):
+                            self.ordering.cutoff(position, move, ply, depth)
+                        break
+        if not searched:
+            return -MATE + ply if position.in_check(position.turn) else 0
+
+        if best >= beta:
+            flag = LOWER
+        elif best > original_alpha:
+            flag = EXACT
+        else:
+            flag = UPPER
+        started = time.perf_counter()
+        self.tt.store(key, depth, flag, score_to_tt(best, ply), best_move)
+        phase_time["tt"] += time.perf_counter() - started
+        return best
+
+    def _quiesce(self, position, alpha, beta, ply):
+        stats = self.stats
+        phase_time = stats.phase_time
+        self.nodes += 1
+        stats.qnodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+        if ply > stats.seldepth:
+            stats.seldepth = ply
+
+        in_check = position.in_check(position.turn)
+        if in_check:
+            # Под шахом смотрим все ответы, иначе не отличить мат
+            best = -INFINITY
+            moves = self.ordering.moves(position, ply)
+        else:
+            # Пат здесь не распознаётся: тихие ходы в форсированном варианте не строятся
+            started = time.perf_counter()
+            best = self.evaluate(position)
+            phase_time["evaluate"] += time.perf_counter() - started
+            if best >= beta:
+                return best
+            alpha = max(alpha, best)
+            moves = self.ordering.captures(position)
+
+        searched = 0
+        for move in moves:
+            position.make_move(move)
+            try:
+                score = -self._quiesce(position, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move()
+            searched += 1
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        stats.beta_cutoffs += 1
+                        if searched == 1:
+                            stats.first_move_cutoffs += 1
+                        break
+        if in_check and not searched:
+            return -MATE + ply
+        return best
+
+    @staticmethod
+    def _is_tactical(position, move):
+        return position.board[(move >> 6) & 63] != EMPTY or (move >> 12) & 7 or move >> 15 == MOVE_EN_PASSANT
+
@@ -0,0 +1,55 @@
+"""Замер параллельного поиска: время до заданной глубины на 1..N процессах.
+
+    python -m chess_engine.smp --threads 4 --depth 5
+"""
+import argparse
+import os
+import sys
+import time
+
+from .perft import REFERENCE_POSITIONS
+from .worker import EngineWorker
+
+# Эталонные позиции perft с нормальным материалом (без коротких частных случаев)
+BENCH_POSITIONS = ("start", "kiwipete", "position3", "position4", "position5", "position6")
+
+
+def time_to_depth(threads, depth, tt_mb=16, names=BENCH_POSITIONS):
+    """[(позиция, секунд, узлов основного процесса)] для поиска на threads процессах."""
+    fens = {name: fen for name, fen, _ in REFERENCE_POSITIONS}
+    worker = EngineWorker(threads=threads, tt_mb=tt_mb)
+    worker.start()
+    rows = []
+    try:
+        for name in names:
+            start = time.perf_counter()
+            job = worker.go(fens[name], [], depth, None)
+            _, _, _, info = worker.wait(job)
+            rows.append((name, time.perf_counter() - start, info["nodes"] if info else 0))
+    finally:
+        worker.close()
+    return rows
+
+
+def run_scaling(max_threads, depth, tt_mb=16, out=sys.stdout):
+    base = None
+    for threads in range(1, max_threads + 1):
+        rows = time_to_depth(threads, depth, tt_mb)
+        total = sum(elapsed for _, elapsed, _ in rows)
+        base = base or total
+        detail = ", ".join(f"{name} {elapsed:.2f}" for name, elapsed, _ in rows)
+        print(f"{threads} проц.: {total:.2f} с, ускорение x{base / total:.2f} ({detail})", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Масштабирование параллельного поиска chess_engine")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="наибольшее число процессов")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--hash", type=float, default=16, help="размер таблицы транспозиций, МБ")
+    args = parser.parse_args(argv)
+    run_scaling(args.threads, args.depth, args.hash)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Счётчики перебора и запись их в JSON Lines.
+
+Searcher заполняет SearchStats во время поиска и после каждой глубины
+кладёт снимок (report) в info["stats"]. Снимок - обычный словарь, его можно
+передать через очередь процесса, показать на экране или дописать в файл.
+
+    python -m chess_engine.stats --depth 5 --out stats.jsonl   # профиль на эталонных позициях
+"""
+import argparse
+import json
+import sys
+import time
+
+# Части перебора, время которых замеряется отдельно; остальное - сам обход дерева
+PHASES = ("movegen", "evaluate", "order", "tt", "tablebase")
+
+
+class SearchStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.seldepth = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.phase_time = dict.fromkeys(PHASES, 0.0)
+        self.iteration_start = time.perf_counter()
+
+    def report(self, depth, elapsed, tt):
+        """Снимок после завершённой глубины depth; elapsed - секунд с начала поиска."""
+        now = time.perf_counter()
+        measured = sum(self.phase_time.values())
+        phases = {name: round(value, 6) for name, value in self.phase_time.items()}
+        phases["search"] = round(max(elapsed - measured, 0.0), 6)
+        record = {
+            "depth": depth,
+            "seldepth": self.seldepth,
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "nps": int(self.nodes / elapsed) if elapsed else 0,
+            "time": round(elapsed, 6),
+            "iteration_time": round(now - self.iteration_start, 6),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_cutoffs": self.tt_cutoffs,
+            "hashfull": tt.hashfull(),
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_rate": self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0,
+            "phase_time": phases,
+        }
+        self.iteration_start = now
+        return record
+
+
+class StatsLog:
+    """Файл JSON Lines: одна строка на каждую глубину каждого поиска."""
+
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record, **extra):
+        self.file.write(json.dumps(dict(extra, **record), ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_stats(stats):
+    """Строки для экрана: узлы, таблица транспозиций, отсечения и доли времени."""
+    total = stats["time"] or 1.0
+    phases = ", ".join(
+        f"{name} {value / total:.0%}"
+        for name, value in sorted(stats["phase_time"].items(), key=lambda item: -item[1])
+    )
+    return [
+        f"Глубина {stats['depth']}/{stats['seldepth']}, узлов {stats['nodes']} "
+        f"(форсир. {stats['qnodes']}), {stats['nps']} в с",
+        f"Таблица: {stats['tt_hits']}/{stats['tt_probes']} попаданий, {stats['tt_cutoffs']} отсечений, "
+        f"заполнена на {stats['hashfull'] / 10:.0f}%",
+        f"Отсечений {stats['beta_cutoffs']}, первым ходом {stats['first_move_rate']:.0%}",
+        f"Время {stats['time']:.2f} с: {phases}",
+    ]
+
+
+def main(argv=None):
+    # search.py сам импортирует этот модуль
+    from .perft import REFERENCE_POSITIONS
+    from .position import ChessPosition
+    from .search import Searcher
+    from .smp import BENCH_POSITIONS
+
+    parser = argparse.ArgumentParser(description="Профиль перебора chess_engine")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--fen", help="одна позиция вместо эталонных")
+    parser.add_argument("--out", help="дописать снимки в файл JSON Lines")
+    args = parser.parse_args(argv)
+
+    fens = [args.fen] if args.fen else [fen for name, fen, _ in REFERENCE_POSITIONS if name in BENCH_POSITIONS]
+    log = StatsLog(args.out) if args.out else None
+    try:
+        for fen in fens:
+            searcher = Searcher()
+            last = None
+
+            def report(info):
+                nonlocal last
+                last = info["stats"]
+                if log is not None:
+                    log.write(last, fen=fen)
+
+            searcher.search(ChessPosition.from_fen(fen), args.depth, on_iteration=report)
+            print(fen)
+            if last is not None:
+                for line in format_stats(last):
+                    print("  " + line)
+    finally:
+        if log is not None:
+            log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Прогон тактического сборника EPD через движок с фиксированным временем на позицию.
+
+    python -m chess_engine.suite wac.epd --time 1.0 --out suite.jsonl
+
+Позиция решена, если последний найденный ход есть в bm и нет в am. Время решения -
+конец той глубины, начиная с которой движок больше не менял ход на неверный.
+Строки сборника читаются по одной, результат каждой позиции печатается сразу.
+"""
+import argparse
+import json
+import multiprocessing
+import statistics
+import sys
+import time
+
+from . import BACKENDS
+from .notation import move_san, parse_san, parse_uci
+from .search import Searcher
+from .tt import TranspositionTable
+
+# Доли времени на позицию, для которых в итоге печатается число решённых
+TIME_MARKS = (0.1, 0.25, 0.5, 1.0)
+
+
+def read_suite(path):
+    """Строки EPD из файла по одной, без пустых и комментариев (#)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(line for line in f if line.strip() and not line.lstrip().startswith("#")):
+            yield index, line.strip()
+
+
+def _parse_moves(position, texts):
+    moves = set()
+    for text in texts:
+        move = parse_san(position, text)
+        if move is None:
+            move = parse_uci(position, text)
+        if move is not None:
+            moves.add(move)
+    return moves
+
+
+def solve(task):
+    """Решить одну позицию. task - словарь из make_tasks; возвращает запись для JSONL."""
+    try:
+        position, operations = BACKENDS[task["backend"]].from_epd(task["line"])
+        position.validate()
+    except ValueError as error:
+        return {
+            "index": task["index"], "id": str(task["index"] + 1), "fen": task["line"], "bm": [], "am": [],
+            "move": None, "solved": False, "solve_time": None, "depth": 0, "nodes": 0, "time": 0.0,
+            "error": str(error),
+        }
+    best = _parse_moves(position, operations.get("bm", []))
+    avoid = _parse_moves(position, operations.get("am", []))
+    record = {
+        "index": task["index"],
+        "id": " ".join(operations.get("id", [])) or str(task["index"] + 1),
+        "fen": position.fen(),
+        "bm": operations.get("bm", []),
+        "am": operations.get("am", []),
+    }
+    if not best and not avoid:
+        record.update(move=None, solved=False, solve_time=None, depth=0, nodes=0, time=0.0, error="нет bm/am")
+        return record
+
+    def correct(move):
+        return (not best or move in best) and move not in avoid
+
+    iterations = []
+    searcher = Searcher(tt=TranspositionTable(task["hash"]))
+    start = time.perf_counter()
+    move, _ = searcher.search(
+        position, task["depth"], task["time"], lambda info: iterations.append((info["time"], info["move"]))
+    )
+    elapsed = time.perf_counter() - start
+
+    solve_time = None
+    if move is not None and correct(move):
+        solve_time = elapsed
+        # Самая ранняя глубина, после которой ход оставался верным до конца
+        for iteration_time, iteration_move in reversed(iterations):
+            if not correct(iteration_move):
+                break
+            solve_time = iteration_time
+    record.update(
+        move=move_san(position, move) if move is not None else None,
+        solved=solve_time is not None,
+        solve_time=round(solve_time, 4) if solve_time is not None else None,
+        depth=len(iterations),
+        nodes=searcher.nodes,
+        time=round(elapsed, 4),
+    )
+    return record
+
+
+def make_tasks(lines, time_limit, depth=64, hash_mb=16, backend="array"):
+    """Задачи для solve по строкам сборника (генератор - сборник не читается целиком)."""
+    for index, line in lines:
+        yield {"index": index, "line": line, "time": time_limit, "depth": depth, "hash": hash_mb, "backend": backend}
+
+
+class SuiteStats:
+    def __init__(self, time_limit):
+        self.time_limit = time_limit
+        self.total = 0
+        self.skipped = 0
+        self.solve_times = []
+        self.nodes = 0
+        self.time = 0.0
+
+    def add(self, record):
+        if record.get("error"):
+            self.skipped += 1
+            return
+        self.total += 1
+        self.nodes += record["nodes"]
+        self.time += record["time"]
+        if record["solved"]:
+            self.solve_times.append(record["solve_time"])
+
+    def summary(self):
+        solved = len(self.solve_times)
+        lines = [f"Решено {solved} из {self.total} ({solved / self.total:.1%})" if self.total else "Позиций нет"]
+        if solved:
+            lines.append(
+                f"Время решения: среднее {statistics.mean(self.solve_times):.3f} с, "
+                f"медиана {statistics.median(self.solve_times):.3f} с"
+            )
+        marks = ", ".join(
+            f"{self.time_limit * mark:g} с - {sum(1 for value in self.solve_times if value <= self.time_limit * mark)}"
+            for mark in TIME_MARKS
+        )
+        lines.append(f"Решено к моменту: {marks}")
+        if self.skipped:
+            lines.append(f"Пропущено некорректных строк: {self.skipped}")
+        if self.time:
+            lines.append(f"Узлов {self.nodes}, {self.nodes / self.time:.0f} в с")
+        return "\n".join(lines)
+
+
+def _format_record(record):
+    if record.get("error"):
+        return f"{record['id']}: пропущено ({record['error']})"
+    expected = " ".join(record["bm"]) or "не " + " ".join(record["am"])
+    verdict = f"решено за {record['solve_time']:.3f} с" if record["solved"] else "не решено"
+    return f"{record['id']}: {record['move']} (нужно {expected}), {verdict}, глубина {record['depth']}"
+
+
+def run_suite(tasks, workers, time_limit, out_path=None, out=sys.stdout):
+    stats = SuiteStats(time_limit)
+    log = open(out_path, "a", encoding="utf-8") if out_path else None
+    pool = None
+    try:
+        if workers > 1:
+            pool = multiprocessing.get_context("spawn").Pool(workers)
+            records = pool.imap(solve, tasks)
+        else:
+            records = map(solve, tasks)
+        for record in records:
+            stats.add(record)
+            print(_format_record(record), file=out, flush=True)
+            if log is not None:
+                log.write(json.dumps(record, ensure_ascii=False) + "\n")
+                log.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if log is not None:
+            log.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Прогон сборника EPD через chess_engine")
+    parser.add_argument("suite", help="файл EPD с операциями bm/am")
+    parser.add_argument("--time", type=float, default=1.0, help="секунд на позицию")
+    parser.add_argument("--depth", type=int, default=64)
+    parser.add_argument("--hash", type=int, default=16, help="МБ таблицы транспозиций")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="array")
+    parser.add_argument("--workers", type=int, default=1, help="позиций одновременно (время на ход не делится)")
+    parser.add_argument("--out", help="дописать результаты в файл JSON Lines")
+    args = parser.parse_args(argv)
+
+    tasks = make_tasks(read_suite(args.suite), args.time, args.depth, args.hash, args.backend)
+    start = time.perf_counter()
+    stats = run_suite(tasks, args.workers, args.time, args.out)
+    print(stats.summary())
+    print(f"{stats.total + stats.skipped} позиций за {time.perf_counter() - start:.0f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""Эндшпильные таблицы для трёх фигур: KQK, KRK и KPK.
+
+Таблицы строятся ретроградным анализом: от матов назад по обратным ходам,
+слой за слоем, поэтому в каждой клетке - точное расстояние до мата в полуходах.
+Сильная сторона всегда приводится к белым (при необходимости доска
+отражается по горизонтали со сменой цвета).
+
+Файл таблицы - массив байтов без заголовка, один байт на позицию:
+0 - ничья или невозможная позиция, n > 0 - мат через n - 1 полуходов
+(выигрывает сильная сторона). Индекс учитывает симметрию доски:
+без пешек белый король приводится в треугольник a1-d1-d4 (10 клеток),
+с пешкой - доска отражается так, чтобы пешка стояла на вертикалях a-d.
+
+    python -m chess_engine.tablebase generate            # построить все таблицы
+    python -m chess_engine.tablebase probe --fen "<FEN>"
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+
+from .notation import move_san
+from .position import (
+    ChessPosition,
+    WHITE,
+    BLACK,
+    EMPTY,
+    PAWN,
+    ROOK,
+    QUEEN,
+    KING,
+    KING_TARGETS,
+    ROOK_RAYS,
+    BISHOP_RAYS,
+    PAWN_ATTACKS,
+    row_of,
+    col_of,
+    square,
+)
+
+DEFAULT_TABLEBASE_DIR = os.path.join("assets", "tablebases")
+
+# Таблица -> фигура сильной стороны; KPK опирается на KQK и KRK после превращения
+TABLES = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+GENERATION_ORDER = ("KQK", "KRK", "KPK")
+
+ADJACENT = [set(targets) for targets in KING_TARGETS]
+SLIDER_RAYS = {QUEEN: [a + b for a, b in zip(ROOK_RAYS, BISHOP_RAYS)], ROOK: ROOK_RAYS}
+
+
+def _transform(fn):
+    return [square(*fn(row_of(sq), col_of(sq))) for sq in range(64)]
+
+
+# Восемь симметрий доски как перестановки клеток
+SYMMETRIES = [
+    _transform(lambda r, c: (r, c)),
+    _transform(lambda r, c: (r, 7 - c)),
+    _transform(lambda r, c: (7 - r, c)),
+    _transform(lambda r, c: (7 - r, 7 - c)),
+    _transform(lambda r, c: (c, r)),
+    _transform(lambda r, c: (c, 7 - r)),
+    _transform(lambda r, c: (7 - c, r)),
+    _transform(lambda r, c: (7 - c, 7 - r)),
+]
+MIRROR_FILES = SYMMETRIES[1]
+
+# Треугольник a1-d1-d4: нижний левый квадрант на диагонали a1-h8 и под ней
+TRIANGLE = [sq for sq in range(64) if row_of(sq) >= 4 and col_of(sq) <= 3 and row_of(sq) + col_of(sq) >= 7]
+TRIANGLE_INDEX = {sq: i for i, sq in enumerate(TRIANGLE)}
+TRIANGLE_SYMMETRY = [next(t for t in SYMMETRIES if t[sq] in TRIANGLE_INDEX) for sq in range(64)]
+
+# Пешка на вертикалях a-d, горизонтали 2-7
+PAWN_SQUARES = [sq for sq in range(64) if 1 <= row_of(sq) <= 6 and col_of(sq) <= 3]
+PAWN_INDEX = {sq: i for i, sq in enumerate(PAWN_SQUARES)}
+
+
+def table_size(name):
+    if TABLES[name] == PAWN:
+        return 2 * len(PAWN_SQUARES) * 64 * 64
+    return 2 * len(TRIANGLE) * 64 * 64
+
+
+def table_index(name, stm, wk, bk, piece):
+    """Индекс позиции в сжатой таблице; stm - 0 (ход белых) или 1 (ход чёрных)."""
+    if TABLES[name] == PAWN:
+        if col_of(piece) > 3:
+            wk, bk, piece = MIRROR_FILES[wk], MIRROR_FILES[bk], MIRROR_FILES[piece]
+        return ((stm * len(PAWN_SQUARES) + PAWN_INDEX[piece]) * 64 + wk) * 64 + bk
+    t = TRIANGLE_SYMMETRY[wk]
+    return ((stm * len(TRIANGLE) + TRIANGLE_INDEX[t[wk]]) * 64 + t[bk]) * 64 + t[piece]
+
+
+def attacks(kind, frm, target, blocker):
+    """Бьёт ли белая фигура kind с клетки frm клетку target; blocker - единственная помеха."""
+    if kind == PAWN:
+        return target in PAWN_ATTACKS[WHITE][frm]
+    for ray in SLIDER_RAYS[kind][frm]:
+        for sq in ray:
+            if sq == target:
+                return True
+            if sq == blocker:
+                break
+    return False
+
+
+class _Generator:
+    """Ретроградный анализ на полном (без симметрий) пространстве позиций."""
+
+    def __init__(self, kind, promotions=None):
+        self.kind = kind
+        self.promotions = promotions or {}
+        # Индекс: ход (0 - белые, 1 - чёрные), белый король, чёрный король, фигура
+        self.values = bytearray(2 * 64 * 64 * 64)
+        self.counters = bytearray(b"\xff" * (64 * 64 * 64))
+        self.buckets = [[]]
+
+    @staticmethod
+    def index(stm, wk, bk, piece):
+        return ((stm * 64 + wk) * 64 + bk) * 64 + piece
+
+    def piece_squares(self):
+        if self.kind == PAWN:
+            return [sq for sq in range(64) if 1 <= row_of(sq) <= 6]
+        return range(64)
+
+    def black_moves(self, wk, bk, piece):
+        kind = self.kind
+        return [
+            to for to in KING_TARGETS[bk]
+            if to not in ADJACENT[wk] and (to == piece or not attacks(kind, piece, to, wk))
+        ]
+
+    def push(self, dtm, idx):
+        while len(self.buckets) <= dtm:
+            self.buckets.append([])
+        self.buckets[dtm].append(idx)
+
+    def seed(self):
+        kind = self.kind
+        for wk in range(64):
+            for bk in range(64):
+                if bk == wk or bk in ADJACENT[wk]:
+                    continue
+                for piece in self.piece_squares():
+                    if piece == wk or piece == bk:
+                        continue
+                    in_check = attacks(kind, piece, bk, wk)
+                    if in_check and not self.black_moves(wk, bk, piece):
+                        self.push(0, self.index(1, wk, bk, piece))
+                    if kind == PAWN and row_of(piece) == 1 and not in_check:
+                        self.seed_promotion(wk, bk, piece)
+
+    def seed_promotion(self, wk, bk, piece):
+        to = piece - 8
+        if to == wk or to == bk:
+            return
+        best = None
+        for values in self.promotions.values():
+            value = values[self.index(1, wk, bk, to)]
+            if value and (best is None or value < best):
+                best = value
+        if best is not None:
+            # value - 1 полуходов до мата после превращения, плюс сам ход пешки
+            self.push(best, self.index(0, wk, bk, piece))
+
+    def white_unmoves(self, wk, bk, piece):
+        """Позиции с ходом белых, из которых белые пришли в (wk, bk, piece)."""
+        kind = self.kind
+        for frm in KING_TARGETS[wk]:
+            if frm != bk and frm != piece and frm not in ADJACENT[bk] and not attacks(kind, piece, bk, frm):
+                yield self.index(0, frm, bk, piece)
+        if kind == PAWN:
+            frm = piece + 8
+            if row_of(frm) <= 6 and frm != wk and frm != bk:
+                if not attacks(kind, frm, bk, wk):
+                    yield self.index(0, wk, bk, frm)
+                if row_of(piece) == 4 and frm + 8 != wk and frm + 8 != bk and not attacks(kind, frm + 8, bk, wk):
+                    yield self.index(0, wk, bk, frm + 8)
+            return
+        for ray in SLIDER_RAYS[kind][piece]:
+            for frm in ray:
+                if frm == wk or frm == bk:
+                    break
+                if not attacks(kind, frm, bk, wk):
+                    yield self.index(0, wk, bk, frm)
+
+    def black_unmoves(self, wk, bk, piece):
+        """Позиции с ходом чёрных, из которых чёрные пришли в (wk, bk, piece)."""
+        for frm in KING_TARGETS[bk]:
+            if frm != wk and frm != piece and frm not in ADJACENT[wk]:
+                yield frm
+
+    def run(self):
+        self.seed()
+        values = self.values
+        counters = self.counters
+        dtm = 0
+        while dtm < len(self.buckets):
+            for idx in self.buckets[dtm]:
+                if values[idx]:
+                    continue
+                values[idx] = dtm + 1
+                piece = idx & 63
+                bk = (idx >> 6) & 63
+                wk = (idx >> 12) & 63
+                if idx >> 18:
+                    for prev in self.white_unmoves(wk, bk, piece):
+                        if not values[prev]:
+                            self.push(dtm + 1, prev)
+                    continue
+                for frm in self.black_unmoves(wk, bk, piece):
+                    prev = self.index(1, wk, frm, piece)
+                    if values[prev]:
+                        continue
+                    left = counters[prev - (1 << 18)]
+                    if left == 0xFF:
+                        left = len(self.black_moves(wk, frm, piece))
+                    left -= 1
+                    counters[prev - (1 << 18)] = left
+                    if not left:
+                        self.push(dtm + 1, prev)
+            dtm += 1
+        return values
+
+
+def generate(name, directory=DEFAULT_TABLEBASE_DIR, promotions=None):
+    """Построить таблицу name и записать её в directory. Возвращает полный массив значений."""
+    kind = TABLES[name]
+    values = _Generator(kind, promotions).run()
+    packed = bytearray(table_size(name))
+    for stm in (0, 1):
+        for wk in range(64):
+            for bk in range(64):
+                for piece in range(64):
+                    value = values[_Generator.index(stm, wk, bk, piece)]
+                    if value:
+                        packed[table_index(name, stm, wk, bk, piece)] = value
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(packed)
+    return values
+
+
+def generate_all(directory=DEFAULT_TABLEBASE_DIR, out=sys.stdout):
+    full = {}
+    for name in GENERATION_ORDER:
+        start = time.perf_counter()
+        promotions = {kind: full[other] for other, kind in TABLES.items() if other in full and kind != PAWN}
+        full[name] = generate(name, directory, promotions if TABLES[name] == PAWN else None)
+        longest = max(full[name]) - 1
+        print(f"{name}: {table_size(name)} байт, самый длинный мат {longest} полуходов, "
+              f"{time.perf_counter() - start:.1f} с", file=out)
+
+
+class Tablebase:
+    """Зонд таблиц: файлы отображаются в память при первом обращении."""
+
+    def __init__(self, directory=DEFAULT_TABLEBASE_DIR):
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+
+    def _table(self, name):
+        if name not in self.tables:
+            path = os.path.join(self.directory, f"{name}.bin")
+            data = None
+            if os.path.exists(path) and os.path.getsize(path) == table_size(name):
+                f = open(path, "rb")
+                self.files.append(f)
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.tables[name] = data
+        return self.tables[name]
+
+    def close(self):
+        for data in self.tables.values():
+            if data is not None:
+                data.close()
+        for f in self.files:
+            f.close()
+        self.tables = {}
+        self.files = []
+
+    def probe(self, position):
+        """(результат, полуходов до мата) для стороны на ходу: 1 - выигрыш, -1 - проигрыш, 0 - ничья.
+
+        None, если материал не из таблиц. Голые короли и лёгкая фигура
+        против короля - ничья без обращения к файлам.
+        """
+        if position.castling:
+            return None
+        extra = None
+        for sq, piece in enumerate(position.board):
+            if piece == EMPTY or abs(piece) == KING:
+                continue
+            if extra is not None:
+                return None
+            extra = (sq, piece)
+        if extra is None:
+            return 0, 0
+        sq, piece = extra
+        kind = abs(piece)
+        name = next((name for name, table_kind in TABLES.items() if table_kind == kind), None)
+        if name is None:
+            return 0, 0
+
+        strong = WHITE if piece > 0 else BLACK
+        wk = position.kings[strong]
+        bk = position.kings[-strong]
+        if strong == BLACK:
+            # Отражаем доску по горизонтали, чтобы сильной стороной были белые
+            wk, bk, sq = wk ^ 56, bk ^ 56, sq ^ 56
+        stm = 0 if position.turn == strong else 1
+        data = self._table(name)
+        if data is None:
+            return None
+        value = data[table_index(name, stm, wk, bk, sq)]
+        if not value:
+            return 0, 0
+        return (1 if stm == 0 else -1), value - 1
+
+    def best_move(self, position):
+        """(ход, результат, полуходов) с лучшим исходом по таблицам или None."""
+        verdict = self.probe(position)
+        if verdict is None:
+            return None
+        result, _ = verdict
+        best = None
+        for move in position.legal_moves():
+            position.make_move(move)
+            child = self.probe(position)
+            position.unmake_move()
+            if child is None:
+                continue
+            child_result, child_plies = -child[0], child[1] + 1
+            if child_result != result:
+                continue
+            # Выигрывая, спешим к мату; проигрывая, оттягиваем его
+            rank = child_plies if result > 0 else -child_plies
+            if best is None or rank < best[0]:
+                best = (rank, move, child_plies)
+        if best is None:
+            return None
+        return best[1], result, best[2] if result else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Эндшпильные таблицы chess_engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="построить KQK, KRK и KPK")
+    build.add_argument("--dir", default=DEFAULT_TABLEBASE_DIR)
+    probe = commands.add_parser("probe", help="оценка позиции по таблицам")
+    probe.add_argument("--fen", required=True)
+    probe.add_argument("--dir", default=DEFAULT_TABLEBASE_DIR)
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        generate_all(args.dir)
+        return 0
+
+    position = ChessPosition.from_fen(args.fen)
+    tablebase = Tablebase(args.dir)
+    found = tablebase.best_move(position)
+    if found is None:
+        print("позиции нет в таблицах")
+        return 1
+    move, result, plies = found
+    verdict = {1: f"выигрыш, мат через {plies} полуходов", 0: "ничья", -1: f"проигрыш, мат через {plies} полуходов"}
+    print(f"{verdict[result]}; лучший ход {move_san(position, move)}")
+    tablebase.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""Матч двух настроек движка без графики на пуле процессов.
+
+Каждый дебют играется дважды со сменой цвета. Результаты партий пишутся
+в JSONL по мере окончания, в конце печатается разница Elo с 95% интервалом.
+
+    python -m chess_engine.tournament --games 200 --workers 4 \\
+        --engine name=new,depth=4 --engine name=old,depth=3 --tc 10+0.1 --out match.jsonl
+
+Параметры движка: name, depth, movetime (секунд на ход вместо часов),
+hash (МБ таблицы транспозиций), book (путь к книге), tablebase (папка таблиц),
+nnue (папка весов сети вместо ручной оценки, см. nnue.py).
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import time
+
+from .book import open_book
+from .nnue import load_network
+from .notation import parse_san, read_pgn, game_start_fen
+from .position import ChessPosition, START_FEN, move_uci
+from .search import Searcher
+from .tablebase import Tablebase
+from .tt import TranspositionTable
+
+# Короткие дебюты по умолчанию - ходы SAN от начальной позиции
+DEFAULT_OPENINGS = [
+    "e4 e5 Nf3 Nc6",
+    "e4 c5 Nf3 d6",
+    "e4 e6 d4 d5",
+    "e4 c6 d4 d5",
+    "d4 d5 c4 e6",
+    "d4 Nf6 c4 g6",
+    "c4 e5 Nc3 Nf6",
+    "Nf3 d5 g3 Nf6",
+]
+
+ENGINE_DEFAULTS = {
+    "name": None, "depth": 64, "movetime": None, "hash": 16, "book": None, "tablebase": None,
+    "nnue": None,
+}
+MAX_PLIES = 300
+
+
+def parse_engine(text):
+    """Строка вида name=new,depth=4,movetime=0.2 -> словарь параметров."""
+    spec = dict(ENGINE_DEFAULTS)
+    for part in text.split(","):
+        if not part:
+            continue
+        name, _, value = part.partition("=")
+        if name not in ENGINE_DEFAULTS:
+            raise ValueError(f"Неизвестный параметр движка: {name}")
+        if name in ("depth", "hash"):
+            value = int(value)
+        elif name == "movetime":
+            value = float(value)
+        spec[name] = value
+    if spec["name"] is None:
+        spec["name"] = text
+    return spec
+
+
+def parse_time_control(text):
+    """'10+0.1' -> (10.0, 0.1): запас на партию и добавка за ход в секундах."""
+    base, _, increment = text.partition("+")
+    return float(base), float(increment or 0)
+
+
+def load_openings(path=None, plies=8):
+    """Список дебютов (fen, ходы UCI) из файла FEN/EPD по строке или PGN."""
+    if path is None:
+        lines = [(START_FEN, line.split()) for line in DEFAULT_OPENINGS]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if path.lower().endswith(".pgn"):
+            lines = [(game_start_fen(headers), sans[:plies]) for headers, sans in read_pgn(content)]
+        else:
+            lines = []
+            for line in content.splitlines():
+                fields = line.split()
+                if len(fields) >= 4:
+                    lines.append((" ".join(fields[:4]) + " 0 1", []))
+
+    openings = []
+    for fen, sans in lines:
+        position = ChessPosition.from_fen(fen)
+        moves = []
+        for san in sans:
+            move = parse_san(position, san)
+            if move is None:
+                break
+            position.make_move(move)
+            moves.append(move)
+        openings.append((fen, moves))
+    return openings
+
+
+def _make_searcher(spec):
+    tablebase = Tablebase(spec["tablebase"]) if spec["tablebase"] else None
+    network = load_network(spec["nnue"]) if spec["nnue"] else None
+    return Searcher(
+        tt=TranspositionTable(spec["hash"]), book=open_book(spec["book"]), tablebase=tablebase, network=network,
+    )
+
+
+def play_game(task):
+    """Сыграть одну партию. task - словарь из make_tasks; возвращает запись для JSONL."""
+    fen, opening = task["opening"]
+    position = ChessPosition.from_fen(fen)
+    for move in opening:
+        position.make_move(move)
+
+    specs = {1: task["white"], -1: task["black"]}
+    searchers = {color: _make_searcher(spec) for color, spec in specs.items()}
+    base, increment = task["tc"]
+    clocks = {1: base, -1: base}
+    nodes = {1: 0, -1: 0}
+    spent = {1: 0.0, -1: 0.0}
+    moves = []
+    result, reason = "1/2-1/2", "предел ходов"
+
+    while len(moves) < task["max_plies"]:
+        color = position.turn
+        if not position.has_legal_move():
+            if position.in_check(color):
+                result, reason = ("0-1" if color == 1 else "1-0"), "мат"
+            else:
+                reason = "пат"
+            break
+        if position.repetitions() >= 2:
+            reason = "повторение"
+            break
+        if position.halfmove_clock >= 100:
+            reason = "50 ходов"
+            break
+        if position.is_insufficient_material():
+            reason = "недостаточно материала"
+            break
+
+        spec = specs[color]
+        if spec["movetime"] is not None:
+            budget = spec["movetime"]
+        else:
+            budget = min(clocks[color] / 30 + increment, clocks[color] * 0.8)
+        searcher = searchers[color]
+        start = time.perf_counter()
+        move, _ = searcher.search(position, spec["depth"], budget)
+        elapsed = time.perf_counter() - start
+        nodes[color] += searcher.nodes
+        spent[color] += elapsed
+        if spec["movetime"] is None:
+            clocks[color] -= elapsed
+            if clocks[color] < 0:
+                result, reason = ("0-1" if color == 1 else "1-0"), "время"
+                break
+            clocks[color] += increment
+        position.make_move(move)
+        moves.append(move_uci(move))
+
+    return {
+        "game": task["game"],
+        "white": specs[1]["name"],
+        "black": specs[-1]["name"],
+        "opening": [move_uci(move) for move in opening],
+        "start_fen": fen,
+        "result": result,
+        "reason": reason,
+        "plies": len(moves),
+        "moves": moves,
+        "nodes": {specs[1]["name"]: nodes[1], specs[-1]["name"]: nodes[-1]},
+        "time": {specs[1]["name"]: round(spent[1], 3), specs[-1]["name"]: round(spent[-1], 3)},
+    }
+
+
+def make_tasks(first, second, openings, games, tc, max_plies=MAX_PLIES):
+    """Задачи партий: дебюты по кругу, каждый дважды со сменой цвета."""
+    tasks = []
+    for game in range(games):
+        opening = openings[(game // 2) % len(openings)]
+        white, black = (first, second) if game % 2 == 0 else (second, first)
+        tasks.append({
+            "game": game, "opening": opening, "white": white, "black": black,
+            "tc": tc, "max_plies": max_plies,
+        })
+    return tasks
+
+
+def elo_difference(wins, draws, losses):
+    """(разница Elo, половина 95% интервала) по очкам первого участника."""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float("inf")
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(p):
+        p = min(max(p, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / p - 1)
+
+    return elo(score), (elo(min(score + margin, 1)) - elo(max(score - margin, 0))) / 2
+
+
+class MatchStats:
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+        self.wins = self.draws = self.losses = 0
+        self.plies = 0
+        self.nodes = {first: 0, second: 0}
+        self.time = {first: 0.0, second: 0.0}
+
+    def add(self, record):
+        self.plies += record["plies"]
+        for name in (self.first, self.second):
+            self.nodes[name] += record["nodes"].get(name, 0)
+            self.time[name] += record["time"].get(name, 0.0)
+        if record["result"] == "1/2-1/2":
+            self.draws += 1
+        elif (record["result"] == "1-0") == (record["white"] == self.first):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def summary(self):
+        games = self.games()
+        elo, error = elo_difference(self.wins, self.draws, self.losses)
+        nps = ", ".join(
+            f"{name} {self.nodes[name] / self.time[name]:.0f}" if self.time[name] else f"{name} -"
+            for name in (self.first, self.second)
+        )
+        return (
+            f"{self.first} - {self.second}: +{self.wins} ={self.draws} -{self.losses} из {games}, "
+            f"Elo {elo:+.1f} ± {error:.1f}\n"
+            f"узлов/с: {nps}; средняя длина {self.plies / games:.1f} полуходов; "
+            f"результативных {(self.wins + self.losses) / games:.0%}"
+        )
+
+
+def run_match(tasks, workers, out_path, first, second, report_every=10, out=sys.stdout):
+    stats = MatchStats(first, second)
+    context = multiprocessing.get_context("spawn")
+    with open(out_path, "a", encoding="utf-8") as f, context.Pool(workers) as pool:
+        for record in pool.imap_unordered(play_game, tasks):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            stats.add(record)
+            if stats.games() % report_every == 0 and stats.games() < len(tasks):
+                print(stats.summary(), file=out, flush=True)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Матч двух настроек chess_engine")
+    parser.add_argument("--engine", action="append", required=True, help="параметры движка, указать дважды")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--tc", default="10+0.1", help="запас+добавка в секундах")
+    parser.add_argument("--openings", help="файл FEN/EPD или PGN")
+    parser.add_argument("--opening-plies", type=int, default=8, help="сколько полуходов брать из партий PGN")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--out", default="match.jsonl")
+    parser.add_argument("--report-every", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if len(args.engine) != 2:
+        parser.error("нужно ровно два --engine")
+    first, second = (parse_engine(text) for text in args.engine)
+    if first["name"] == second["name"]:
+        second["name"] += "'"
+    openings = load_openings(args.openings, args.opening_plies)
+    tasks = make_tasks(first, second, openings, args.games, parse_time_control(args.tc), args.max_plies)
+
+    start = time.perf_counter()
+    stats = run_match(tasks, args.workers, args.out, first["name"], second["name"], args.report_every)
+    print(stats.summary())
+    print(f"{stats.games()} партий за {time.perf_counter() - start:.0f} с, результаты в {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Таблица транспозиций фиксированного размера с заменой по глубине."""
+from array import array
+from multiprocessing import shared_memory
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 20
+
+# Упаковка данных записи: ход 18 бит | тип 2 | глубина 8 | поколение 8 | оценка 21
+_MOVE_MASK = (1 << 18) - 1
+_FLAG_SHIFT = 18
+_DEPTH_SHIFT = 20
+_AGE_SHIFT = 28
+_SCORE_SHIFT = 36
+
+
+def pack_entry(depth, flag, score, move, age):
+    return (
+        (move or 0)
+        | flag << _FLAG_SHIFT
+        | min(depth, 255) << _DEPTH_SHIFT
+        | age << _AGE_SHIFT
+        | (score + SCORE_OFFSET) << _SCORE_SHIFT
+    )
+
+
+def unpack_entry(data):
+    """(глубина, тип, оценка, ход)."""
+    return (
+        (data >> _DEPTH_SHIFT) & 255,
+        (data >> _FLAG_SHIFT) & 3,
+        (data >> _SCORE_SHIFT) - SCORE_OFFSET,
+        (data & _MOVE_MASK) or None,
+    )
+
+
+def entries_for(size_mb):
+    """Наибольшая степень двойки записей, умещающаяся в size_mb мегабайт."""
+    entries = 1
+    while entries * 2 * ENTRY_BYTES <= size_mb * 1024 * 1024:
+        entries *= 2
+    return entries
+
+
+class TranspositionTable:
+    """Два заранее выделенных массива: ключ ^ данные и данные.
+
+    Ключ хранится сложенным с данными по XOR, поэтому разорванная запись
+    (при параллельной записи) просто не пройдёт проверку при чтении.
+    """
+
+    def __init__(self, size_mb=16, entries=None):
+        # entries - точное число записей (степень двойки) вместо size_mb
+        self.size = entries or entries_for(size_mb)
+        self.mask = self.size - 1
+        self.keys, self.data = self._allocate(self.size)
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def _allocate(self, entries):
+        return array("Q", bytes(8 * entries)), array("Q", bytes(8 * entries))
+
+    def new_search(self):
+        self.age = (self.age + 1) & 255
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        for i in range(self.size):
+            self.keys[i] = 0
+            self.data[i] = 0
+
+    def probe(self, key):
+        self.probes += 1
+        index = key & self.mask
+        data = self.data[index]
+        if data and self.keys[index] ^ data == key:
+            self.hits += 1
+            return unpack_entry(data)
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = key & self.mask
+        old = self.data[index]
+        if old and self.keys[index] ^ old != key:
+            # Чужую запись из текущего поиска вытесняем только более глубокой
+            if (old >> _AGE_SHIFT) & 255 == self.age and depth < (old >> _DEPTH_SHIFT) & 255:
+                return
+        elif old and not move:
+            move = old & _MOVE_MASK
+        data = pack_entry(depth, flag, score, move, self.age)
+        self.data[index] = data
+        self.keys[index] = key ^ data
+        self.stores += 1
+
+    def memory_bytes(self):
+        return self.size * ENTRY_BYTES
+
+    def hashfull(self):
+        """Заполненность в промилле по первой тысяче ячеек."""
+        sample = min(1000, self.size)
+        used = sum(1 for i in range(sample) if self.data[i] and (self.data[i] >> _AGE_SHIFT) & 255 == self.age)
+        return used * 1000 // sample
+
+    def stats(self):
+        return {
+            "entries": self.size,
+            "memory_bytes": self.memory_bytes(),
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "hashfull": self.hashfull(),
+        }
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Та же таблица в multiprocessing.shared_memory - одна на несколько процессов.
+
+    Блокировок нет: каждая ячейка - два 64-битных слова, и запись, разорванная
+    одновременной записью из другого процесса, отбрасывается проверкой ключа.
+    Создатель таблицы вызывает unlink(), остальные процессы - только close().
+    """
+
+    def __init__(self, size_mb=16, name=None, entries=None):
+        self.name = name
+        super().__init__(size_mb, entries)
+
+    def _allocate(self, entries):
+        if self.name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=entries * ENTRY_BYTES)
+            self.shm.buf[:] = bytes(entries * ENTRY_BYTES)
+            self.name = self.shm.name
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            self.owner = False
+        half = entries * 8
+        return self.shm.buf[:half].cast("Q"), self.shm.buf[half:entries * ENTRY_BYTES].cast("Q")
+
+    def spec(self):
+        """Аргументы для подключения к таблице из другого процесса: размер передаётся точным числом записей."""
+        return self.memory_bytes() / (1024 * 1024), self.name, self.size
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.keys.release()
+        self.data.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
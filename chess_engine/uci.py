@@ -0,0 +1,235 @@
+"""Движок по протоколу UCI через stdin/stdout.
+
+    python -m chess_engine.uci
+
+Поддерживаются uci, isready, ucinewgame, setoption (Hash, BookFile, TablebaseDir, StatsLog),
+position startpos|fen ... moves ..., go depth/movetime/nodes/wtime/btime/winc/binc/infinite/ponder,
+stop, ponderhit и quit. Поиск идёт в отдельном потоке, чтобы stop и isready обрабатывались сразу.
+
+go ponder считает без ограничения времени; время из wtime/btime/winc/binc (или movetime)
+запоминается и на ponderhit отсчитывается заново - поиск продолжается и останавливается
+по таймеру, как обычный go.
+"""
+import sys
+import threading
+
+from .book import open_book
+from .notation import parse_uci
+from .position import ChessPosition, START_FEN, WHITE, move_uci
+from .search import MATE, MATE_BOUND, Searcher
+from .stats import StatsLog
+from .tablebase import Tablebase
+from .tt import TranspositionTable
+
+ENGINE_NAME = "Arcade Game Hub chess_engine"
+MOVES_TO_GO = 30
+
+
+def score_text(score):
+    """Оценка в виде 'cp 35' или 'mate 3' (мат в ходах, минус - мат нам)."""
+    if score >= MATE_BOUND:
+        return f"mate {(MATE - score + 1) // 2}"
+    if score <= -MATE_BOUND:
+        return f"mate -{(MATE + score) // 2}"
+    return f"cp {score}"
+
+
+class UciEngine:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.output_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        # Ставится на stop и ponderhit: после него bestmove можно отправлять
+        self.release_event = threading.Event()
+        self.pondering = False
+        self.ponder_limit = None
+        self.ponder_timer = None
+        self.hash_mb = 16
+        self.searcher = Searcher(self.stop_event, TranspositionTable(self.hash_mb))
+        self.position = ChessPosition.initial()
+        self.stats_log = None
+        self.thread = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def handle(self, line):
+        """Обработать одну команду. Возвращает False на quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author Arcade Game Hub")
+            self.send("option name Hash type spin default 16 min 1 max 1024")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebaseDir type string default <empty>")
+            self.send("option name StatsLog type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.searcher.tt.clear()
+        elif command == "setoption":
+            self.wait()
+            self.set_option(args)
+        elif command == "position":
+            self.wait()
+            self.set_position(args)
+        elif command == "go":
+            self.wait()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, args):
+        if "name" not in args:
+            return
+        name_end = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:name_end]).lower()
+        value = " ".join(args[name_end + 1:])
+        if value == "<empty>":
+            value = ""
+        if name == "hash":
+            self.hash_mb = max(1, int(value))
+            self.searcher.tt = TranspositionTable(self.hash_mb)
+        elif name == "bookfile":
+            self.searcher.book = open_book(value) if value else None
+        elif name == "tablebasedir":
+            self.searcher.tablebase = Tablebase(value) if value else None
+        elif name == "statslog":
+            if self.stats_log is not None:
+                self.stats_log.close()
+            self.stats_log = StatsLog(value) if value else None
+
+    def set_position(self, args):
+        if not args:
+            return
+        if args[0] == "startpos":
+            fen = START_FEN
+            rest = args[1:]
+        elif args[0] == "fen":
+            end = args.index("moves") if "moves" in args else len(args)
+            fen = " ".join(args[1:end])
+            rest = args[end:]
+        else:
+            return
+        position = ChessPosition.from_fen(fen)
+        if rest and rest[0] == "moves":
+            for text in rest[1:]:
+                move = parse_uci(position, text)
+                if move is None:
+                    break
+                position.make_move(move)
+        self.position = position
+
+    def go(self, args):
+        limits = {}
+        i = 0
+        while i < len(args):
+            name = args[i]
+            if name in ("depth", "movetime", "nodes", "wtime", "btime", "winc", "binc", "movestogo"):
+                limits[name] = int(args[i + 1])
+                i += 2
+            else:
+                i += 1
+
+        ponder = "ponder" in args
+        infinite = "infinite" in args or ponder
+        depth = limits.get("depth", 64)
+        time_limit = None
+        if "movetime" in limits:
+            time_limit = limits["movetime"] / 1000
+        else:
+            side = "w" if self.position.turn == WHITE else "b"
+            if f"{side}time" in limits:
+                remaining = limits[f"{side}time"] / 1000
+                increment = limits.get(f"{side}inc", 0) / 1000
+                moves_to_go = limits.get("movestogo", MOVES_TO_GO)
+                time_limit = min(remaining / moves_to_go + increment, remaining * 0.8)
+
+        # При обдумывании часы пойдут только на ponderhit
+        self.pondering = ponder
+        self.ponder_limit = time_limit if ponder else None
+        if ponder:
+            time_limit = None
+
+        self.stop_event.clear()
+        self.release_event.clear()
+        self.thread = threading.Thread(
+            target=self._search, args=(self.position.copy(), depth, time_limit, limits.get("nodes"), infinite),
+            daemon=True,
+        )
+        self.thread.start()
+
+    def _search(self, position, depth, time_limit, max_nodes, infinite):
+        root_fen = position.fen()
+
+        def report(info):
+            self.send(
+                f"info depth {info['depth']} seldepth {info['seldepth']} score {score_text(info['score'])} "
+                f"nodes {info['nodes']} nps {info['nps']} time {int(info['time'] * 1000)} "
+                f"hashfull {info['hashfull']} pv {move_uci(info['move'])}"
+            )
+            if self.stats_log is not None:
+                self.stats_log.write(info["stats"], fen=root_fen)
+
+        move, _ = self.searcher.search(position, depth, time_limit, report, max_nodes=max_nodes)
+        if infinite:
+            # В режиме infinite bestmove отправляется только после stop, в режиме ponder - и после ponderhit
+            self.release_event.wait()
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        ponder = self.searcher.ponder_move(position, move)
+        self.send(f"bestmove {move_uci(move)}" + (f" ponder {move_uci(ponder)}" if ponder else ""))
+
+    def wait(self):
+        """Дождаться конца текущего поиска (новые команды не прерывают его, только stop)."""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.ponder_timer is not None:
+            self.ponder_timer.cancel()
+            self.ponder_timer = None
+
+    def stop(self):
+        self.stop_event.set()
+        self.release_event.set()
+        self.wait()
+
+    def ponderhit(self):
+        """Соперник сыграл ожидаемый ход: обдумывание становится обычным поиском с запомненным временем."""
+        if self.thread is None or not self.pondering:
+            return
+        self.pondering = False
+        if self.ponder_limit is not None:
+            self.ponder_timer = threading.Timer(self.ponder_limit, self.stop_event.set)
+            self.ponder_timer.daemon = True
+            self.ponder_timer.start()
+        self.release_event.set()
+
+
+def main(stdin=sys.stdin, stdout=sys.stdout):
+    engine = UciEngine(stdout)
+    for line in stdin:
+        if not engine.handle(line.strip()):
+            break
+    engine.stop()
+    if engine.stats_log is not None:
+        engine.stats_log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Поиск хода в отдельном процессе, чтобы не тормозить отрисовку.
+
+При threads > 1 рядом с основным процессом запускаются помощники (Lazy SMP):
+все ищут ту же позицию, а общий результат складывается в одну таблицу
+транспозиций в разделяемой памяти. Ход и сведения о поиске сообщает
+только основной процесс.
+
+Если задан stats_path, основной процесс дописывает туда снимок счётчиков
+перебора после каждой глубины (JSON Lines, см. stats.py).
+
+nnue_path - папка весов нейросети (nnue.py); без неё, без файлов или без NumPy
+движок оценивает позиции вручную.
+
+Обдумывание на времени соперника: go() без ограничения времени для позиции
+после ожидаемого ответа, затем ponderhit() при совпадении (поиск получает срок
+и доигрывает) или новый go() при промахе (старая задача прерывается сама).
+"""
+import multiprocessing
+import queue
+import time
+
+from . import BACKENDS
+from .book import open_book
+from .nnue import load_network
+from .search import Searcher
+from .stats import StatsLog
+from .tablebase import Tablebase
+from .tt import SharedTranspositionTable
+
+
+def _job_position(backend, fen, moves):
+    position = BACKENDS[backend].from_fen(fen)
+    for move in moves:
+        position.make_move(move)
+    return position
+
+
+def _open_network(nnue_path):
+    if not nnue_path:
+        return None
+    try:
+        return load_network(nnue_path)
+    except (ImportError, ValueError):
+        return None
+
+
+def _worker_main(
+    jobs, results, stop_event, book_path, tablebase_dir, active_job, deadline, tt_spec=None, stats_path=None,
+    nnue_path=None,
+):
+    tablebase = Tablebase(tablebase_dir) if tablebase_dir else None
+    tt = SharedTranspositionTable(*tt_spec) if tt_spec else None
+    searcher = Searcher(tt=tt, book=open_book(book_path), tablebase=tablebase, network=_open_network(nnue_path))
+    stats_log = StatsLog(stats_path) if stats_path else None
+    while True:
+        job = jobs.get()
+        if job[0] == "quit":
+            break
+        _, job_id, backend, fen, moves, depth, time_limit = job
+        searcher.stop_event = _JobStop(stop_event, active_job, job_id, deadline)
+        position = _job_position(backend, fen, moves)
+        root_fen = position.fen() if stats_log is not None else None
+
+        def report(info):
+            results.put(("info", job_id, info))
+            if stats_log is not None:
+                stats_log.write(info["stats"], job=job_id, fen=root_fen)
+
+        move, score = searcher.search(position, depth, time_limit, report)
+        ponder = searcher.ponder_move(position, move) if move is not None else None
+        # Ход найден - помощники этой задачи больше не нужны
+        with active_job.get_lock():
+            if active_job.value == job_id:
+                active_job.value = 0
+        results.put(("bestmove", job_id, move, score, ponder))
+    if tt is not None:
+        tt.close()
+    if stats_log is not None:
+        stats_log.close()
+
+
+class _JobStop:
+    """Условие остановки для Searcher: stop(), новая задача или срок после ponderhit()."""
+
+    def __init__(self, stop_event, active_job, job_id, deadline):
+        self.stop_event = stop_event
+        self.active_job = active_job
+        self.job_id = job_id
+        self.deadline = deadline
+
+    def is_set(self):
+        if self.stop_event.is_set() or self.active_job.value != self.job_id:
+            return True
+        deadline = self.deadline.value
+        return bool(deadline) and time.time() >= deadline
+
+
+def _helper_main(jobs, stop_event, active_job, deadline, tt_spec, tablebase_dir, index, nnue_path=None):
+    tt = SharedTranspositionTable(*tt_spec)
+    tablebase = Tablebase(tablebase_dir) if tablebase_dir else None
+    searcher = Searcher(tt=tt, tablebase=tablebase, network=_open_network(nnue_path))
+    # Нечётные помощники идут на полуход глубже, чтобы не повторять основной поиск
+    offset = index % 2
+    while True:
+        job = jobs.get()
+        if job[0] == "quit":
+            break
+        _, job_id, backend, fen, moves, depth, time_limit = job
+        searcher.stop_event = _JobStop(stop_event, active_job, job_id, deadline)
+        if searcher.stop_event.is_set():
+            continue
+        position = _job_position(backend, fen, moves)
+        searcher.search(position, depth + offset, time_limit, start_depth=1 + offset)
+    tt.close()
+
+
+class EngineWorker:
+    """Процесс с движком: go() ставит задачу, poll() забирает ответы без ожидания."""
+
+    def __init__(self, book_path=None, tablebase_dir=None, threads=1, tt_mb=16, stats_path=None, nnue_path=None):
+        self.book_path = book_path
+        self.tablebase_dir = tablebase_dir
+        self.stats_path = stats_path
+        self.nnue_path = nnue_path
+        self.threads = max(1, threads)
+        self.tt_mb = tt_mb
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.jobs = None
+        self.results = None
+        self.stop_event = None
+        self.tt = None
+        self.active_job = None
+        self.deadline = None
+        self.helpers = []
+        self.job_id = 0
+
+    def start(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self.jobs = self.context.Queue()
+        self.results = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.active_job = self.context.Value("q", 0)
+        self.deadline = self.context.Value("d", 0.0)
+        tt_spec = None
+        if self.threads > 1:
+            self.tt = SharedTranspositionTable(self.tt_mb)
+            tt_spec = self.tt.spec()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(
+                self.jobs, self.results, self.stop_event, self.book_path, self.tablebase_dir,
+                self.active_job, self.deadline, tt_spec, self.stats_path, self.nnue_path,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+        self.helpers = []
+        for index in range(1, self.threads):
+            jobs = self.context.Queue()
+            process = self.context.Process(
+                target=_helper_main,
+                args=(
+                    jobs, self.stop_event, self.active_job, self.deadline, tt_spec, self.tablebase_dir, index,
+                    self.nnue_path,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.helpers.append((process, jobs))
+
+    def go(self, fen, moves, depth, time_limit, backend="array"):
+        """Начать поиск для позиции fen после ходов moves. Возвращает номер задачи."""
+        self.start()
+        self.stop_event.clear()
+        self.job_id += 1
+        job = ("go", self.job_id, backend, fen, list(moves), depth, time_limit)
+        self.deadline.value = 0.0
+        self.active_job.value = self.job_id
+        self.jobs.put(job)
+        for _, jobs in self.helpers:
+            jobs.put(job)
+        return self.job_id
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    def ponderhit(self, time_limit):
+        """Соперник сыграл ожидаемый ход: текущая задача должна ответить за time_limit секунд."""
+        if self.deadline is not None:
+            self.deadline.value = time.time() + time_limit
+
+    def poll(self):
+        messages = []
+        if self.results is None:
+            return messages
+        while True:
+            try:
+                messages.append(self.results.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def wait(self, job_id, timeout=None):
+        """Дождаться хода по задаче job_id: (ход, оценка, ожидаемый ответ, последние сведения о поиске)."""
+        info = None
+        while True:
+            message = self.results.get(timeout=timeout)
+            if message[1] != job_id:
+                continue
+            if message[0] == "info":
+                info = message[2]
+            elif message[0] == "bestmove":
+                return message[2], message[3], message[4], info
+
+    def close(self):
+        if self.process is None:
+            return
+        self.stop()
+        self.jobs.put(("quit",))
+        for _, jobs in self.helpers:
+            jobs.put(("quit",))
+        for process in [self.process] + [process for process, _ in self.helpers]:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.process = None
+        self.helpers = []
+        if self.tt is not None:
+            self.tt.close()
+            self.tt = None
+        self.active_job = None
+        self.deadline = None
@@ -0,0 +1,13 @@
+"""64-битные ключи Зобриста для позиций."""
+import random
+
+_rng = random.Random(0x5EED)
+
+# PIECE_KEYS[piece + 6][sq], piece от -6 до 6
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(13)]
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(16)]
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+SIDE_KEY = _rng.getrandbits(64)
+
+for _sq in range(64):
+    PIECE_KEYS[6][_sq] = 0
@@ -5,6 +5,8 @@ import os
 class GameDataManager:
     def __init__(self):
         self.file_path = "game_stats.json"
+        # Прочие данные игрока (кэш анализа, база задач) лежат рядом с файлом статистики
+        self.data_dir = os.path.dirname(os.path.abspath(self.file_path))
         self.data = self._load()
 
     def _load(self):
@@ -20,8 +22,23 @@ class GameDataManager:
             "total_games": 0,
             "fighter_games": {"first_won": 0, "second_won": 0},
             "chess_games": {"white_won": 0, "black_won": 0},
+            "chess_puzzles": {"rating": 1500, "solved": 0, "failed": 0},
             "achievements": [],
-            "settings": {"volume": 1.0, "difficulty": "Medium"},
+            "settings": {
+                "volume": 1.0,
+                "difficulty": "Medium",
+                "chess_backend": "array",
+                "chess_threads": 1,
+                "chess_ponder": True,
+                "chess_stats_log": "",
+                "chess_start_fen": "",
+                "chess_nnue": "",
+                "chess_annotate_time": 0.5,
+                "chess_analysis_cache": "analysis_cache.bin",
+                "chess_puzzle_db": "puzzles.db",
+                "chess_puzzle_theme": "",
+                "chess_save_puzzles": False,
+            },
         }
         if os.path.exists(self.file_path):
             try:
@@ -43,6 +60,10 @@ class GameDataManager:
             self.save()
         return default
 
+    def data_path(self, name):
+        """Путь к файлу данных игрока; относительный считается от папки с файлом статистики."""
+        return os.path.join(self.data_dir, os.path.expanduser(name))
+
     def save(self):
         with open(self.file_path, "w", encoding="utf-8") as f:
             json.dump(self.data, f, ensure_ascii=False, indent=2)
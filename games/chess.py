@@ -1,157 +1,487 @@
+import os
+import time
+
 import arcade
+from arcade.shape_list import ShapeElementList, create_line, create_rectangle_filled, create_rectangle_outline
+
+from chess_engine import (
+    BACKENDS, WHITE, BLACK, QUEEN, PIECE_CHARS, KIND_BY_CHAR, START_FEN,
+    square, row_of, col_of, move_from, move_to, move_promotion, move_uci,
+)
+from chess_engine.annotate import GameAnnotator
+from chess_engine.notation import move_san, parse_uci
+from chess_engine.puzzles import DEFAULT_PUZZLE_PATH, PuzzleDatabase
+from chess_engine.search import DIFFICULTY_LIMITS, MATE_BOUND
+from chess_engine.stats import format_stats
+from chess_engine.book import DEFAULT_BOOK_PATH
+from chess_engine.tablebase import DEFAULT_TABLEBASE_DIR, Tablebase
+from chess_engine.worker import EngineWorker
 
 TILE = 80
 PIECE_SIZE = 60
 BOARD = 8
 SCREEN = TILE * BOARD
 
-WHITE = 1
-BLACK = -1
+PIECE_TEXTURES = {}
+
+
+def piece_texture(player, kind):
+    """Текстура фигуры; каждая из 12 картинок читается с диска один раз."""
+    name = f"{'w' if player == WHITE else 'b'}{kind}"
+    texture = PIECE_TEXTURES.get(name)
+    if texture is None:
+        texture = PIECE_TEXTURES[name] = arcade.load_texture(f"assets/pieces/{name}.png")
+    return texture
 
 
 class ChessPiece(arcade.Sprite):
     def __init__(self, kind, player, row, col):
-        img = f"assets/pieces/{'w' if player == WHITE else 'b'}{kind}.png"
-        super().__init__(img, scale=PIECE_SIZE / TILE)
+        super().__init__(piece_texture(player, kind), scale=PIECE_SIZE / TILE)
         self.kind = kind
         self.player = player
         self.row = row
         self.col = col
         self.update_pos()
-        self.first_move = True
 
     def update_pos(self):
         self.center_x = self.col * TILE + TILE // 2
         self.center_y = (BOARD - 1 - self.row) * TILE + TILE // 2
 
+    def code(self):
+        return self.player * KIND_BY_CHAR[self.kind]
+
+    def set_kind(self, kind):
+        self.kind = kind
+        self.texture = piece_texture(self.player, kind)
+        self.scale = PIECE_SIZE / TILE
+
 
 class ChessGameView(arcade.View):
-    def __init__(self, return_view_cls=None):
+    def __init__(self, return_view_cls=None, start_fen=None):
         super().__init__()
         self.return_view_cls = return_view_cls
 
-        self.turn = WHITE
+        self.backend = "array"
+        self.position = None
         self.selected = None
         self.pieces = arcade.SpriteList()
+        self.piece_sprites = {}
         self.move_sound = arcade.load_sound("assets/audio_on_move.wav")
         self.game_over = False
         self.winner = None
+        self.result_title = ""
+        self.result_reason = ""
         self.moves = []
-        self.check_king = None
-        self.checkers = []
+        # Легальные ходы стороны, чья очередь, по клетке фигуры - считаются один раз за ход
+        self.turn_moves = None
+        self.check_square = None
+        self.checker_squares = []
 
-        self.en_passant = None
         self.promoting = None
+        self.promo_move = None
         self.promo_options = ["Q", "R", "B", "N"]
         self.promo_rects = []
-        self.promo_sprites = arcade.SpriteList()
-
-        self.setup_board()
+        self.promo_sprites = {}
+        self.build_promo_menu()
+
+        self.build_board_layer()
+        self.overlay = None
+        self.overlay_key = None
+        self.overlay_empty = True
+        self.panel_texts = [
+            arcade.Text("", SCREEN + 20, SCREEN - 120, arcade.color.LIGHT_GRAY, 12),
+            arcade.Text("", SCREEN + 20, SCREEN - 150, arcade.color.WHITE, 12),
+            arcade.Text("", SCREEN + 20, SCREEN - 170, arcade.color.LIGHT_GRAY, 10),
+            arcade.Text("", SCREEN + 20, SCREEN - 200, arcade.color.LIGHT_GRAY, 12),
+            arcade.Text("", SCREEN + 20, SCREEN - 230, arcade.color.LIGHT_GRAY, 10),
+        ]
+
+        self.tablebase = Tablebase(DEFAULT_TABLEBASE_DIR)
+        self.endgame_text = ""
+        self.ai_color = None
+        self.engine = EngineWorker(
+            book_path=DEFAULT_BOOK_PATH,
+            tablebase_dir=DEFAULT_TABLEBASE_DIR,
+            threads=self.setting("chess_threads", 1),
+            stats_path=self.data_path("chess_stats_log", ""),
+            nnue_path=self.setting("chess_nnue", None),
+        )
+        self.engine_job = None
+        self.engine_info = None
+
+        # Отладочный слой со счётчиками последнего поиска (клавиша D)
+        self.show_stats = False
+        self.search_stats = None
+        self.stats_texts = [
+            arcade.Text("", 10, SCREEN - 20 - 18 * i, arcade.color.WHITE, 11) for i in range(4)
+        ]
+
+        # Обдумывание на времени человека и задержка ответа компьютера
+        self.ponder_job = None
+        self.ponder_move = None
+        self.ponder_reply = None
+        self.reply_started = None
+        self.reply_hit = False
+        self.reply_latencies = []
+
+        # Разбор партии после её окончания (стрелки - по ходам)
+        self.annotator = None
+        self.annotation = None
+        self.annotation_progress = (0, 0)
+        self.review_ply = None
+        self.review_texts = [
+            arcade.Text("", SCREEN + 20, SCREEN - 280 - 25 * i, arcade.color.LIGHT_GRAY, 11) for i in range(4)
+        ]
+
+        # Режим задач (клавиша P): позиция из базы, ходы решения сверяются по UCI
+        self.puzzle_db = None
+        self.puzzle = None
+        self.puzzle_step = 0
+        self.puzzle_state = ""
+        self.puzzle_message = ""
+        self.puzzle_reply_at = None
+        self.puzzle_record = {"rating": 1500, "solved": 0, "failed": 0}
+
+        self.load_position(start_fen or self.setting("chess_start_fen", "") or START_FEN)
+
+    def setup_board(self, fen=START_FEN):
+        """Новая партия из позиции FEN или EPD; для некорректной позиции - ValueError."""
+        self.backend = self.setting("chess_backend", "array")
+        if self.backend not in BACKENDS:
+            self.backend = "array"
+        position = BACKENDS[self.backend].from_string(fen)
+        position.validate()
+        # Движку позиция передаётся как FEN партии плюс ходы от неё
+        self.start_fen = position.fen()
+        self.position = position
+
+        self.engine.stop()
+        self.engine_job = None
+        self.engine_info = None
+        self.ponder_job = None
+        self.ponder_move = None
+        self.ponder_reply = None
+        self.reply_started = None
+        self.game_over = False
+        self.winner = None
+        self.selected = None
+        self.moves = []
+        self.promoting = None
+        self.promo_move = None
+        self.endgame_text = ""
+        self.turn_moves = None
+        if self.annotator is not None:
+            self.annotator.cancel()
+        self.annotation = None
+        self.annotation_progress = (0, 0)
+        self.review_ply = None
+        self.puzzle = None
+        self.puzzle_reply_at = None
+        self.finish_move()
+
+    def load_position(self, text):
+        """Начать партию с позиции text; если она некорректна - с начальной, причина на панели."""
+        try:
+            self.setup_board(text.strip())
+        except ValueError as error:
+            self.setup_board()
+            self.endgame_text = f"Позиция не загружена: {error}"
+
+    def paste_position(self):
+        try:
+            text = self.window.get_clipboard_text()
+        except NotImplementedError:
+            return
+        if text.strip():
+            self.load_position(text)
+
+    def sync_pieces(self, board=None):
+        """Привести спрайты в соответствие с доской board (по умолчанию self.position)."""
+        if board is None:
+            board = self.position.board
+        placed = {}
+        stale = []
+        for sprite in self.pieces:
+            sq = square(sprite.row, sprite.col)
+            if sq not in placed and board[sq] == sprite.code():
+                placed[sq] = sprite
+            else:
+                stale.append(sprite)
+
+        for sq, piece in enumerate(board):
+            if not piece or sq in placed:
+                continue
+            kind = PIECE_CHARS[abs(piece)]
+            player = WHITE if piece > 0 else BLACK
+            sprite = next((s for s in stale if s.kind == kind and s.player == player), None)
+            if sprite:
+                stale.remove(sprite)
+                sprite.row, sprite.col = row_of(sq), col_of(sq)
+                sprite.update_pos()
+            else:
+                sprite = ChessPiece(kind, player, row_of(sq), col_of(sq))
+                self.pieces.append(sprite)
+            placed[sq] = sprite
 
-    def setup_board(self):
-        self.pieces = arcade.SpriteList()
-        for i in range(BOARD):
-            self.pieces.append(ChessPiece("P", BLACK, 1, i))
-            self.pieces.append(ChessPiece("P", WHITE, 6, i))
-        order = ["R", "N", "B", "Q", "K", "B", "N", "R"]
-        for i, kind in enumerate(order):
-            self.pieces.append(ChessPiece(kind, BLACK, 0, i))
-            self.pieces.append(ChessPiece(kind, WHITE, 7, i))
+        for sprite in stale:
+            self.pieces.remove(sprite)
+        self.piece_sprites = placed
 
     def on_show_view(self):
         arcade.set_background_color(arcade.color.BLACK)
 
-    def on_draw(self):
-        self.clear()
-
+    def on_hide_view(self):
+        self.engine.close()
+        self.engine_job = None
+        self.ponder_job = None
+        self.tablebase.close()
+        if self.annotator is not None:
+            self.annotator.close()
+        if self.puzzle_db is not None:
+            self.puzzle_db.close()
+            self.puzzle_db = None
+
+    def on_update(self, delta_time):
+        if self.annotator is not None and self.annotation is None:
+            self.annotation_progress = self.annotator.poll()
+            self.annotation = self.annotator.result
+            if self.annotation is not None and self.setting("chess_save_puzzles", False):
+                self.save_for_puzzles()
+        if self.puzzle_reply_at is not None and time.perf_counter() >= self.puzzle_reply_at:
+            self.play_puzzle_reply()
+        if self.engine_job is None and self.ponder_job is None:
+            return
+        for message in self.engine.poll():
+            if message[1] == self.ponder_job:
+                if message[0] == "bestmove":
+                    self.ponder_reply = (message[2], message[4])
+                continue
+            if message[1] != self.engine_job:
+                continue
+            if message[0] == "info":
+                self.engine_info = message[2]
+                self.search_stats = message[2]["stats"]
+            elif message[0] == "bestmove":
+                self.engine_job = None
+                self.engine_info = None
+                if message[2] is not None and not self.game_over:
+                    self.play_engine_move(message[2], message[4])
+
+    def play_engine_move(self, move, ponder):
+        arcade.play_sound(self.move_sound)
+        self.position.make_move(move)
+        if self.reply_started is not None:
+            self.reply_latencies.append((time.perf_counter() - self.reply_started, self.reply_hit))
+            self.reply_started = None
+        self.finish_move()
+        self.start_ponder(ponder)
+
+    def start_ponder(self, ponder):
+        """Думать над позицией после ожидаемого ответа человека, пока он выбирает ход."""
+        self.ponder_job = None
+        self.ponder_move = None
+        self.ponder_reply = None
+        if not self.setting("chess_ponder", True) or self.game_over or self.ai_color is None:
+            return
+        if ponder is None or self.position.turn == self.ai_color or ponder not in self.moves_from(move_from(ponder)):
+            return
+        depth, _ = self.difficulty_limits()
+        moves = [entry[0] for entry in self.position.history] + [ponder]
+        self.ponder_move = ponder
+        self.ponder_job = self.engine.go(self.start_fen, moves, depth, None, self.backend)
+
+    def setting(self, name, default):
+        if self.window is not None and hasattr(self.window, "data_manager"):
+            return self.window.data_manager.data["settings"].get(name, default)
+        return default
+
+    def data_path(self, name, default):
+        """Файл из настройки name в папке данных игрока; пустая настройка - None (без файла)."""
+        path = self.setting(name, default)
+        if path and self.window is not None and hasattr(self.window, "data_manager"):
+            return self.window.data_manager.data_path(path)
+        return path or None
+
+    def difficulty_limits(self):
+        difficulty = self.setting("difficulty", "Medium")
+        return DIFFICULTY_LIMITS.get(difficulty, DIFFICULTY_LIMITS["Medium"])
+
+    def request_engine_move(self):
+        if self.game_over or self.position.turn != self.ai_color or self.engine_job is not None:
+            return
+        depth, time_limit = self.difficulty_limits()
+        self.reply_started = time.perf_counter()
+        self.reply_hit = False
+
+        ponder_job, reply = self.ponder_job, self.ponder_reply
+        self.ponder_job = None
+        self.ponder_reply = None
+        if ponder_job is not None and self.position.history and self.position.history[-1][0] == self.ponder_move:
+            self.reply_hit = True
+            if reply is None:
+                # Поиск уже идёт по нужной позиции - даём ему срок вместо перезапуска
+                self.engine_job = ponder_job
+                self.engine.ponderhit(time_limit)
+                return
+            if reply[0] is not None:
+                self.play_engine_move(*reply)
+                return
+
+        # При промахе новая задача сама прерывает обдумывание
+        moves = [entry[0] for entry in self.position.history]
+        self.engine_job = self.engine.go(self.start_fen, moves, depth, time_limit, self.backend)
+
+    def latency_text(self):
+        if not self.reply_latencies:
+            return ""
+        latency, hit = self.reply_latencies[-1]
+        hits = sum(1 for _, was_hit in self.reply_latencies if was_hit)
+        average = sum(value for value, _ in self.reply_latencies) / len(self.reply_latencies)
+        return (
+            f"Ответ за {latency * 1000:.0f} мс{' (угадан)' if hit else ''}, "
+            f"в среднем {average * 1000:.0f} мс, угадано {hits}/{len(self.reply_latencies)}"
+        )
+
+    def toggle_computer(self):
+        if self.ai_color is None:
+            self.ai_color = BLACK
+            self.request_engine_move()
+        else:
+            self.ai_color = None
+            self.engine.stop()
+            self.engine_job = None
+            self.engine_info = None
+            self.ponder_job = None
+            self.reply_started = None
+
+    def build_board_layer(self):
+        """Клетки доски рисуются одним пакетом, который строится один раз."""
+        self.board_layer = ShapeElementList()
         for r in range(BOARD):
             for c in range(BOARD):
                 color = arcade.color.BEIGE if (r + c) % 2 == 0 else arcade.color.BROWN
-                arcade.draw_lbwh_rectangle_filled(c * TILE, (BOARD - 1 - r) * TILE, TILE, TILE, color)
-
+                cx, cy = self.tile_center(r, c)
+                self.board_layer.append(create_rectangle_filled(cx, cy, TILE, TILE, color))
+
+    @staticmethod
+    def tile_center(r, c):
+        return c * TILE + TILE / 2, (BOARD - 1 - r) * TILE + TILE / 2
+
+    def overlay_state(self):
+        selected = (self.selected.row, self.selected.col, self.selected.kind) if self.selected else None
+        return (
+            selected,
+            tuple(self.moves),
+            self.position.en_passant,
+            self.check_square,
+            tuple(self.checker_squares),
+        )
+
+    def rebuild_overlay(self):
+        """Подсветка ходов, шаха и взятия на проходе; пересобирается только при изменениях."""
+        overlay = ShapeElementList()
+        en_passant = self.position.en_passant
+        pawn_selected = self.selected is not None and self.selected.kind == "P"
         for r, c in self.moves:
-            target = self.piece_at(r, c)
-            x = c * TILE
-            y = (BOARD - 1 - r) * TILE
-
-            if self.selected and self.selected.kind == "P":
-                dr = r - self.selected.row
-                dc = c - self.selected.col
-                dir = -1 if self.selected.player == WHITE else 1
-
-                if dc == 0 and (dr == dir or (dr == 2 * dir and self.selected.first_move)) and not target:
-                    arcade.draw_lbwh_rectangle_filled(x, y, TILE, TILE, (100, 255, 100, 100))
-                elif abs(dc) == 1 and dr == dir:
-                    if target or (self.en_passant and (r, c) == self.en_passant):
-                        arcade.draw_lbwh_rectangle_outline(x, y, TILE, TILE, (255, 50, 50, 200), 2)
+            cx, cy = self.tile_center(r, c)
+            sq = square(r, c)
+
+            if self.position.board[sq] or (pawn_selected and sq == en_passant):
+                overlay.append(create_rectangle_outline(cx, cy, TILE, TILE, (255, 50, 50, 200), 2))
             else:
-                if not target:
-                    arcade.draw_lbwh_rectangle_filled(x, y, TILE, TILE, (100, 255, 100, 100))
-                else:
-                    arcade.draw_lbwh_rectangle_outline(x, y, TILE, TILE, (255, 50, 50, 200), 2)
+                overlay.append(create_rectangle_filled(cx, cy, TILE, TILE, (100, 255, 100, 100)))
 
-        if self.en_passant and (self.en_passant in self.moves):
-            r, c = self.en_passant
-            x = c * TILE
-            y = (BOARD - 1 - r) * TILE
+        if pawn_selected and en_passant is not None and (row_of(en_passant), col_of(en_passant)) in self.moves:
+            x = col_of(en_passant) * TILE
+            y = (BOARD - 1 - row_of(en_passant)) * TILE
 
             dash = 6
             gap = 4
             pos = 0
 
             while pos < TILE:
-                arcade.draw_line(x + pos, y, x + min(pos + dash, TILE), y, (255, 165, 0, 220), 3)
-                arcade.draw_line(x + pos, y + TILE, x + min(pos + dash, TILE), y + TILE, (255, 165, 0, 220), 3)
-                arcade.draw_line(x, y + pos, x, y + min(pos + dash, TILE), (255, 165, 0, 220), 3)
-                arcade.draw_line(x + TILE, y + pos, x + TILE, y + min(pos + dash, TILE), (255, 165, 0, 220), 3)
+                end = min(pos + dash, TILE)
+                overlay.append(create_line(x + pos, y, x + end, y, (255, 165, 0, 220), 3))
+                overlay.append(create_line(x + pos, y + TILE, x + end, y + TILE, (255, 165, 0, 220), 3))
+                overlay.append(create_line(x, y + pos, x, y + end, (255, 165, 0, 220), 3))
+                overlay.append(create_line(x + TILE, y + pos, x + TILE, y + end, (255, 165, 0, 220), 3))
                 pos += dash + gap
 
         if self.selected:
-            arcade.draw_lbwh_rectangle_outline(
-                self.selected.col * TILE,
-                (BOARD - 1 - self.selected.row) * TILE,
-                TILE,
-                TILE,
-                arcade.color.YELLOW,
-                3,
-            )
+            cx, cy = self.tile_center(self.selected.row, self.selected.col)
+            overlay.append(create_rectangle_outline(cx, cy, TILE, TILE, arcade.color.YELLOW, 3))
+
+        if self.check_square is not None:
+            cx, cy = self.tile_center(row_of(self.check_square), col_of(self.check_square))
+            overlay.append(create_rectangle_outline(cx, cy, TILE, TILE, arcade.color.RED, 4))
+
+            for sq in self.checker_squares:
+                cx, cy = self.tile_center(row_of(sq), col_of(sq))
+                overlay.append(create_rectangle_filled(cx, cy, TILE, TILE, (255, 100, 100, 100)))
+                overlay.append(create_rectangle_outline(cx, cy, TILE, TILE, (255, 50, 50, 220), 2))
+
+        self.overlay = overlay
+        self.overlay_empty = not (self.moves or self.selected or self.check_square is not None)
+
+    def draw_side_panel(self):
+        mode = "вкл" if self.ai_color is not None else "выкл"
+        engine = ""
+        table = ""
+        if self.engine_job is not None:
+            engine = "Компьютер думает..."
+            if self.engine_info:
+                score = self.engine_info["score"]
+                score_text = "мат" if abs(score) >= MATE_BOUND else f"{score / 100:+.2f}"
+                engine = f"Глубина {self.engine_info['depth']}, оценка {score_text}"
+                table = (
+                    f"Таблица: {self.engine_info['tt_hit_rate']:.0%} попаданий, "
+                    f"{self.engine_info['tt_memory'] // (1024 * 1024)} МБ"
+                )
 
-        if self.check_king:
-            arcade.draw_lbwh_rectangle_outline(
-                self.check_king.col * TILE,
-                (BOARD - 1 - self.check_king.row) * TILE,
-                TILE,
-                TILE,
-                arcade.color.RED,
-                4
-            )
+        # Text пересчитывает раскладку только при смене строки
+        lines = (f"C - игра с компьютером: {mode}", engine, table, self.endgame_text, self.latency_text())
+        for label, text in zip(self.panel_texts, lines):
+            if label.text != text:
+                label.text = text
+            if text:
+                label.draw()
+
+    def draw_search_stats(self):
+        lines = format_stats(self.search_stats) if self.search_stats else ["Поиска ещё не было"]
+        height = 18 * len(self.stats_texts) + 12
+        arcade.draw_lbwh_rectangle_filled(0, SCREEN - height, SCREEN, height, (0, 0, 0, 170))
+        for label, text in zip(self.stats_texts, lines + [""] * len(self.stats_texts)):
+            if label.text != text:
+                label.text = text
+            if text:
+                label.draw()
 
-            for piece in self.checkers:
-                arcade.draw_lbwh_rectangle_filled(
-                    piece.col * TILE,
-                    (BOARD - 1 - piece.row) * TILE,
-                    TILE,
-                    TILE,
-                    (255, 100, 100, 100)
-                )
-                arcade.draw_lbwh_rectangle_outline(
-                    piece.col * TILE,
-                    (BOARD - 1 - piece.row) * TILE,
-                    TILE,
-                    TILE,
-                    (255, 50, 50, 220),
-                    2
-                )
+    def on_draw(self):
+        self.clear()
+
+        self.board_layer.draw()
+
+        state = self.overlay_state()
+        if state != self.overlay_key:
+            self.overlay_key = state
+            self.rebuild_overlay()
+        if not self.overlay_empty and self.review_ply is None:
+            self.overlay.draw()
 
         self.pieces.draw()
+        self.draw_side_panel()
+        if self.show_stats:
+            self.draw_search_stats()
 
         if self.promoting:
             self.draw_promo_menu()
 
-        if self.game_over:
+        if self.game_over or self.puzzle is not None:
+            self.draw_notes()
+        if self.game_over and self.review_ply is None:
             arcade.draw_lbwh_rectangle_filled(0, 0, SCREEN, SCREEN, (0, 0, 0, 180))
             arcade.draw_text(
-                f"ШАХ И МАТ!",
+                self.result_title,
                 SCREEN // 2,
                 SCREEN // 2 + 40,
                 arcade.color.GOLD,
@@ -161,7 +491,7 @@ class ChessGameView(arcade.View):
                 align="center",
             )
             arcade.draw_text(
-                f"Победили {'БЕЛЫЕ' if self.winner == WHITE else 'ЧЁРНЫЕ'}",
+                self.result_reason,
                 SCREEN // 2,
                 SCREEN // 2 - 40,
                 arcade.color.WHITE,
@@ -171,37 +501,50 @@ class ChessGameView(arcade.View):
                 align="center",
             )
 
+    def build_promo_menu(self):
+        """Спрайты меню превращения создаются один раз для каждого цвета."""
+        menu_x = (SCREEN - TILE * len(self.promo_options)) // 2
+        menu_y = (SCREEN - TILE) // 2
+
+        self.promo_rects = []
+        for i in range(len(self.promo_options)):
+            self.promo_rects.append((menu_x + i * TILE, menu_y, TILE, TILE))
+
+        for player in (WHITE, BLACK):
+            sprites = arcade.SpriteList()
+            for piece, (rect_x, rect_y, width, height) in zip(self.promo_options, self.promo_rects):
+                sprite = arcade.Sprite(piece_texture(player, piece), scale=PIECE_SIZE / TILE)
+                sprite.center_x = rect_x + width // 2
+                sprite.center_y = rect_y + height // 2
+                sprites.append(sprite)
+            self.promo_sprites[player] = sprites
+
     def draw_promo_menu(self):
+        menu_x, menu_y = self.promo_rects[0][:2]
         menu_width = TILE * len(self.promo_options)
         menu_height = TILE
-        menu_x = (SCREEN - menu_width) // 2
-        menu_y = (SCREEN - menu_height) // 2
 
         arcade.draw_lbwh_rectangle_filled(menu_x, menu_y, menu_width, menu_height, arcade.color.DARK_SLATE_GRAY)
         arcade.draw_lbwh_rectangle_outline(menu_x, menu_y, menu_width, menu_height, arcade.color.GOLD, 3)
 
-        self.promo_rects = []
-        self.promo_sprites = arcade.SpriteList()
-
-        for i, piece in enumerate(self.promo_options):
-            rect_x = menu_x + i * TILE
-            rect = (rect_x, menu_y, TILE, TILE)
-            self.promo_rects.append(rect)
+        if hasattr(self, 'promo_hover') and self.promo_hover is not None:
+            rect_x, rect_y, width, height = self.promo_rects[self.promo_hover]
+            arcade.draw_lbwh_rectangle_filled(rect_x, rect_y, width, height, arcade.color.LIGHT_GRAY)
 
-            if hasattr(self, 'promo_hover') and self.promo_hover == i:
-                arcade.draw_lbwh_rectangle_filled(rect_x, menu_y, TILE, TILE, arcade.color.LIGHT_GRAY)
-
-            sprite = arcade.Sprite(
-                f"assets/pieces/{'w' if self.promoting.player == WHITE else 'b'}{piece}.png",
-                scale=PIECE_SIZE / TILE
-            )
-            sprite.center_x = rect_x + TILE // 2
-            sprite.center_y = menu_y + TILE // 2
-            self.promo_sprites.append(sprite)
-
-        self.promo_sprites.draw()
+        self.promo_sprites[self.promoting.player].draw()
 
     def on_key_press(self, key, modifiers):
+        if key == arcade.key.C and not self.game_over:
+            self.toggle_computer()
+        if key == arcade.key.D:
+            self.show_stats = not self.show_stats
+        if key in (arcade.key.LEFT, arcade.key.RIGHT) and self.game_over:
+            self.step_review(-1 if key == arcade.key.LEFT else 1)
+        if key == arcade.key.P:
+            self.next_puzzle()
+        if key == arcade.key.F:
+            # FEN или EPD из буфера обмена
+            self.paste_position()
         if key == arcade.key.ESCAPE:
             if self.return_view_cls:
                 self.window.show_view(self.return_view_cls())
@@ -214,373 +557,307 @@ class ChessGameView(arcade.View):
             self.handle_promo_click(x, y)
             return
 
-        c = x // TILE
-        r = BOARD - 1 - (y // TILE)
-        piece = self.piece_at(r, c)
+        if self.position.turn == self.ai_color:
+            return
+        if self.puzzle is not None and (self.puzzle_state != "solving" or self.puzzle_reply_at is not None):
+            return
 
-        if self.selected:
-            if (r, c) in self.moves:
-                self.make_move(r, c)
-            else:
-                if piece and piece.player == self.turn:
-                    self.selected = piece
-                    self.moves = self.get_moves(piece)
-                else:
-                    self.selected = None
-                    self.moves = []
+        c = int(x // TILE)
+        r = BOARD - 1 - int(y // TILE)
+        if not (0 <= r < BOARD and 0 <= c < BOARD):
+            return
+
+        if self.selected and (r, c) in self.moves:
+            self.make_move(r, c)
+            return
+
+        piece = self.piece_sprites.get(square(r, c))
+        if piece and piece.player == self.position.turn:
+            self.selected = piece
+            self.moves = self.get_moves(piece)
         else:
-            if piece and piece.player == self.turn:
-                self.selected = piece
-                self.moves = self.get_moves(piece)
+            self.selected = None
+            self.moves = []
 
     def handle_promo_click(self, x, y):
         for i, rect in enumerate(self.promo_rects):
             rect_x, rect_y, width, height = rect
             if rect_x <= x <= rect_x + width and rect_y <= y <= rect_y + height:
-                self.promoting.kind = self.promo_options[i]
-                self.promoting.texture = arcade.load_texture(
-                    f"assets/pieces/{'w' if self.promoting.player == WHITE else 'b'}{self.promo_options[i]}.png"
-                )
-                self.promoting.scale = PIECE_SIZE / TILE
+                self.promoting.set_kind(self.promo_options[i])
 
-                self.promo_sprites = arcade.SpriteList()
-
-                self.turn *= -1
+                frm, to = self.promo_move
+                self.position.make_move(self.find_move(frm, to, KIND_BY_CHAR[self.promo_options[i]]))
                 self.promoting = None
-                self.promo_rects = []
-
-                self.check_king = None
-                self.checkers = []
-                if self.in_check(self.turn):
-                    self.update_check()
-                    if self.checkmate(self.turn):
-                        self.game_over = True
-                        self.winner = -self.turn
+                self.promo_move = None
+                self.finish_move()
                 break
 
     def make_move(self, r, c):
-        target = self.piece_at(r, c)
-
-        en_passant_cap = False
-        if self.en_passant and (r, c) == self.en_passant and self.selected.kind == "P":
-            cap_row = self.selected.row
-            cap_col = c
-            cap_pawn = self.piece_at(cap_row, cap_col)
-            if cap_pawn:
-                self.pieces.remove(cap_pawn)
-                en_passant_cap = True
-
-        old_r, old_c = self.selected.row, self.selected.col
-        moving_pawn = (self.selected.kind == "P")
-
-        if target and not en_passant_cap:
-            self.pieces.remove(target)
-            arcade.play_sound(self.move_sound)
-        else:
-            arcade.play_sound(self.move_sound)
+        frm = square(self.selected.row, self.selected.col)
+        to = square(r, c)
+        arcade.play_sound(self.move_sound)
+
+        if self.selected.kind == "P" and r in (0, BOARD - 1):
+            # Пешка ждёт выбора фигуры на последней горизонтали
+            captured = self.piece_sprites.get(to)
+            if captured:
+                self.pieces.remove(captured)
+            self.selected.row = r
+            self.selected.col = c
+            self.selected.update_pos()
+            self.promoting = self.selected
+            self.promo_move = (frm, to)
+            self.selected = None
+            self.moves = []
+            return
 
-        self.selected.row = r
-        self.selected.col = c
-        self.selected.update_pos()
+        self.position.make_move(self.find_move(frm, to))
+        self.finish_move()
 
-        if self.selected.kind == "K" and abs(c - old_c) == 2:
-            if c > old_c:
-                rook_c = 7
-                new_rook_c = c - 1
+    def finish_move(self):
+        if self.puzzle is not None and self.puzzle_state == "solving" and self.position.turn != self.puzzle["solver"]:
+            self.check_puzzle_move()
+        self.sync_pieces()
+        self.selected = None
+        self.moves = []
+        self.update_check()
+
+        turn = self.position.turn
+        self.turn_moves = None
+        # В эндшпиле из таблиц мат виден без генерации ходов
+        verdict = self.tablebase.probe(self.position)
+        self.endgame_text = self.endgame_verdict(verdict)
+        if verdict == (-1, 0):
+            self.end_game(-turn, "ШАХ И МАТ!", f"Победили {'БЕЛЫЕ' if turn == BLACK else 'ЧЁРНЫЕ'}")
+            return
+        if turn != self.ai_color:
+            # Человеку ходы понадобятся на каждый клик - раскладываем их по клеткам сразу
+            self.turn_moves = self.position.legal_moves_by_square()
+            has_move = bool(self.turn_moves)
+        else:
+            # Компьютеру список не нужен: чтобы опровергнуть мат и пат, хватает первого хода
+            has_move = self.position.has_legal_move()
+        if not has_move:
+            if self.check_square is not None:
+                self.end_game(-turn, "ШАХ И МАТ!", f"Победили {'БЕЛЫЕ' if turn == BLACK else 'ЧЁРНЫЕ'}")
             else:
-                rook_c = 0
-                new_rook_c = c + 1
-
-            rook = self.piece_at(r, rook_c)
-            if rook:
-                rook.col = new_rook_c
-                rook.update_pos()
-                rook.first_move = False
-
-        new_en_passant = None
-        if moving_pawn and abs(r - old_r) == 2:
-            en_passant_r = (old_r + r) // 2
-            new_en_passant = (en_passant_r, c)
-
-        pawn_promo = False
-        if self.selected.kind == "P":
-            self.selected.first_move = False
-            if (self.selected.player == WHITE and r == 0) or (self.selected.player == BLACK and r == 7):
-                pawn_promo = True
-                self.promoting = self.selected
-
-        if self.selected.kind in ["K", "R"]:
-            self.selected.first_move = False
-
-        if self.in_check(self.selected.player):
-            self.selected.row = old_r
-            self.selected.col = old_c
-            self.selected.update_pos()
-            if target and not en_passant_cap:
-                self.pieces.append(target)
-            if en_passant_cap:
-                cap_pawn = ChessPiece("P", -self.selected.player, old_r, c)
-                cap_pawn.first_move = False
-                self.pieces.append(cap_pawn)
-            if self.selected.kind == "K" and abs(c - old_c) == 2:
-                if c > old_c:
-                    rook_c = 7
-                    old_rook_c = c - 1
-                else:
-                    rook_c = 0
-                    old_rook_c = c + 1
-
-                rook = self.piece_at(r, old_rook_c)
-                if rook:
-                    rook.col = rook_c
-                    rook.update_pos()
-                    rook.first_move = True
+                self.end_game(None, "НИЧЬЯ", "Пат")
             return
-
-        if pawn_promo:
-            self.en_passant = None
+        if self.position.repetitions() >= 2:
+            self.end_game(None, "НИЧЬЯ", "Троекратное повторение")
+            return
+        if self.position.halfmove_clock >= 100:
+            self.end_game(None, "НИЧЬЯ", "Правило 50 ходов")
+            return
+        if self.position.is_insufficient_material():
+            self.end_game(None, "НИЧЬЯ", "Недостаточно материала")
             return
 
-        self.turn *= -1
-        self.en_passant = new_en_passant
-        self.check_king = None
-        self.checkers = []
+        self.request_engine_move()
+
+    def endgame_verdict(self, verdict):
+        if verdict is None or verdict == (-1, 0):
+            return ""
+        result, plies = verdict
+        if not result:
+            return "Таблицы: ничья"
+        # Мат через plies полуходов - это (plies + 1) // 2 ходов победителя
+        side = "БЕЛЫЕ" if (self.position.turn == WHITE) == (result > 0) else "ЧЁРНЫЕ"
+        return f"Таблицы: {side} ставят мат в {(plies + 1) // 2}"
+
+    def end_game(self, winner, title, reason):
+        if self.ponder_job is not None:
+            self.engine.stop()
+            self.ponder_job = None
+        self.game_over = True
+        self.winner = winner
+        self.result_title = title
+        self.result_reason = reason
+        if self.puzzle is None:
+            self.start_annotation()
+
+    def start_annotation(self):
+        """Отдать сыгранные ходы на разбор в фоновые процессы."""
+        moves = [entry[0] for entry in self.position.history]
+        if not moves:
+            return
+        if self.annotator is None:
+            self.annotator = GameAnnotator(
+                self.data_path("chess_analysis_cache", ""),
+                workers=self.setting("chess_threads", 1), time_limit=self.setting("chess_annotate_time", 0.5),
+            )
+        self.annotation = None
+        self.annotator.start(self.start_fen, moves, self.backend)
+        self.annotation_progress = self.annotator.poll()
+        self.annotation = self.annotator.result
+
+    def step_review(self, delta):
+        """Показать позицию на delta полуходов раньше или позже; в конце партии - итог поверх доски."""
+        moves = [entry[0] for entry in self.position.history]
+        current = len(moves) if self.review_ply is None else self.review_ply
+        ply = max(0, min(len(moves), current + delta))
+        if ply == len(moves):
+            self.review_ply = None
+            self.sync_pieces()
+            return
+        self.review_ply = ply
+        board = BACKENDS[self.backend].from_fen(self.start_fen)
+        for move in moves[:ply]:
+            board.make_move(move)
+        self.sync_pieces(board.board)
+
+    def review_lines(self):
+        done, total = self.annotation_progress
+        if self.annotation is None:
+            if self.annotator is not None and self.annotator.error:
+                return ["Разбор партии недоступен", self.annotator.error[:40], "", "← → - по ходам"]
+            return [f"Разбор партии: {done}/{total} позиций" if total else "", "", "", "← → - по ходам"]
+        blunders = sum(1 for entry in self.annotation if entry["mark"] == "??")
+        mistakes = sum(1 for entry in self.annotation if entry["mark"] == "?")
+        lines = [f"Разбор: грубых ошибок {blunders}, ошибок {mistakes}"]
+        ply = len(self.annotation) if self.review_ply is None else self.review_ply
+        if ply:
+            entry = self.annotation[ply - 1]
+            number = f"{entry['ply'] // 2 + 1}.{'' if entry['ply'] % 2 == 0 else '..'}"
+            after = entry["after"]
+            score = "мат" if abs(after) >= MATE_BOUND else f"{after / 100:+.2f}"
+            lines.append(f"{number} {entry['san']}{entry['mark']} {score}")
+            lines.append(f"Лучше {entry['best']}" if entry["best"] else "")
+        else:
+            lines += ["Начальная позиция", ""]
+        lines.append("← → - по ходам")
+        return lines
 
-        if self.in_check(self.turn):
-            self.update_check()
-            if self.checkmate(self.turn):
-                self.game_over = True
-                self.winner = -self.turn
+    def save_for_puzzles(self):
+        """Разобранная партия игрока идёт в базу задач: python -m chess_engine.puzzles mine добудет их.
 
-        self.selected = None
-        self.moves = []
+        Только при включённой settings.chess_save_puzzles.
+        """
+        path = self.data_path("chess_puzzle_db", DEFAULT_PUZZLE_PATH)
+        if path is None:
+            return
+        moves = [entry[0] for entry in self.position.history]
+        with PuzzleDatabase(path) as database:
+            database.add_game(self.start_fen, moves, self.annotator.scores, "партия")
+
+    def puzzle_stats(self):
+        """Рейтинг игрока в задачах и счёт; без менеджера статистики - только на эту сессию."""
+        if self.window is not None and hasattr(self.window, "data_manager"):
+            return self.window.data_manager.data.setdefault("chess_puzzles", self.puzzle_record)
+        return self.puzzle_record
+
+    def next_puzzle(self):
+        """Случайная задача из базы около рейтинга игрока (и темы settings.chess_puzzle_theme)."""
+        path = self.data_path("chess_puzzle_db", DEFAULT_PUZZLE_PATH)
+        if self.puzzle_db is None:
+            if path is None or not os.path.exists(path):
+                self.endgame_text = f"Нет базы задач {path}"
+                return
+            self.puzzle_db = PuzzleDatabase(path)
+        rating = self.puzzle_stats()["rating"]
+        theme = self.setting("chess_puzzle_theme", "") or None
+        puzzle = None
+        for band in (100, 300, 3000):
+            puzzle = self.puzzle_db.random_puzzle(rating - band, rating + band, theme)
+            if puzzle is not None:
+                break
+        if puzzle is None:
+            self.endgame_text = "В базе нет подходящих задач"
+            return
+        if self.ai_color is not None:
+            self.toggle_computer()
+        try:
+            self.setup_board(puzzle["fen"])
+        except ValueError as error:
+            self.load_position(START_FEN)
+            self.endgame_text = f"Задача не загружена: {error}"
+            return
+        puzzle["solver"] = self.position.turn
+        self.puzzle = puzzle
+        self.puzzle_step = 0
+        self.puzzle_state = "solving"
+        self.puzzle_message = f"Ход {'белых' if self.position.turn == WHITE else 'чёрных'}: найдите лучший"
+
+    def check_puzzle_move(self):
+        """Сверить ход игрока с решением; ответ соперника сыграется сам через полсекунды."""
+        moves = self.puzzle["moves"]
+        played = self.position.history[-1][0]
+        # Любой матующий ход тоже решение, даже если в базе записан другой
+        if self.position.is_checkmate():
+            self.finish_puzzle(True)
+        elif move_uci(played) != moves[self.puzzle_step]:
+            before = self.position.copy()
+            before.unmake_move()
+            self.puzzle_message = f"Неверно: {move_san(before, parse_uci(before, moves[self.puzzle_step]))},"
+            self.finish_puzzle(False)
+        else:
+            self.puzzle_step += 1
+            if self.puzzle_step >= len(moves):
+                self.finish_puzzle(True)
+            else:
+                self.puzzle_reply_at = time.perf_counter() + 0.5
+
+    def play_puzzle_reply(self):
+        self.puzzle_reply_at = None
+        move = parse_uci(self.position, self.puzzle["moves"][self.puzzle_step])
+        self.puzzle_step += 1
+        arcade.play_sound(self.move_sound)
+        self.position.make_move(move)
+        self.finish_move()
+
+    def finish_puzzle(self, solved):
+        """Итог задачи и новый рейтинг игрока (Эло, K = 32)."""
+        stats = self.puzzle_stats()
+        expected = 1 / (1 + 10 ** ((self.puzzle["rating"] - stats["rating"]) / 400))
+        change = round(32 * ((1 if solved else 0) - expected))
+        stats["rating"] += change
+        stats["solved" if solved else "failed"] += 1
+        if self.window is not None and hasattr(self.window, "data_manager"):
+            self.window.data_manager.save()
+        self.puzzle_state = "solved" if solved else "failed"
+        if solved:
+            self.puzzle_message = "Решено!"
+        self.puzzle_message += f" рейтинг {stats['rating']} ({change:+d})"
+
+    def puzzle_lines(self):
+        stats = self.puzzle_stats()
+        return [
+            f"Задача #{self.puzzle['id']}, рейтинг {self.puzzle['rating']}",
+            f"Темы: {' '.join(self.puzzle['themes'])}",
+            self.puzzle_message,
+            f"P - следующая, решено {stats['solved']} из {stats['solved'] + stats['failed']}",
+        ]
+
+    def draw_notes(self):
+        lines = self.puzzle_lines() if self.puzzle is not None else self.review_lines()
+        for label, text in zip(self.review_texts, lines):
+            if label.text != text:
+                label.text = text
+            if text:
+                label.draw()
 
     def update_check(self):
-        self.check_king = self.find_king(self.turn)
-        self.checkers = []
-
-        if self.check_king:
-            for piece in self.pieces:
-                if piece.player != self.turn and self.can_move(piece, self.check_king.row, self.check_king.col, False):
-                    self.checkers.append(piece)
-
-    def piece_at(self, r, c):
-        for p in self.pieces:
-            if p.row == r and p.col == c:
-                return p
-        return None
-
-    def find_king(self, color):
-        for p in self.pieces:
-            if p.kind == "K" and p.player == color:
-                return p
+        turn = self.position.turn
+        self.check_square = None
+        self.checker_squares = []
+
+        checkers = self.position.checkers()
+        if checkers:
+            self.check_square = self.position.king_square(turn)
+            self.checker_squares = list(checkers)
+
+    def moves_from(self, frm):
+        if self.turn_moves is None:
+            self.turn_moves = self.position.legal_moves_by_square()
+        return self.turn_moves.get(frm, [])
+
+    def find_move(self, frm, to, promotion=QUEEN):
+        """Легальный ход frm -> to из кэша хода; для превращения - в фигуру promotion."""
+        for move in self.moves_from(frm):
+            if move_to(move) == to and move_promotion(move) in (0, promotion):
+                return move
         return None
 
-    def in_check(self, color):
-        king = self.find_king(color)
-        if not king:
-            return True
-
-        for piece in self.pieces:
-            if piece.player != color and self.can_move(piece, king.row, king.col, False):
-                return True
-        return False
-
     def get_moves(self, piece):
-        moves = []
-        for r in range(BOARD):
-            for c in range(BOARD):
-                if self.can_move(piece, r, c):
-                    old_r, old_c = piece.row, piece.col
-                    target = self.piece_at(r, c)
-
-                    en_passant_move = (piece.kind == "P" and self.en_passant and (r, c) == self.en_passant)
-
-                    piece.row, piece.col = r, c
-                    removed = None
-                    if target and not en_passant_move:
-                        self.pieces.remove(target)
-                        removed = target
-
-                    if en_passant_move:
-                        cap_r = old_r
-                        cap_c = c
-                        cap_pawn = self.piece_at(cap_r, cap_c)
-                        if cap_pawn:
-                            self.pieces.remove(cap_pawn)
-                            removed = cap_pawn
-
-                    if piece.kind == "K" and abs(c - old_c) == 2:
-                        if c > old_c:
-                            rook_c = 7
-                            new_rook_c = c - 1
-                        else:
-                            rook_c = 0
-                            new_rook_c = c + 1
-
-                        rook = self.piece_at(old_r, rook_c)
-                        if rook:
-                            rook.col = new_rook_c
-                            temp_removed = None
-                            if self.piece_at(old_r, new_rook_c) and self.piece_at(old_r, new_rook_c) != rook:
-                                temp_removed = self.piece_at(old_r, new_rook_c)
-                                self.pieces.remove(temp_removed)
-
-                    if not self.in_check(piece.player):
-                        moves.append((r, c))
-
-                    piece.row, piece.col = old_r, old_c
-                    if removed:
-                        self.pieces.append(removed)
-
-                    if piece.kind == "K" and abs(c - old_c) == 2:
-                        if c > old_c:
-                            rook_c = 7
-                            new_rook_c = c - 1
-                        else:
-                            rook_c = 0
-                            new_rook_c = c + 1
-
-                        rook = self.piece_at(old_r, new_rook_c)
-                        if rook and rook.kind == "R":
-                            rook.col = rook_c
-                            rook.update_pos()
-                        if temp_removed:
-                            self.pieces.append(temp_removed)
-
-        return moves
-
-    def can_move(self, piece, r, c, check=True):
-        if not (0 <= r < BOARD and 0 <= c < BOARD):
-            return False
-
-        target = self.piece_at(r, c)
-        if target and target.player == piece.player:
-            return False
-
-        dr = r - piece.row
-        dc = c - piece.col
-
-        if piece.kind == "P":
-            dir = -1 if piece.player == WHITE else 1
-
-            if dc == 0 and dr == dir and not target:
-                return True
-
-            if dc == 0 and dr == 2 * dir and piece.first_move:
-                mid_r = piece.row + dir
-                if not self.piece_at(mid_r, piece.col) and not target:
-                    return True
-
-            if abs(dc) == 1 and dr == dir and target:
-                return True
-
-            if abs(dc) == 1 and dr == dir and self.en_passant and (r, c) == self.en_passant:
-                enemy_r = piece.row
-                enemy_c = c
-                enemy = self.piece_at(enemy_r, enemy_c)
-                if enemy and enemy.kind == "P" and enemy.player != piece.player:
-                    return True
-
-            return False
-
-        if piece.kind == "R":
-            if dr == 0 or dc == 0:
-                return self.clear_path(piece.row, piece.col, r, c)
-            return False
-
-        if piece.kind == "B":
-            if abs(dr) == abs(dc):
-                return self.clear_path(piece.row, piece.col, r, c)
-            return False
-
-        if piece.kind == "Q":
-            if dr == 0 or dc == 0 or abs(dr) == abs(dc):
-                return self.clear_path(piece.row, piece.col, r, c)
-            return False
-
-        if piece.kind == "N":
-            return (abs(dr), abs(dc)) in [(1, 2), (2, 1)]
-
-        if piece.kind == "K":
-            if max(abs(dr), abs(dc)) == 1:
-                return True
-
-            if piece.first_move and dr == 0 and abs(dc) == 2:
-                if self.can_castle(piece, dc > 0):
-                    if dc > 0:
-                        if self.piece_at(piece.row, 5) or self.piece_at(piece.row, 6):
-                            return False
-                    else:
-                        if self.piece_at(piece.row, 1) or self.piece_at(piece.row, 2) or self.piece_at(piece.row, 3):
-                            return False
-
-                    if self.in_check(piece.player):
-                        return False
-
-                    if dc > 0:
-                        for col in range(piece.col + 1, 7):
-                            temp_r = piece.row
-                            temp_c = col
-                            if self.square_attacked(temp_r, temp_c, piece.player):
-                                return False
-                    else:
-                        for col in range(piece.col - 1, 0, -1):
-                            temp_r = piece.row
-                            temp_c = col
-                            if self.square_attacked(temp_r, temp_c, piece.player):
-                                return False
-
-                    return True
-            return False
-
-        return False
-
-    def square_attacked(self, row, col, color):
-        for piece in self.pieces:
-            if piece.player != color:
-                if self.can_move(piece, row, col, False):
-                    return True
-        return False
-
-    def clear_path(self, sr, sc, r, c):
-        dr = r - sr
-        dc = c - sc
-        step_r = (dr > 0) - (dr < 0) if dr != 0 else 0
-        step_c = (dc > 0) - (dc < 0) if dc != 0 else 0
-
-        rr, cc = sr + step_r, sc + step_c
-        while (rr, cc) != (r, c):
-            if self.piece_at(rr, cc):
-                return False
-            rr += step_r
-            cc += step_c
-        return True
-
-    def can_castle(self, king, kingside):
-        row = king.row
-        rook_col = 7 if kingside else 0
-
-        rook = self.piece_at(row, rook_col)
-        if not rook or rook.kind != "R" or not rook.first_move:
-            return False
-
-        start_col = min(king.col, rook_col) + 1
-        end_col = max(king.col, rook_col)
-
-        for col in range(start_col, end_col):
-            if self.piece_at(row, col):
-                return False
-
-        return True
-
-    def checkmate(self, color):
-        if not self.in_check(color):
-            return False
-
-        for piece in self.pieces:
-            if piece.player == color:
-                if self.get_moves(piece):
-                    return False
-
-        return True
+        targets = {move_to(move) for move in self.moves_from(square(piece.row, piece.col))}
+        return [(row_of(sq), col_of(sq)) for sq in sorted(targets)]
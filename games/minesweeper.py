@@ -1,7 +1,8 @@
 import arcade
-import random
 import time
 
+from mines_engine import FLAGGED, REVEALED, MinesBoard
+
 ROW_COUNT = 12
 COLUMN_COUNT = 16
 CELL_SIZE = 32
@@ -9,6 +10,12 @@ BOARD_LEFT = 40
 BOARD_BOTTOM = 60
 BOARD_WIDTH = COLUMN_COUNT * CELL_SIZE
 BOARD_HEIGHT = ROW_COUNT * CELL_SIZE
+# Размеры поля по клавишам 1-3; на экране всегда окно ROW_COUNT x COLUMN_COUNT, большие поля прокручиваются стрелками
+BOARD_PRESETS = {
+    arcade.key.KEY_1: (ROW_COUNT, COLUMN_COUNT),
+    arcade.key.KEY_2: (100, 100),
+    arcade.key.KEY_3: (1000, 1000),
+}
 
 
 class MinesGameView(arcade.View):
@@ -18,13 +25,14 @@ class MinesGameView(arcade.View):
         arcade.set_background_color(arcade.color.ASH_GREY)
         self.initialize_game()
 
-    def initialize_game(self):
-        self.row_count = ROW_COUNT
-        self.column_count = COLUMN_COUNT
+    def initialize_game(self, row_count=None, column_count=None):
+        self.row_count = row_count or getattr(self, "row_count", ROW_COUNT)
+        self.column_count = column_count or getattr(self, "column_count", COLUMN_COUNT)
         self.total_mines = max(10, (self.row_count * self.column_count) // 8)
-        self.mine_positions = set()
-        self.revealed_cells = set()
-        self.flagged_cells = set()
+        self.board = MinesBoard(self.row_count, self.column_count, self.total_mines)
+        # Левая нижняя клетка видимого окна
+        self.view_row = 0
+        self.view_col = 0
         self.is_first_click = True
         self.is_game_over = False
         self.is_win = False
@@ -32,79 +40,57 @@ class MinesGameView(arcade.View):
         self.elapsed_time = 0.0
 
     def place_mines_safely(self, safe_cell):
-        possible_cells = [(row, col) for row in range(self.row_count) for col in range(self.column_count)]
-        forbidden_cells = {safe_cell}
-        safe_row, safe_col = safe_cell
-
-        for row_offset in (-1, 0, 1):
-            for col_offset in (-1, 0, 1):
-                neighbor_row = safe_row + row_offset
-                neighbor_col = safe_col + col_offset
-                if 0 <= neighbor_row < self.row_count and 0 <= neighbor_col < self.column_count:
-                    forbidden_cells.add((neighbor_row, neighbor_col))
-
-        available_cells = [cell for cell in possible_cells if cell not in forbidden_cells]
-        self.mine_positions = set(random.sample(available_cells, self.total_mines))
-
-    def get_cell_neighbors(self, row, col):
-        for row_offset in (-1, 0, 1):
-            for col_offset in (-1, 0, 1):
-                if row_offset == 0 and col_offset == 0:
-                    continue
-                neighbor_row = row + row_offset
-                neighbor_col = col + col_offset
-                if 0 <= neighbor_row < self.row_count and 0 <= neighbor_col < self.column_count:
-                    yield (neighbor_row, neighbor_col)
+        self.board.place_mines(*safe_cell)
 
     def count_adjacent_mines(self, row, col):
-        mine_count = 0
-        for neighbor in self.get_cell_neighbors(row, col):
-            if neighbor in self.mine_positions:
-                mine_count += 1
-        return mine_count
+        return self.board.count(row, col)
 
     def reveal_empty_area(self, start_row, start_col):
-        cells_to_check = [(start_row, start_col)]
-        while cells_to_check:
-            current_row, current_col = cells_to_check.pop()
-            if (current_row, current_col) in self.revealed_cells:
-                continue
-
-            self.revealed_cells.add((current_row, current_col))
-
-            if self.count_adjacent_mines(current_row, current_col) == 0:
-                for neighbor in self.get_cell_neighbors(current_row, current_col):
-                    if neighbor not in self.revealed_cells and neighbor not in self.mine_positions:
-                        cells_to_check.append(neighbor)
+        self.board.reveal(start_row, start_col)
 
     def check_for_win(self):
-        total_cells = self.row_count * self.column_count
-        if len(self.revealed_cells) + len(self.mine_positions) == total_cells:
+        if self.board.is_won():
             self.is_win = True
             self.is_game_over = True
 
+    def visible_rows(self):
+        return min(ROW_COUNT, self.row_count)
+
+    def visible_columns(self):
+        return min(COLUMN_COUNT, self.column_count)
+
+    def scroll(self, row_step, col_step):
+        self.view_row = max(0, min(self.row_count - self.visible_rows(), self.view_row + row_step))
+        self.view_col = max(0, min(self.column_count - self.visible_columns(), self.view_col + col_step))
+
     def on_draw(self):
         self.clear()
 
         arcade.draw_lbwh_rectangle_filled(BOARD_LEFT - 2, BOARD_BOTTOM - 2, BOARD_WIDTH + 4, BOARD_HEIGHT + 4,
                                           arcade.color.DARK_BROWN)
 
-        for row in range(self.row_count):
-            for col in range(self.column_count):
+        # Из массивов поля берётся только видимое окно
+        row_slice = slice(self.view_row, self.view_row + self.visible_rows())
+        col_slice = slice(self.view_col, self.view_col + self.visible_columns())
+        window_mines = self.board.mines[row_slice, col_slice].tolist()
+        window_counts = self.board.counts[row_slice, col_slice].tolist()
+        window_state = self.board.state[row_slice, col_slice].tolist()
+
+        for row, (mines_row, counts_row, state_row) in enumerate(zip(window_mines, window_counts, window_state)):
+            for col, (is_mine, adjacent_mines, state) in enumerate(zip(mines_row, counts_row, state_row)):
                 cell_left = BOARD_LEFT + col * CELL_SIZE
                 cell_bottom = BOARD_BOTTOM + row * CELL_SIZE
-                is_revealed = (row, col) in self.revealed_cells
+                is_revealed = state & REVEALED
 
                 cell_color = arcade.color.LIGHT_GRAY if is_revealed else arcade.color.GRAY
                 arcade.draw_lbwh_rectangle_filled(cell_left, cell_bottom, CELL_SIZE, CELL_SIZE, cell_color)
                 arcade.draw_lbwh_rectangle_outline(cell_left, cell_bottom, CELL_SIZE, CELL_SIZE, arcade.color.BLACK, 1)
 
                 if is_revealed:
-                    if (row, col) in self.mine_positions:
+                    if is_mine:
                         arcade.draw_circle_filled(cell_left + CELL_SIZE / 2, cell_bottom + CELL_SIZE / 2, CELL_SIZE / 4,
                                                   arcade.color.BLACK)
                     else:
-                        adjacent_mines = self.count_adjacent_mines(row, col)
                         if adjacent_mines > 0:
                             arcade.draw_text(
                                 str(adjacent_mines),
@@ -116,7 +102,7 @@ class MinesGameView(arcade.View):
                                 anchor_y="center",
                             )
                 else:
-                    if (row, col) in self.flagged_cells:
+                    if state & FLAGGED:
                         arcade.draw_text(
                             "F",
                             cell_left + CELL_SIZE / 2,
@@ -127,8 +113,15 @@ class MinesGameView(arcade.View):
                             anchor_y="center",
                         )
 
-        arcade.draw_text(f"Мин осталось: {self.total_mines}", BOARD_LEFT + BOARD_WIDTH + 20, BOARD_BOTTOM + BOARD_HEIGHT - 20,
-                         arcade.color.WHITE, 16)
+        arcade.draw_text(f"Мин осталось: {self.total_mines - self.board.flags}", BOARD_LEFT + BOARD_WIDTH + 20,
+                         BOARD_BOTTOM + BOARD_HEIGHT - 20, arcade.color.WHITE, 16)
+        arcade.draw_text(f"Поле {self.row_count}x{self.column_count}", BOARD_LEFT + BOARD_WIDTH + 20,
+                         BOARD_BOTTOM + BOARD_HEIGHT - 80, arcade.color.LIGHT_GRAY, 14)
+        if self.row_count > ROW_COUNT or self.column_count > COLUMN_COUNT:
+            arcade.draw_text(f"Окно: строки {self.view_row + 1}-{self.view_row + self.visible_rows()}, "
+                             f"столбцы {self.view_col + 1}-{self.view_col + self.visible_columns()}",
+                             BOARD_LEFT + BOARD_WIDTH + 20, BOARD_BOTTOM + BOARD_HEIGHT - 105,
+                             arcade.color.LIGHT_GRAY, 12)
 
         if self.game_start_time:
             arcade.draw_text(
@@ -140,7 +133,7 @@ class MinesGameView(arcade.View):
             )
 
         arcade.draw_text(
-            "Левый клик - открыть / Правый клик - флаг. R - перезапуск, ESC - выход",
+            "Левый клик - открыть / Правый - флаг. Стрелки (+Shift) - прокрутка, 1-3 - размер, R - заново, ESC - выход",
             BOARD_LEFT,
             12,
             arcade.color.LIGHT_GRAY,
@@ -176,13 +169,13 @@ class MinesGameView(arcade.View):
 
         column_index = int((mouse_x - BOARD_LEFT) // CELL_SIZE)
         row_index = int((mouse_y - BOARD_BOTTOM) // CELL_SIZE)
+        if row_index >= self.visible_rows() or column_index >= self.visible_columns():
+            return
+        row_index += self.view_row
+        column_index += self.view_col
 
         if mouse_button == arcade.MOUSE_BUTTON_RIGHT:
-            if (row_index, column_index) not in self.revealed_cells:
-                if (row_index, column_index) in self.flagged_cells:
-                    self.flagged_cells.remove((row_index, column_index))
-                else:
-                    self.flagged_cells.add((row_index, column_index))
+            self.board.toggle_flag(row_index, column_index)
             return
 
         if self.is_first_click:
@@ -191,25 +184,33 @@ class MinesGameView(arcade.View):
             self.game_start_time = time.time()
             self.elapsed_time = 0.0
 
-        if (row_index, column_index) in self.flagged_cells:
+        if self.board.is_flagged(row_index, column_index):
             return
 
-        if (row_index, column_index) in self.mine_positions:
+        if self.board.is_mine(row_index, column_index):
             self.is_game_over = True
             self.is_win = False
-            self.revealed_cells.update(self.mine_positions)
+            self.board.reveal_mines()
             return
 
-        if (row_index, column_index) not in self.revealed_cells:
-            if self.count_adjacent_mines(row_index, column_index) == 0:
-                self.reveal_empty_area(row_index, column_index)
-            else:
-                self.revealed_cells.add((row_index, column_index))
+        if not self.board.is_revealed(row_index, column_index):
+            self.reveal_empty_area(row_index, column_index)
 
         self.check_for_win()
 
     def on_key_press(self, key, modifiers):
+        step = 10 if modifiers & arcade.key.MOD_SHIFT else 1
         if key == arcade.key.R:
             self.initialize_game()
+        if key in BOARD_PRESETS:
+            self.initialize_game(*BOARD_PRESETS[key])
+        if key == arcade.key.UP:
+            self.scroll(step, 0)
+        if key == arcade.key.DOWN:
+            self.scroll(-step, 0)
+        if key == arcade.key.RIGHT:
+            self.scroll(0, step)
+        if key == arcade.key.LEFT:
+            self.scroll(0, -step)
         if key == arcade.key.ESCAPE:
             self.window.show_view(self.return_view_cls())
@@ -1,5 +1,6 @@
 import arcade
 import math
+import multiprocessing
 import random
 from games import FighterGameView, TanksGameView, DicePokerView, MinesGameView, SnakeGameView, ChessGameView
 from data_manager import GameDataManager
@@ -252,4 +253,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Нужно для процесса шахматного движка в собранном PyInstaller приложении
+    multiprocessing.freeze_support()
     main()
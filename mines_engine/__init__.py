@@ -0,0 +1 @@
+from .board import MinesBoard, REVEALED, FLAGGED, neighbour_counts
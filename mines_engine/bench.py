@@ -0,0 +1,53 @@
+"""Скорость и память поля сапёра от 10^4 до 10^7 клеток.
+
+    python -m mines_engine.bench --cells 10000000
+"""
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+
+from .board import MinesBoard
+
+
+def measure(cells, density=8, seed=1):
+    """Время (с) расстановки с подсчётом и первого открытия, память массивов и пик выделений (байт)."""
+    rows = int(math.sqrt(cells))
+    columns = cells // rows
+    tracemalloc.start()
+    board = MinesBoard(rows, columns, max(10, rows * columns // density), seed)
+    start = time.perf_counter()
+    board.place_mines(rows // 2, columns // 2)
+    placed = time.perf_counter() - start
+    start = time.perf_counter()
+    opened = board.reveal(rows // 2, columns // 2)
+    revealed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": rows, "columns": columns, "mines": board.total_mines, "place": placed,
+        "reveal": revealed, "opened": opened, "nbytes": board.nbytes(), "peak": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Скорость и память поля сапёра")
+    parser.add_argument("--cells", type=int, default=10 ** 7, help="наибольшее число клеток")
+    args = parser.parse_args(argv)
+    print(f"{'поле':>12}{'мин':>10}{'расстановка':>13}{'открытие':>10}{'открыто':>9}{'массивы':>10}{'пик':>10}")
+    cells = 10 ** 4
+    while cells <= args.cells:
+        result = measure(cells)
+        print(
+            f"{result['rows']:>6}x{result['columns']:<5}{result['mines']:>10}"
+            f"{result['place'] * 1000:>11.1f}мс{result['reveal'] * 1000:>8.1f}мс{result['opened']:>9}"
+            f"{result['nbytes'] / 2 ** 20:>8.1f}МБ{result['peak'] / 2 ** 20:>8.1f}МБ",
+            flush=True,
+        )
+        cells *= 10
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
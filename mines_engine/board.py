@@ -0,0 +1,118 @@
+"""Поле сапёра на массивах NumPy - годится и для полей в миллионы клеток.
+
+Мины - логическая маска, число мин вокруг клетки - uint8, считается разом
+свёрткой 3x3 (сумма сдвигов по строкам, затем по столбцам). Открытые клетки
+и флаги - биты одного массива uint8. Ни расстановка, ни подсчёт не создают
+объектов Python на клетку.
+"""
+import numpy as np
+
+REVEALED = 1
+FLAGGED = 2
+
+
+def neighbour_counts(mines):
+    """Мины вокруг каждой клетки (uint8) для логической маски mines."""
+    rows, columns = mines.shape
+    padded = np.zeros((rows + 2, columns + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = mines
+    vertical = padded[:-2] + padded[1:-1]
+    vertical += padded[2:]
+    counts = vertical[:, :-2] + vertical[:, 1:-1]
+    counts += vertical[:, 2:]
+    # Клетка с миной попала в свою сумму - вычитаем её
+    counts -= padded[1:-1, 1:-1]
+    return counts
+
+
+class MinesBoard:
+    """Поле rows x columns с total_mines минами; мины ставятся при первом открытии (place_mines)."""
+
+    def __init__(self, rows, columns, total_mines, seed=None):
+        if total_mines > rows * columns - 9:
+            raise ValueError(f"Слишком много мин для поля {rows}x{columns}: {total_mines}")
+        self.rows = rows
+        self.columns = columns
+        self.total_mines = total_mines
+        self.rng = np.random.default_rng(seed)
+        self.mines = np.zeros((rows, columns), dtype=np.bool_)
+        self.counts = np.zeros((rows, columns), dtype=np.uint8)
+        self.state = np.zeros((rows, columns), dtype=np.uint8)
+        self.safe_left = rows * columns - total_mines
+        self.flags = 0
+
+    def place_mines(self, safe_row, safe_col):
+        """Расставить мины так, чтобы клетка и её соседи были свободны, и посчитать соседей."""
+        flat = self.mines.reshape(-1)
+        flat[:] = False
+        forbidden = [
+            row * self.columns + col
+            for row in range(max(safe_row - 1, 0), min(safe_row + 2, self.rows))
+            for col in range(max(safe_col - 1, 0), min(safe_col + 2, self.columns))
+        ]
+        # Запретные клетки временно считаются занятыми; случайные номера бросаются пачками,
+        # пока не наберётся нужное число разных клеток (повторы просто отбрасываются)
+        flat[forbidden] = True
+        target = self.total_mines + len(forbidden)
+        placed = len(forbidden)
+        while placed < target:
+            flat[self.rng.integers(0, flat.size, size=target - placed)] = True
+            placed = int(np.count_nonzero(flat))
+        flat[forbidden] = False
+        self.counts = neighbour_counts(self.mines)
+
+    def is_mine(self, row, col):
+        return bool(self.mines[row, col])
+
+    def count(self, row, col):
+        return int(self.counts[row, col])
+
+    def is_revealed(self, row, col):
+        return bool(self.state[row, col] & REVEALED)
+
+    def is_flagged(self, row, col):
+        return bool(self.state[row, col] & FLAGGED)
+
+    def toggle_flag(self, row, col):
+        state = self.state[row, col]
+        if state & REVEALED:
+            return
+        self.state[row, col] = state ^ FLAGGED
+        self.flags += -1 if state & FLAGGED else 1
+
+    def reveal(self, row, col):
+        """Открыть безопасную клетку, а у клетки без мин вокруг - всю такую область. Возвращает число открытых.
+
+        Клетки под флагами не открываются, их игрок снимает сам.
+        """
+        rows, columns = self.rows, self.columns
+        # memoryview отдаёт элементы как int без создания скаляров NumPy
+        counts = memoryview(self.counts.reshape(-1))
+        state = memoryview(self.state.reshape(-1))
+        opened = 0
+        stack = [row * columns + col]
+        while stack:
+            index = stack.pop()
+            if state[index] & (REVEALED | FLAGGED):
+                continue
+            state[index] |= REVEALED
+            opened += 1
+            if counts[index]:
+                continue
+            current_row, current_col = divmod(index, columns)
+            for neighbor_row in range(max(current_row - 1, 0), min(current_row + 2, rows)):
+                base = neighbor_row * columns
+                for neighbor_col in range(max(current_col - 1, 0), min(current_col + 2, columns)):
+                    if not state[base + neighbor_col] & (REVEALED | FLAGGED):
+                        stack.append(base + neighbor_col)
+        self.safe_left -= opened
+        return opened
+
+    def reveal_mines(self):
+        self.state[self.mines] |= REVEALED
+
+    def is_won(self):
+        return self.safe_left == 0
+
+    def nbytes(self):
+        return self.mines.nbytes + self.counts.nbytes + self.state.nbytes
@@ -0,0 +1,25 @@
+"""Эталонные числа perft на обоих представлениях доски - до MAX_NODES листьев на позицию."""
+import pytest
+
+from chess_engine import BACKENDS
+from chess_engine.perft import REFERENCE_POSITIONS, perft
+
+MAX_NODES = 100000
+
+CASES = [
+    (name, fen, depth, expected)
+    for name, fen, counts in REFERENCE_POSITIONS
+    for depth, expected in enumerate(counts, 1)
+    if expected <= MAX_NODES
+]
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize(
+    "fen, depth, expected", [case[1:] for case in CASES], ids=[f"{case[0]}-d{case[2]}" for case in CASES],
+)
+def test_perft(backend, fen, depth, expected):
+    position = BACKENDS[backend].from_fen(fen)
+    assert perft(position, depth) == expected
+    # make/unmake должны вернуть позицию в точности
+    assert position.fen() == fen
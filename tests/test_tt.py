@@ -0,0 +1,32 @@
+"""Общая таблица транспозиций: процесс-помощник подключается к ней по spec() с тем же размером."""
+import multiprocessing
+
+import pytest
+
+from chess_engine.tt import SharedTranspositionTable
+
+
+def _helper_probe(spec, key, results):
+    table = SharedTranspositionTable(*spec)
+    try:
+        results.put((table.size, table.probe(key)))
+    finally:
+        table.close()
+
+
+@pytest.mark.parametrize("size_mb", [0.25, 1, 1.5, 16])
+def test_helper_sees_same_table(size_mb):
+    table = SharedTranspositionTable(size_mb)
+    try:
+        key = 0x123456789ABCDEF
+        table.store(key, 5, 0, 42, None)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        helper = context.Process(target=_helper_probe, args=(table.spec(), key, results))
+        helper.start()
+        size, entry = results.get(timeout=60)
+        helper.join()
+        assert size == table.size
+        assert entry is not None and entry[2] == 42
+    finally:
+        table.close()